@@ -1,3 +1,6 @@
+import os
+import time
+
 import bpy
 import addon_utils
 from bpy.types import Operator
@@ -17,13 +20,16 @@ from bpy.props import (
 )
 
 from ..context.context import Context
+from ..context.node_tree_store import NodeTreeMissingError
 from ...services.autosave import AutosaveService as AS
 from ...services.history import HistoryService as HS
 from ...services.i18n import I18nService as IS
+from ...services.pack_import import PackImportService as PIS, PackImportJob
 from ...services.sync import SyncService as SS
 from ...services.versioning import VersioningService as VS
 from .ui_context import UIContext
 from ...utils import utils
+from ...utils import bundle
 from ...utils import constants
 from ...utils.reporter import Reporter
 
@@ -230,7 +236,7 @@ class HOTNODE_OT_clear_presets(Operator):
         pack = Context.get_pack_selected()
         
         step = HS.step(self.bl_label, self)
-        HS.set_deleted_paths(step, *[preset.path for preset in pack.ordered_presets])
+        HS.set_trashed_paths(step, *[preset.path for preset in pack.ordered_presets])
         HS.set_changed_paths(step, pack.meta_path)
         HS.set_undo(step, self.undo, pack.name, pack.meta.ordered_preset_names, uic.preset_selected_idx)
         HS.set_redo(step, self.redo, pack.name)
@@ -510,6 +516,10 @@ class HOTNODE_OT_add_preset_nodes_to_tree(Operator):
         if pack.is_preset_file_exist(preset):
             try:
                 pack.add_preset_nodes_to_tree(context, preset, main_tree, is_new_tree)
+            except NodeTreeMissingError as e:
+                Reporter.report_warning(str(e))
+                Reporter.set_active_ops(None)
+                return {'CANCELLED'}
             except RuntimeError as e:
                 SS.sync()
                 Reporter.report_warning(f"{e} Hot Node refreshed.")
@@ -627,6 +637,8 @@ class HOTNODE_OT_transfer_preset_to_pack(Operator):
         src_pack = Context.get_pack(self.src_pack_name)
         dst_pack = Context.get_pack(self.dst_pack_name)
         preset = src_pack.get_preset(self.preset_name)
+        # the preset may only have the meta loaded from the index, read it before the source file is removed
+        preset.ensure_loaded()
         idx_before_transfer = src_pack.get_preset_idx(preset)
         is_src_pack_selected = src_pack is Context.get_pack_selected()
         is_dst_pack_selected = dst_pack is Context.get_pack_selected()
@@ -644,6 +656,7 @@ class HOTNODE_OT_transfer_preset_to_pack(Operator):
             HS.add_deleted_paths(step, preset.path)
             src_pack.remove_preset(preset)
             dst_pack.add_preset(preset) # add_preset will change preset path
+            dst_pack.import_node_trees_of(preset, src_pack)
             dst_pack.save_preset(preset)
             dst_pack.save_metas()
             HS.add_created_paths(step, preset.path)
@@ -657,6 +670,7 @@ class HOTNODE_OT_transfer_preset_to_pack(Operator):
             HS.add_changed_paths(step, dst_pack.meta_path)
             copied_preset = preset.deepcopy()
             dst_pack.add_preset(copied_preset)
+            dst_pack.import_node_trees_of(copied_preset, src_pack)
             dst_pack.save_preset(copied_preset)
             dst_pack.save_metas()
             HS.add_created_paths(step, copied_preset.path)
@@ -806,7 +820,7 @@ class HOTNODE_OT_remove_pack(Operator):
             packs = Context.ordered_packs
         
         step = HS.step(self.bl_label, self)
-        HS.set_deleted_paths(step, pack.pack_dir)
+        HS.set_trashed_paths(step, pack.pack_dir)
 
         if is_pack_selected:
             pack_after = Context.get_next_pack(pack, packs)
@@ -930,7 +944,7 @@ class HOTNODE_OT_set_pack_icon(Operator):
 class HOTNODE_OT_import_pack(bpy.types.Operator):
     bl_idname = "hotnode.import_pack"
     bl_label = "Import Pack"
-    bl_description = "Import preset pack(s) from zip file."
+    bl_description = "Import preset pack(s) from zip or bundle (.hnpk) file."
     bl_translation_context = i18n_contexts.default
     bl_options = {'REGISTER'}
     
@@ -942,13 +956,16 @@ class HOTNODE_OT_import_pack(bpy.types.Operator):
     # name of selected file with suffix
     filename: StringProperty(subtype="FILE_NAME") # type: ignore
     # filter suffix in file select window
-    filter_glob: StringProperty(default= "*.zip", options = {'HIDDEN'}) # type: ignore
+    filter_glob: StringProperty(default= "*.zip;*.hnpk", options = {'HIDDEN'}) # type: ignore
     # selected file names
     files : CollectionProperty(type=bpy.types.OperatorFileListElement, options={'HIDDEN', 'SKIP_SAVE'}) # type: ignore
     
     # if recovering, open the system's temp folder
     is_recovering: BoolProperty(default=False, options = {'HIDDEN'}) # type: ignore
     
+    REGISTER_INTERVAL = 0.05 # seconds between the modal ticks registering the extracted packs
+    REGISTER_TIME_SLICE = 0.03 # seconds of registering per tick, at least one pack is registered
+    
     @staticmethod
     def undo(uic: UIContext, new_pack_names, pack_name_before, idx_before):
         if Context.get_pack_selected_name() in new_pack_names:
@@ -971,80 +988,130 @@ class HOTNODE_OT_import_pack(bpy.types.Operator):
     def execute(self, context):
         Reporter.set_active_ops(self)
         uic: UIContext = context.window_manager.hot_node_ui_context
-        pack_before = Context.get_pack_selected()
-        idx_before = uic.preset_selected_idx
+        self._pack_before_name = Context.get_pack_selected_name()
+        self._idx_before = uic.preset_selected_idx
         
         src_dir = Context.fm.str_to_path(self.directory)
         
-        file_num = len(self.files)
-        last_imported_pack = None
-        imported_packs: list[Pack] = []
-        import_pack_names = []
+        self._file_num = len(self.files)
+        self._imported_packs: list[Pack] = []
+        src_paths = []
+        self._pack_names = []
         
-        # import every selected file
-        for i in range(file_num):
+        for i in range(self._file_num):
             file_name = self.files[i].name
-            src_zip_path = src_dir / file_name
+            src_path = src_dir / file_name
             
             # name checking
-            if file_name == ".zip" or file_name == "":
+            if file_name in (".zip", ".manifest", bundle.SUFFIX, ""):
                 msg = iface_("Failed to import because the pack name is empty: ") + file_name
                 self.report({'ERROR'}, msg)
                 continue
             if self.is_recovering:
-                timestemp_str, pack_name = AS.parse_autosave_zip_path(src_zip_path)
+                timestemp_str, pack_name = AS.parse_autosave_zip_path(src_path)
                 if "_autosave_" in pack_name:
                     pack_name = utils.get_string_between_words(pack_name, None, ("_autosave_",))
                 pack_name = pack_name + " (Recovered)"
-                pack_name = utils.ensure_unique_name(pack_name, list(Context.packs.keys()))
             else:
-                pack_name = file_name[:-4]
-                if Context.get_pack(pack_name) is not None:
-                    pack_name = utils.ensure_unique_name(pack_name, list(Context.packs.keys()))
-
-            # do import
-            dst_pack_dir = Context.fm.packs_dir / pack_name
-            Context.fm.unzip_to(src_zip_path, dst_pack_dir)
-            
-            # detect and convert legacy pack
-            legacy_pack_meta_path = dst_pack_dir / ".metadata.json"
-            if legacy_pack_meta_path.exists():
-                pack = Context.create_pack(pack_name)
-                failed_preset_names, legacy_meta = VS.convert_pack_of_0_X_X(context, pack)
-                if failed_preset_names:
-                    Reporter.report_warning("Failed to update presets: [" + pack_name + "] " + ", ".join(failed_preset_names))
-                legacy_ordered_preset_names = legacy_meta.get("order", [])
-                pack.try_match_order(legacy_ordered_preset_names)
-                pack.save_metas()
-            else:
-                pack = Context.load_pack(pack_name)
-            Context.add_pack(pack)
-            
-            imported_packs.append(pack)
-            import_pack_names.append(pack_name)
-            last_imported_pack = pack
-                
+                pack_name = src_path.stem
+            src_paths.append(src_path)
+            self._pack_names.append(pack_name)
+        
+        # extract & validate all archives on the workers, the packs are registered by modal() on the main thread in the selected order
+        self._jobs = PIS.submit(src_paths)
+        self._job_idx = 0
+        wm = context.window_manager
+        wm.progress_begin(0, max(len(self._jobs), 1))
+        self._timer = wm.event_timer_add(self.REGISTER_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            for job in self._jobs[self._job_idx:]:
+                PIS.discard(job)
+            self._jobs = self._jobs[:self._job_idx]
+            return self.finish(context)
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        # register the extracted packs in order, for at most one time slice per tick so blender stays responsive
+        start_time = time.perf_counter()
+        while self._job_idx < len(self._jobs) and self._jobs[self._job_idx].is_done():
+            job = self._jobs[self._job_idx]
+            pack = self.register_pack(context, job, self._pack_names[self._job_idx])
+            if pack is not None:
+                self._imported_packs.append(pack)
+            self._job_idx += 1
+            context.window_manager.progress_update(self._job_idx)
+            if time.perf_counter() - start_time > self.REGISTER_TIME_SLICE:
+                break
+        context.workspace.status_text_set(iface_("Importing packs: ") + f"{self._job_idx}/{len(self._jobs)}")
+        if self._job_idx < len(self._jobs):
+            return {'RUNNING_MODAL'}
+        return self.finish(context)
+    
+    def register_pack(self, context, job: PackImportJob, pack_name: str) -> Pack|None:
+        """Move the extracted pack of the job into the packs dir and add it to the Context, the legacy one is converted here."""
+        file_name = job.src_path.name
+        if job.error is not None:
+            self.report({'ERROR'}, iface_("Failed to import: ") + f"{file_name} ({job.error})")
+            return None
+        # the dirs not loaded as packs are also taken, the staging dir is moved rather than merged into them
+        pack_name = utils.ensure_unique_name(pack_name, list(Context.packs.keys()) + os.listdir(Context.fm.packs_dir))
+        dst_pack_dir = Context.fm.packs_dir / pack_name
+        try:
+            Context.fm.move_path(job.staging_dir, dst_pack_dir)
+        except OSError as e:
+            PIS.discard(job)
+            self.report({'ERROR'}, iface_("Failed to import: ") + f"{file_name} ({e})")
+            return None
+        
+        if job.is_legacy:
+            pack = Context.create_pack(pack_name)
+            failed_preset_names, legacy_meta = VS.convert_pack_of_0_X_X(context, pack)
+            if failed_preset_names:
+                Reporter.report_warning("Failed to update presets: [" + pack_name + "] " + ", ".join(failed_preset_names))
+            legacy_ordered_preset_names = legacy_meta.get("order", [])
+            pack.try_match_order(legacy_ordered_preset_names)
+            pack.save_metas()
+        else:
+            pack = Context.load_pack(pack_name, job.jpreset_by_name)
+        if job.corrupt_preset_names:
+            Reporter.report_warning(iface_("Skipped the corrupt presets: [") + pack_name + "] " + ", ".join(job.corrupt_preset_names))
+        Context.add_pack(pack)
+        return pack
+    
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+        uic: UIContext = wm.hot_node_ui_context
+        imported_packs: list[Pack] = self._imported_packs
+        
         imported_num = len(imported_packs)
         # count import infos
         if imported_num > 0:
-            Context.select_pack(last_imported_pack)
-            uic.select_pack(uic, last_imported_pack)
-            if imported_num == file_num:
+            Context.select_pack(imported_packs[-1])
+            uic.select_pack(uic, imported_packs[-1])
+            if imported_num == self._file_num:
                 if self.is_recovering:
                     Reporter.report_finish("Recovered successfully.", "Recovered partially successfully, see the previous infos.")
                 else:
                     Reporter.report_finish("Imported successfully.", "Import partially successfully, see the previous infos.")
             else:
                 self.report({'INFO'}, "Partially imported successfully.")
-        elif file_num > 1:
-            # no success but the user do selected file(s)
-            self.report({'WARNING'}, "None of the selected packs were imported. See the previous infos.")
+        else:
+            if self._file_num > 1:
+                # no success but the user do selected file(s)
+                self.report({'WARNING'}, "None of the selected packs were imported. See the previous infos.")
             Reporter.set_active_ops(None)
             return {'CANCELLED'}
         
+        import_pack_names = [pack.name for pack in imported_packs]
         step = HS.step(self.bl_label, self)
         HS.set_created_paths(step, *[pack.pack_dir for pack in imported_packs])
-        HS.set_undo(step, self.undo, [pack.name for pack in imported_packs], pack_before.name if pack_before else None, idx_before)
+        HS.set_undo(step, self.undo, import_pack_names, self._pack_before_name, self._idx_before)
         HS.set_redo(step, self.redo, import_pack_names)
         
         HS.save_step(step)
@@ -1054,6 +1121,9 @@ class HOTNODE_OT_import_pack(bpy.types.Operator):
     def invoke(self, context, event):
         if self.is_recovering:
             self.directory = str(Context.fm.autosave_dir)
+            self.filter_glob = "*.zip;*.manifest"
+        else:
+            self.filter_glob = "*.zip;*.hnpk"
         context.window_manager.fileselect_add(self)
         return {'RUNNING_MODAL'}
     
@@ -1074,6 +1144,16 @@ class HOTNODE_OT_export_pack(bpy.types.Operator):
         description="Overwrite existing files if they exist. If not checked, the re-named pack will get an unique name.",
         default=False
     ) # type: ignore
+    
+    export_format: EnumProperty(
+        name="Format",
+        description="File format of the exported packs",
+        items=(
+            ('ZIP', "Zip", "Zip archive, can be imported by all versions of Hot Node"),
+            ('BUNDLE', "Bundle", "Hot Node pack bundle (.hnpk), indexed so the presets can be read without extracting the whole pack"),
+        ),
+        default='ZIP',
+    ) # type: ignore
 
     def get_pack_enums(self, context):
         return ((name, name, "") for name in Context.packs.keys())
@@ -1092,14 +1172,20 @@ class HOTNODE_OT_export_pack(bpy.types.Operator):
     def execute(self, context):
         Reporter.set_active_ops(self)
         dst_dir = Context.fm.ensure_path_is_dir(self.filepath)
-        existing_pack_names = Context.fm.read_dir_file_names(dst_dir, ".zip", cull_suffix=False)
+        suffix = bundle.SUFFIX if self.export_format == 'BUNDLE' else ".zip"
+        existing_pack_names = Context.fm.read_dir_file_names(dst_dir, suffix)
         
         for pack_name in self.packs_to_export:
             pack = Context.get_pack(pack_name)
             if not self.is_overwrite_if_exist:
                 pack_name = utils.ensure_unique_name(pack_name, existing_pack_names)
-            dst_zip_path = dst_dir / f"{pack_name}.zip"
-            Context.fm.zip_to(pack.pack_dir, dst_zip_path)
+            dst_path = dst_dir / f"{pack_name}{suffix}"
+            # node group blobs no preset refers to are kept for the history, but not exported
+            unreferenced_paths = pack.node_tree_store.get_unreferenced_paths(pack.get_referenced_node_tree_hashes())
+            if self.export_format == 'BUNDLE':
+                Context.fm.bundle_to(pack.pack_dir, dst_path, unreferenced_paths)
+            else:
+                Context.fm.zip_to(pack.pack_dir, dst_path, unreferenced_paths)
                 
         Reporter.set_active_ops(None)
         return {'FINISHED'}
@@ -1117,6 +1203,7 @@ class HOTNODE_OT_export_pack(bpy.types.Operator):
 
         row = layout.row()
         col = row.column()
+        col.prop(self, "export_format")
         col.prop(self, "is_overwrite_if_exist")
         col.prop(self, "packs_to_export", text="Packs to Export")
         
@@ -1265,6 +1352,49 @@ class HOTNODE_OT_show_user_prefs(bpy.types.Operator):
         return {'FINISHED'}
     
 
+class HOTNODE_OT_find_preset_by_node(Operator):
+    bl_idname = "hotnode.find_preset_by_node"
+    bl_label = "Find Preset by Active Node"
+    bl_description = "Select the next preset using the type of the active node, node groups included. Needs the catalog."
+    bl_translation_context = i18n_contexts.default
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        user_prefs = utils.get_user_prefs(context)
+        edit_tree = getattr(context.space_data, "edit_tree", None)
+        return user_prefs is not None and user_prefs.is_use_catalog and edit_tree is not None and edit_tree.nodes.active is not None
+
+    def execute(self, context):
+        Reporter.set_active_ops(self)
+        uic: UIContext = context.window_manager.hot_node_ui_context
+        bl_idname = context.space_data.edit_tree.nodes.active.bl_idname
+        found = []
+        for pack_name, preset_name in Context.find_presets_by_node(bl_idname):
+            pack = Context.get_pack(pack_name)
+            if pack is not None and pack.has_preset(preset_name):
+                found.append((pack_name, preset_name))
+        if not found:
+            Reporter.report_warning(iface_("No preset uses the active node."))
+            Reporter.set_active_ops(None)
+            return {'CANCELLED'}
+        
+        # run again to cycle through the found presets
+        preset_selected = Context.get_preset_selected()
+        current = (Context.get_pack_selected_name(), preset_selected.name if preset_selected is not None else "")
+        idx = found.index(current) + 1 if current in found else 0
+        pack_name, preset_name = found[idx % len(found)]
+        pack = Context.select_pack(pack_name)
+        if not uic.is_pack_selected(uic, pack):
+            uic.select_pack(uic, pack)
+        Context.select_preset(preset_name)
+        uic.select_preset(uic, preset_name)
+        
+        Reporter.report_finish(f"[{pack_name}] {preset_name} ({idx % len(found) + 1}/{len(found)})")
+        Reporter.set_active_ops(None)
+        return {'FINISHED'}
+
+
 class HOTNODE_OT_refresh(Operator):
     bl_idname = "hotnode.refresh"
     bl_label = "Refresh"
@@ -1274,7 +1404,7 @@ class HOTNODE_OT_refresh(Operator):
 
     def execute(self, context):
         Reporter.set_active_ops(self)
-        SS.sync()
+        SS.sync(is_full=True)
         Reporter.report_finish("Hot Node Refreshed.")
         Reporter.set_active_ops(None)
         return {'FINISHED'}
@@ -1355,6 +1485,7 @@ classes = (
     HOTNODE_OT_update_legacy_packs,
     HOTNODE_OT_format_data,
     HOTNODE_OT_show_user_prefs,
+    HOTNODE_OT_find_preset_by_node,
     HOTNODE_OT_refresh,
     HOTNODE_OT_undo,
     HOTNODE_OT_redo,
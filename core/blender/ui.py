@@ -8,7 +8,6 @@ from bpy.app.translations import (
 )
 
 from ..context.context import Context
-from ...services.sync import SyncService as SS
 from ...utils import constants
 from ...utils import utils
 from .ui_context import UIContext, UIPreset
@@ -28,7 +27,6 @@ class HOTNODE_MT_merged_add_nodes_packs(Menu):
         edit_tree = context.space_data.edit_tree
         if edit_tree is None:
             return
-        SS.ensure_sync_on_interval()
         for pack in Context.ordered_packs:
             if edit_tree.bl_idname in pack.meta.tree_types:
                 pack_menu_cls = PackMenuManager.get_pack_menu_cls(pack.name)
@@ -44,7 +42,6 @@ class HOTNODE_MT_merged_save_nodes_packs(Menu):
         edit_tree = context.space_data.edit_tree
         if edit_tree is None:
             return
-        SS.ensure_sync_on_interval()
         for pack in Context.ordered_packs:
             pack_menu_cls = PackMenuManager.get_pack_menu_cls(pack.name)
             pack_menu_cls.mode = 'SAVE_NODES'
@@ -117,7 +114,6 @@ class PackMenuManager:
     def draw_list_add_nodes_pack_menu(self: Menu, context):
         user_prefs = utils.get_user_prefs(context)
         if user_prefs.add_nodes_menu_mode == 'LIST':
-            SS.ensure_sync_on_interval()
             self.layout.separator()
             for pack_name, pack_menu_cls in PackMenuManager.pack_menu_clses.items():
                 pack_menu_cls.mode = 'ADD_NODES'
@@ -127,7 +123,6 @@ class PackMenuManager:
     def draw_list_save_nodes_pack_menu(self: Menu, context):
         user_prefs = utils.get_user_prefs(context)
         if user_prefs.add_nodes_menu_mode == 'LIST':
-            SS.ensure_sync_on_interval()
             self.layout.separator()
             for pack_name, pack_menu_cls in PackMenuManager.pack_menu_clses.items():
                 pack_menu_cls.mode = 'SAVE_NODES'
@@ -420,6 +415,10 @@ class HOTNODE_MT_preset_options(Menu):
             layout.menu("HOTNODE_MT_copy_preset_to_pack", icon='FILE', text=f"{copy_text} \"{preset_short_name}\" {to_text}")
             layout.menu("HOTNODE_MT_move_preset_to_pack", icon='FILE_HIDDEN', text=f"{move_text} \"{preset_short_name}\" {to_text}")
 
+        if user_prefs.is_use_catalog:
+            layout.separator()
+            layout.operator("hotnode.find_preset_by_node", icon='VIEWZOOM')
+
         # User Utils
         layout.separator()
         layout.operator("hotnode.clear_presets", icon='PANEL_CLOSE')
@@ -499,7 +498,6 @@ class HOTNODE_PT_main(Panel):
     # last_switch_time = 0.0
 
     def draw(self, context):
-        SS.ensure_sync_on_interval()
         layout = self.layout
         wm = context.window_manager
         uic = wm.hot_node_ui_context
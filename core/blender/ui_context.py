@@ -312,7 +312,22 @@ class UIContext(bpy.types.PropertyGroup):
         uic.pack_selected_name = ""
         UpdateHandler.set_all_skip_flags(False) # skip all update handlers
         uic.select_pack(uic, Context.pack_selected)
-    
+
+    @staticmethod
+    def patch(changed_pack_names: set[str]):
+        """
+        CALL THIS AFTER the Context was synced incrementally. The UI preset list is only rebuilt if the selected pack is changed,
+        or the list differs from the pack (e.g. the window manager was loaded from a .blend file).
+        """
+        uic: UIContext = bpy.context.window_manager.hot_node_ui_context
+        pack = Context.pack_selected
+        pack_name = pack.name if pack else ""
+        preset_names = [preset.name for preset in pack.ordered_presets] if pack else []
+        if uic.pack_selected_name == pack_name and pack_name not in changed_pack_names \
+            and [uic_preset.name for uic_preset in uic.presets] == preset_names:
+            return
+        UIContext.initialize()
+
     # NOTE ACCESSING Context IN THIS CLASS IS NOT ALLOWED
     # NOTE Pass uic (comes from operator context) instead of using self so that the undo/redo can br applied to the uic by blender
     @staticmethod
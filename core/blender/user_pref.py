@@ -17,6 +17,7 @@ from . import ui
 from ...services.sync import SyncService as SS
 from ...services.history import HistoryService as HS
 from ...services.i18n import I18nService as IS
+from ..context.preset_cache import PresetCache
 
 
 def translate_default_name(user_prefs: 'HotNodeUserPrefs'):
@@ -115,12 +116,23 @@ def data_dir_update(self: 'HotNodeUserPrefs', context):
     
     fm.define_app_data_dir_structure(self.data_dir)
     fm.ensure_app_dir_structure()
-    SS.sync()
+    SS.sync(is_full=True)
     HS.load_history()
     
     
 def is_filter_pack_by_tree_type_update(self: 'HotNodeUserPrefs', context):
-    SS.sync()
+    SS.sync(is_full=True)
+
+
+def is_use_catalog_update(self: 'HotNodeUserPrefs', context):
+    if not self.is_use_catalog:
+        from ..context.context import Context
+        Context.catalog.close()
+    SS.sync(is_full=True)
+
+
+def preset_cache_size_update(self: 'HotNodeUserPrefs', context):
+    PresetCache().set_budget(self.preset_cache_size)
 
 
 def is_dev_update(self, context):
@@ -281,6 +293,37 @@ class HotNodeUserPrefs(AddonPreferences):
         max=365,
     ) # type: ignore
     
+    autosave_retention_count: IntProperty(
+        name="Autosave Retention Count",
+        description="Number of autosaves to keep for each pack. 0 for no limit",
+        default=20,
+        min=0,
+        max=1000,
+    ) # type: ignore
+    
+    autosave_retention_size_mb: IntProperty(
+        name="Autosave Retention Size (MB)",
+        description="Disk space the autosaves can take, the oldest ones are cleared first, the latest one of each pack is always kept. 0 for no limit",
+        default=256,
+        min=0,
+    ) # type: ignore
+    
+    preset_cache_size: IntProperty(
+        name="Preset Cache Size (MB)",
+        description="Memory to keep the recently added presets, so adding them again won't read the disk. 0 to disable",
+        default=64,
+        min=0,
+        soft_max=1024,
+        update=preset_cache_size_update,
+    ) # type: ignore
+    
+    is_use_catalog: BoolProperty(
+        name="Use Catalog",
+        description="Index packs and presets in a database in the data directory for faster startup. The preset files are still the source of truth",
+        default=False,
+        update=is_use_catalog_update,
+    ) # type: ignore
+    
     data_dir: StringProperty(
         name="Addon Data Directory",
         description="Root directory to store Hot Node data",
@@ -355,6 +398,8 @@ class HotNodeUserPrefs(AddonPreferences):
         col.separator(type='LINE')
         col.label(text="Data")
         col.prop(self, "autosave_retention_days", text="Autosave Retention Days")
+        col.prop(self, "autosave_retention_count", text="Autosave Retention Count")
+        col.prop(self, "autosave_retention_size_mb", text="Autosave Retention Size (MB)")
         
         row = col.row(align=True, heading="Custom Undo Steps")
         sub = row.row(align=True)
@@ -362,6 +407,8 @@ class HotNodeUserPrefs(AddonPreferences):
         sub = sub.row(align=True)
         sub.active = self.is_use_custom_undo_steps
         sub.prop(self, "undo_steps", text="")
+        col.prop(self, "preset_cache_size")
+        col.prop(self, "is_use_catalog")
         col.prop(self, "data_dir", icon='ASSET_MANAGER')
         
         # Others
@@ -391,6 +438,7 @@ def register():
         sidebar_category_update(user_prefs, bpy.context)
         fm.define_app_data_dir_structure(user_prefs.data_dir)
         fm.ensure_app_dir_structure()
+        PresetCache().set_budget(user_prefs.preset_cache_size)
         
         if user_prefs.is_dev and fm.is_path_exist(constants.HOT_NODE_ADDON_PATH / "dev"):
             from ... import dev
@@ -0,0 +1,248 @@
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+from ...utils import constants
+from ...utils.file_manager import FileManager
+
+
+class Catalog:
+    """
+    Optional sqlite catalog of the packs and presets in the packs dir, enabled by the user prefs.
+    The json files are still the source of truth: refresh() compares the file stamps (mtime_ns, size) with the catalog
+    and only parses the changed files, so editing the json files by hand is still supported.
+    With a fresh catalog, Context fills the packs in one query without reading any preset file,
+    and queries like "packs for this tree type" or "presets containing node X" are index lookups.
+    """
+    # bump this if the tables change, the catalog of other versions will be rebuilt
+    SCHEMA_VERSION = 3
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS packs (
+            name TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            jmeta TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS pack_tree_types (
+            pack TEXT NOT NULL,
+            tree_type TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pack_tree_types_tree_type ON pack_tree_types (tree_type);
+        CREATE INDEX IF NOT EXISTS pack_tree_types_pack ON pack_tree_types (pack);
+        CREATE TABLE IF NOT EXISTS presets (
+            pack TEXT NOT NULL,
+            name TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            jmeta TEXT NOT NULL,
+            tree_type TEXT,
+            is_separator INTEGER NOT NULL DEFAULT 0,
+            node_num INTEGER NOT NULL DEFAULT 0,
+            group_num INTEGER NOT NULL DEFAULT 0,
+            link_num INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (pack, name)
+        );
+        CREATE TABLE IF NOT EXISTS preset_nodes (
+            pack TEXT NOT NULL,
+            preset TEXT NOT NULL,
+            bl_idname TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS preset_nodes_bl_idname ON preset_nodes (bl_idname);
+        CREATE INDEX IF NOT EXISTS preset_nodes_preset ON preset_nodes (pack, preset);
+    """
+
+    def __init__(self):
+        self.fm = FileManager()
+        self.conn: sqlite3.Connection = None
+        self.conn_path: Path = None
+        # (pack_name, preset_name) of the preset files failed to read by the last refresh(), they are not in the catalog
+        self.broken_presets: list[tuple[str, str]] = []
+        self.is_refreshed = False # refreshed since connected, the queries are only current then
+
+    def connect(self) -> sqlite3.Connection:
+        """Get the connection, reconnect if the data dir is changed."""
+        path = self.fm.catalog_path
+        if self.conn is not None and self.conn_path == path:
+            return self.conn
+        self.close()
+        self.fm.ensure_dir(path.parent)
+        conn = sqlite3.connect(str(path))
+        if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+            for (table, ) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                conn.execute(f"DROP TABLE IF EXISTS \"{table}\"")
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        conn.executescript(self.SCHEMA)
+        conn.commit()
+        self.conn = conn
+        self.conn_path = path
+        return conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            self.conn_path = None
+        self.is_refreshed = False
+
+    @staticmethod
+    def get_stamp(path: Path|str) -> tuple[int, int]|None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self):
+        """Sync the catalog with the packs dir, only the changed files are read."""
+        conn = self.connect()
+        stamp_by_pack = {name: (mtime_ns, size) for name, mtime_ns, size in conn.execute("SELECT name, mtime_ns, size FROM packs")}
+        disk_pack_names = set()
+        self.broken_presets = []
+        with conn:
+            for entry in os.scandir(self.fm.packs_dir):
+                if not entry.is_dir():
+                    continue
+                pack_name = entry.name
+                pack_dir = Path(entry.path)
+                meta_path = pack_dir / ".meta"
+                stamp = self.get_stamp(meta_path)
+                if stamp is None:
+                    continue
+                disk_pack_names.add(pack_name)
+                if stamp_by_pack.get(pack_name) != stamp:
+                    try:
+                        jmeta = self.fm.read_json(meta_path)
+                    except (OSError, ValueError):
+                        jmeta = {}
+                    self.put_pack(conn, pack_name, stamp, jmeta)
+                self.refresh_presets(conn, pack_name, pack_dir)
+            for pack_name in stamp_by_pack.keys() - disk_pack_names:
+                self.remove_pack(conn, pack_name)
+        self.is_refreshed = True
+
+    def refresh_presets(self, conn: sqlite3.Connection, pack_name: str, pack_dir: Path):
+        stamp_by_preset = {name: (mtime_ns, size) for name, mtime_ns, size in
+                           conn.execute("SELECT name, mtime_ns, size FROM presets WHERE pack = ?", (pack_name, ))}
+        disk_preset_names = set()
+        bl_idnames_by_hash = {} # node group blobs are read once per refresh
+        for entry in os.scandir(pack_dir):
+            if not entry.name.endswith(".json") or not entry.is_file():
+                continue
+            preset_name = entry.name[:-5]
+            stat = entry.stat()
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            disk_preset_names.add(preset_name)
+            if stamp_by_preset.get(preset_name) == stamp:
+                continue
+            self.remove_preset(conn, pack_name, preset_name)
+            try:
+                jpreset = self.fm.read_json(entry.path)
+                if not isinstance(jpreset, dict):
+                    raise ValueError("The preset is not a json object.")
+            except (OSError, ValueError):
+                # no row, Context reports and removes it the same as loading from the json files
+                self.broken_presets.append((pack_name, preset_name))
+                continue
+            jmeta = jpreset.get("HN@meta", {})
+            node_num, group_num, link_num, bl_idnames = self.summarize(jpreset, pack_dir, bl_idnames_by_hash)
+            conn.execute("INSERT INTO presets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                pack_name, preset_name, *stamp, json.dumps(jmeta, ensure_ascii=False),
+                jmeta.get("tree_type"), int(bool(jmeta.get("is_separator", False))), node_num, group_num, link_num))
+            conn.executemany("INSERT INTO preset_nodes VALUES (?, ?, ?)", ((pack_name, preset_name, bl_idname) for bl_idname in bl_idnames))
+        for preset_name in stamp_by_preset.keys() - disk_preset_names:
+            self.remove_preset(conn, pack_name, preset_name)
+
+    def summarize(self, jpreset: dict, pack_dir: Path, bl_idnames_by_hash: dict[str, set[str]]) -> tuple[int, int, int, set[str]]:
+        """Get the node / group / link num of the main tree and the bl_idnames used in the preset, node groups included."""
+        jnode_trees: dict = jpreset.get("HN@node_trees", {})
+        jmain_tree = jnode_trees.get("HN@main_tree", {})
+        node_num = len(jmain_tree.get("nodes", {}))
+        link_num = len(jmain_tree.get("links", []))
+        group_num = len(jnode_trees) - (1 if "HN@main_tree" in jnode_trees else 0)
+        bl_idnames = set()
+        for jnode_tree in jnode_trees.values():
+            # stubs of the pack node tree store, see NodeTreeStore
+            hash = jnode_tree.get("HN@hash")
+            if hash is None:
+                bl_idnames |= self.get_bl_idnames(jnode_tree)
+                continue
+            if hash not in bl_idnames_by_hash:
+                try:
+                    bl_idnames_by_hash[hash] = self.get_bl_idnames(self.fm.read_json(pack_dir / ".node_trees" / f"{hash}.json"))
+                except (OSError, ValueError):
+                    bl_idnames_by_hash[hash] = set()
+            bl_idnames |= bl_idnames_by_hash[hash]
+        return node_num, group_num, link_num, bl_idnames
+
+    @staticmethod
+    def get_bl_idnames(jnode_tree: dict) -> set[str]:
+        return {jnode["bl_idname"] for jnode in jnode_tree.get("nodes", {}).values() if "bl_idname" in jnode}
+
+    @staticmethod
+    def put_pack(conn: sqlite3.Connection, pack_name: str, stamp: tuple[int, int], jmeta: dict):
+        conn.execute("INSERT OR REPLACE INTO packs VALUES (?, ?, ?, ?)", (pack_name, *stamp, json.dumps(jmeta, ensure_ascii=False)))
+        conn.execute("DELETE FROM pack_tree_types WHERE pack = ?", (pack_name, ))
+        conn.executemany("INSERT INTO pack_tree_types VALUES (?, ?)", ((pack_name, tree_type) for tree_type in jmeta.get("tree_types", [])))
+
+    @staticmethod
+    def remove_preset(conn: sqlite3.Connection, pack_name: str, preset_name: str):
+        conn.execute("DELETE FROM presets WHERE pack = ? AND name = ?", (pack_name, preset_name))
+        conn.execute("DELETE FROM preset_nodes WHERE pack = ? AND preset = ?", (pack_name, preset_name))
+
+    @staticmethod
+    def remove_pack(conn: sqlite3.Connection, pack_name: str):
+        conn.execute("DELETE FROM packs WHERE name = ?", (pack_name, ))
+        conn.execute("DELETE FROM pack_tree_types WHERE pack = ?", (pack_name, ))
+        conn.execute("DELETE FROM presets WHERE pack = ?", (pack_name, ))
+        conn.execute("DELETE FROM preset_nodes WHERE pack = ?", (pack_name, ))
+
+    def update_pack_meta(self, pack_name: str, jmeta: dict):
+        """
+        Put the pack meta changed in the session, so the tree type query is current without refreshing.
+        The stamp is zeroed, the next refresh() reads the meta file again.
+        """
+        conn = self.connect()
+        with conn:
+            self.put_pack(conn, pack_name, (0, 0), jmeta)
+
+    def drop_pack(self, pack_name: str):
+        """Drop the pack removed / renamed in the session."""
+        conn = self.connect()
+        with conn:
+            self.remove_pack(conn, pack_name)
+
+    def read_packs(self) -> dict[str, tuple[dict, dict[str, dict]]]:
+        """
+        Read all the packs in one query, call refresh() first.
+        Return {pack_name: (jmeta, {preset_name: jindex})}, the jindex is the same as the entry of the pack index.
+        """
+        conn = self.connect()
+        packs = {}
+        rows = conn.execute("""
+            SELECT packs.name, packs.jmeta, presets.name, presets.mtime_ns, presets.size, presets.jmeta
+            FROM packs LEFT JOIN presets ON presets.pack = packs.name
+            ORDER BY packs.name
+        """)
+        for pack_name, jpack_meta, preset_name, mtime_ns, size, jpreset_meta in rows:
+            if pack_name not in packs:
+                packs[pack_name] = (json.loads(jpack_meta), {})
+            if preset_name is not None:
+                packs[pack_name][1][preset_name] = {"stamp": [mtime_ns, size], "meta": json.loads(jpreset_meta)}
+        return packs
+
+    def find_pack_names_by_tree_type(self, tree_type: str) -> set[str]:
+        """Get the names of the packs for the tree type, universal packs and packs of no tree type are for every tree type."""
+        conn = self.connect()
+        rows = conn.execute("""
+            SELECT name FROM packs
+            WHERE name IN (SELECT pack FROM pack_tree_types WHERE tree_type IN (?, ?))
+            OR name NOT IN (SELECT pack FROM pack_tree_types)
+        """, (tree_type, constants.UNIVERSAL_NODE_TREE_IDNAME))
+        return {pack_name for (pack_name, ) in rows}
+
+    def find_presets_by_node(self, bl_idname: str) -> list[tuple[str, str]]:
+        """Get (pack_name, preset_name) of the presets using the node, node groups included."""
+        conn = self.connect()
+        rows = conn.execute("SELECT DISTINCT pack, preset FROM preset_nodes WHERE bl_idname = ? ORDER BY pack, preset", (bl_idname, ))
+        return rows.fetchall()
@@ -1,13 +1,20 @@
 from .pack import Pack
 from .preset import Preset
+import sqlite3
+
+from .preset_cache import PresetCache
+from .catalog import Catalog
 from ..serialization.manager import SerializationManager
 from ...utils.file_manager import FileManager
 from ...utils import constants
+from ...utils import utils
 
 
 class Context:
     fm = FileManager() # FileManager instance (singleton)
     sm = SerializationManager()
+    preset_cache = PresetCache() # parsed preset files, for adding the same preset again
+    catalog = Catalog() # optional sqlite catalog of packs & presets, see is_catalog_enabled()
     ser_context = sm.ser_context
     deser_context = sm.deser_context
     
@@ -18,6 +25,7 @@ class Context:
     ordered_packs: list[Pack] = []
     
     on_packs_changed_callbacks = [] # callbacks to call when packs are changed
+    pack_names_by_tree_type: dict[str, set[str]] = {} # results of the catalog tree type query, cleared when packs are changed
     
     # Runtime Flags
     current_pack_for_menu_drawing: Pack = None
@@ -30,6 +38,8 @@ class Context:
         cls.preset_selected: Preset = None # selected preset in selected pack
         cls.packs: dict[str, Pack] = {}
         cls.fm.ensure_app_dir_structure()
+        if cls.on_pack_meta_saved not in Pack.on_meta_saved_callbacks:
+            Pack.on_meta_saved_callbacks.append(cls.on_pack_meta_saved)
         cls.load_packs_and_add()
         if cls.packs:
             for pack_name, pack in Context.packs.items():
@@ -48,6 +58,9 @@ class Context:
         cls.packs.clear()
         cls.trigger_packs_changed()
         cls.sm.reset()
+        if cls.on_pack_meta_saved in Pack.on_meta_saved_callbacks:
+            Pack.on_meta_saved_callbacks.remove(cls.on_pack_meta_saved)
+        cls.catalog.close()
         pass
     
     @classmethod
@@ -63,25 +76,132 @@ class Context:
 
     @classmethod
     def trigger_packs_changed(cls):
+        cls.pack_names_by_tree_type.clear()
         cls.order_packs()
         for callback in cls.on_packs_changed_callbacks:
             callback()
 
     @classmethod
-    def load_pack(cls, pack_name: str):
-        """Load a pack by name and load it. Wont add to Context."""
+    def load_pack(cls, pack_name: str, jpreset_by_name: dict[str, dict]|None = None):
+        """Load a pack by name and load it. Wont add to Context. Pass the presets already read as jpreset_by_name to skip reading them."""
         pack = Pack(pack_name)
-        pack.load()
+        if jpreset_by_name is None:
+            pack.load()
+        else:
+            pack.load_with_jpresets(jpreset_by_name)
         return pack
 
+    @classmethod
+    def is_catalog_enabled(cls) -> bool:
+        user_prefs = utils.get_user_prefs()
+        return user_prefs is not None and user_prefs.is_use_catalog
+
     @classmethod
     def load_packs_and_add(cls):
         """Load all packs from the packs directory, the current context will be cleared. Packs will be added to Context."""
+        if cls.is_catalog_enabled():
+            try:
+                cls.load_packs_from_catalog_and_add()
+                return
+            except sqlite3.Error as e:
+                print(f"[Hot Node] Failed to load packs from the catalog, loading from the json files: {e}")
+                cls.catalog.close()
+                cls.packs.clear()
+        packs = []
         for pack_dir in cls.fm.packs_dir.iterdir():
             if pack_dir.is_dir() and (pack_dir / ".meta").exists():
-                pack_name = pack_dir.name
-                pack = cls.load_pack(pack_name)
-                cls.add_pack(pack)
+                pack = Pack(pack_dir.name)
+                pack.load(is_read_presets=False)
+                packs.append(pack)
+        # read the presets not in the pack indexes together, they are decoded in parallel if there are many
+        Pack.read_presets_of_packs(packs)
+        for pack in packs:
+            cls.add_pack(pack)
+        cls.trigger_packs_changed()
+
+    @classmethod
+    def load_packs_from_catalog_and_add(cls):
+        """Refresh the catalog by the file stamps and fill the packs in one query."""
+        cls.catalog.refresh()
+        for pack_name, (jmeta, jindex_by_name) in cls.catalog.read_packs().items():
+            pack = Pack(pack_name)
+            pack.load_from_catalog(jmeta, jindex_by_name)
+            cls.packs[pack.name] = pack
+        # the broken presets are not in the catalog, handle them the same as loading from the json files
+        for pack_name, preset_name in cls.catalog.broken_presets:
+            pack = cls.packs.get(pack_name)
+            if pack is not None:
+                preset = pack.create_preset(preset_name)
+                pack.add_preset(preset)
+                pack.on_preset_load_failed(preset)
+        cls.trigger_packs_changed()
+        
+    @classmethod
+    def is_catalog_current(cls) -> bool:
+        """The catalog is refreshed in this session and kept current by the pack changes, its queries can be used."""
+        return cls.is_catalog_enabled() and cls.catalog.is_refreshed
+
+    @classmethod
+    def on_catalog_error(cls, e: sqlite3.Error):
+        print(f"[Hot Node] Failed to query the catalog, using the packs in memory: {e}")
+        cls.catalog.close()
+
+    @classmethod
+    def on_pack_meta_saved(cls, pack: Pack):
+        cls.update_catalog_packs([pack.name])
+
+    @classmethod
+    def update_catalog_packs(cls, pack_names: list[str]):
+        """Update the catalog rows of the packs changed in the session, the ones not in the context are dropped."""
+        cls.pack_names_by_tree_type.clear()
+        if not cls.is_catalog_current():
+            return
+        try:
+            for pack_name in pack_names:
+                pack = cls.packs.get(pack_name)
+                if pack is not None:
+                    cls.catalog.update_pack_meta(pack_name, pack.meta.serialize())
+                else:
+                    cls.catalog.drop_pack(pack_name)
+        except sqlite3.Error as e:
+            cls.on_catalog_error(e)
+
+    @classmethod
+    def find_presets_by_node(cls, bl_idname: str) -> list[tuple[str, str]]:
+        """Get (pack_name, preset_name) of the presets using the node, node groups included. Empty if the catalog is disabled."""
+        if not cls.is_catalog_enabled():
+            return []
+        try:
+            # the catalog reads the files, write the pending ones first
+            cls.fm.flush_writes()
+            cls.catalog.refresh()
+            return cls.catalog.find_presets_by_node(bl_idname)
+        except sqlite3.Error as e:
+            cls.on_catalog_error(e)
+            return []
+
+    @classmethod
+    def reload_packs(cls, pack_names: set[str]):
+        """Reload the packs changed on disk and drop the removed ones, other packs are kept as they are."""
+        packs = []
+        for pack_name in pack_names:
+            cls.packs.pop(pack_name, None)
+            if (cls.fm.packs_dir / pack_name / ".meta").exists():
+                pack = Pack(pack_name)
+                pack.load(is_read_presets=False)
+                packs.append(pack)
+        Pack.read_presets_of_packs(packs)
+        for pack in packs:
+            cls.packs[pack.name] = pack
+        cls.update_catalog_packs(pack_names)
+        # the selected pack object may be replaced or removed, select it again by name
+        if cls.pack_selected is not None and cls.pack_selected.name in pack_names:
+            pack_selected_name = cls.pack_selected.name
+            cls.pack_selected = None
+            if pack_selected_name in cls.packs:
+                cls.select_pack(pack_selected_name)
+            else:
+                cls.select_first_pack_or_none()
         cls.trigger_packs_changed()
 
     @classmethod
@@ -100,7 +220,17 @@ class Context:
     
     @classmethod
     def get_ordered_packs_by_tree_type(cls, tree_type: str) -> list[Pack]:
-        """Get all ordered packs in the context filtered by tree type."""
+        """Get all ordered packs in the context filtered by tree type. The catalog index is used if it's current."""
+        if cls.is_catalog_current():
+            pack_names = cls.pack_names_by_tree_type.get(tree_type)
+            if pack_names is None:
+                try:
+                    pack_names = cls.catalog.find_pack_names_by_tree_type(tree_type)
+                except sqlite3.Error as e:
+                    cls.on_catalog_error(e)
+            if pack_names is not None:
+                cls.pack_names_by_tree_type[tree_type] = pack_names
+                return [pack for pack in cls.get_ordered_packs() if pack.name in pack_names]
         packs = [
             pack for pack in cls.get_ordered_packs() if (
                 tree_type in pack.meta.tree_types 
@@ -209,25 +339,30 @@ class Context:
     @classmethod
     def add_pack(cls, pack: Pack):
         cls.packs[pack.name] = pack
+        cls.update_catalog_packs([pack.name])
         cls.trigger_packs_changed()
         
     @classmethod
     def rename_pack(cls, pack: Pack|str, new_name):
         if isinstance(pack, str):
             pack = cls.get_pack(pack)
+        old_name = pack.name
         cls.packs.pop(pack.name)
         pack.rename(new_name)
         pack.save_sync_meta()
         cls.packs[new_name] = pack
+        cls.update_catalog_packs([old_name, new_name])
         cls.trigger_packs_changed()
             
     @classmethod
     def rename_pack_selected(cls, new_name: str):
         pack = cls.get_pack_selected()
+        old_name = pack.name
         cls.packs.pop(pack.name)
         pack.rename(new_name)
         pack.save_sync_meta()
         cls.packs[new_name] = pack
+        cls.update_catalog_packs([old_name, new_name])
         cls.trigger_packs_changed()
         
     @classmethod
@@ -237,6 +372,7 @@ class Context:
         cls.packs.pop(pack.name)
         pack.save_sync_meta()
         pack.remove()
+        cls.update_catalog_packs([pack.name])
         cls.trigger_packs_changed()
         
     @classmethod
@@ -303,6 +439,9 @@ class Context:
             
     @classmethod
     def format_data(cls):
-        cls.fm.remove_tree(cls.fm.packs_dir)
-        cls.fm.remove_tree(cls.fm.runtime_dir)
+        cls.preset_cache.clear()
+        cls.catalog.close()
+        # renamed aside now and removed in the background
+        cls.fm.remove_path_later(cls.fm.packs_dir)
+        cls.fm.remove_path_later(cls.fm.runtime_dir)
         cls.fm.ensure_app_dir_structure()
\ No newline at end of file
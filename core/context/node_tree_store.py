@@ -0,0 +1,123 @@
+from pathlib import Path
+
+from ...utils import utils
+from ...utils.file_manager import FileManager
+from .preset_cache import PresetCache
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .pack import Pack
+
+
+class NodeTreeMissingError(RuntimeError):
+    """A node group blob the preset refers to is missing or corrupt."""
+
+
+class NodeTreeStore:
+    """
+    Content addressed store of the node groups used by the presets of a pack, so a group shared by many presets is saved once.
+    A blob is the jnode_tree without its name, saved as .node_trees/<sha256>.json in the pack dir.
+    Presets refer to the blobs by stubs in HN@node_trees: {group_name: {"HN@hash": hash}}, presets with inline groups still work.
+    Blobs are never changed once written, and are not removed when no preset uses them anymore,
+    because the history may restore a preset file that refers to them.
+    """
+    DIR_NAME = ".node_trees"
+    STUB_KEY = "HN@hash"
+
+    def __init__(self, pack: 'Pack'):
+        self.fm = FileManager()
+        self.cache = PresetCache()
+        self.pack = pack
+
+    @property
+    def store_dir(self) -> Path:
+        return self.pack.pack_dir / self.DIR_NAME
+
+    def get_path(self, hash: str) -> Path:
+        return self.store_dir / f"{hash}.json"
+
+    def has(self, hash: str) -> bool:
+        return self.get_path(hash).exists()
+
+    @staticmethod
+    def is_stub(jnode_tree: dict) -> bool:
+        return NodeTreeStore.STUB_KEY in jnode_tree
+
+    @staticmethod
+    def hash_jnode_tree(jnode_tree: dict) -> str:
+        """Hash the canonical json of the jnode_tree, the name is not included."""
+        return utils.hash_jobj(jnode_tree, ("name",))
+
+    @staticmethod
+    def get_hashes(jpreset: dict) -> set[str]:
+        """Get the hashes of the blobs the preset refers to."""
+        jnode_trees = jpreset.get("HN@node_trees", {})
+        return {jnode_tree[NodeTreeStore.STUB_KEY] for jnode_tree in jnode_trees.values() if NodeTreeStore.is_stub(jnode_tree)}
+
+    @staticmethod
+    def get_hash_by_name(jpreset: dict) -> dict[str, str]:
+        """Get {group name: hash} of the stubs, the hashes also identify the node groups created from the blobs when adding the preset."""
+        jnode_trees = jpreset.get("HN@node_trees", {})
+        return {name: jnode_tree[NodeTreeStore.STUB_KEY] for name, jnode_tree in jnode_trees.items() if NodeTreeStore.is_stub(jnode_tree)}
+
+    def put(self, jnode_tree: dict) -> str:
+        """Write the jnode_tree as a blob if it's not stored yet, return the hash."""
+        hash = self.hash_jnode_tree(jnode_tree)
+        path = self.get_path(hash)
+        if not path.exists():
+            self.fm.ensure_dir(self.store_dir)
+            self.fm.write_json(path, {key: value for key, value in jnode_tree.items() if key != "name"})
+        return hash
+
+    def get(self, hash: str, name: str) -> dict:
+        """Read a new jnode_tree from the blob."""
+        jnode_tree = self.cache.read_json(self.get_path(hash))
+        jnode_tree["name"] = name
+        return jnode_tree
+
+    def externalize(self, jpreset: dict):
+        """Move the inline node groups of the jpreset to the store and replace them with stubs, in place. The main tree is kept inline."""
+        jnode_trees = jpreset.get("HN@node_trees")
+        if not jnode_trees:
+            return
+        for name, jnode_tree in jnode_trees.items():
+            if name == "HN@main_tree" or self.is_stub(jnode_tree):
+                continue
+            jnode_trees[name] = {self.STUB_KEY: self.put(jnode_tree)}
+
+    def resolve(self, jpreset: dict) -> dict:
+        """Get a jpreset with the stubs replaced by the blobs, the given jpreset is not changed. Raise NodeTreeMissingError if a blob is missing / corrupt."""
+        jnode_trees = jpreset.get("HN@node_trees")
+        if not jnode_trees or not any(self.is_stub(jnode_tree) for jnode_tree in jnode_trees.values()):
+            return jpreset
+        resolved_jpreset = dict(jpreset)
+        resolved_jnode_trees = {}
+        for name, jnode_tree in jnode_trees.items():
+            if self.is_stub(jnode_tree):
+                try:
+                    jnode_tree = self.get(jnode_tree[self.STUB_KEY], name)
+                except (OSError, ValueError) as e:
+                    # the group nodes refer to it by name, the preset can't be added without it
+                    print(f"[Hot Node] Missing node group blob: {name} in pack: {self.pack.name}")
+                    raise NodeTreeMissingError(f"Node group \"{name}\" is missing in the pack \"{self.pack.name}\", the preset is broken.") from e
+            resolved_jnode_trees[name] = jnode_tree
+        resolved_jpreset["HN@node_trees"] = resolved_jnode_trees
+        return resolved_jpreset
+
+    def copy_from(self, src_store: 'NodeTreeStore', hashes: set[str]):
+        """Copy the blobs from another store, existing blobs are skipped."""
+        if src_store.store_dir == self.store_dir:
+            return
+        for hash in hashes:
+            dst_path = self.get_path(hash)
+            src_path = src_store.get_path(hash)
+            if dst_path.exists() or not src_path.exists():
+                continue
+            self.fm.ensure_dir(self.store_dir)
+            self.fm.copy_file(src_path, dst_path)
+
+    def get_unreferenced_paths(self, referenced_hashes: set[str]) -> list[Path]:
+        """Get the blob paths no preset refers to."""
+        if not self.store_dir.exists():
+            return []
+        return [path for path in self.store_dir.glob("*.json") if path.stem not in referenced_hashes]
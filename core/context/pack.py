@@ -1,4 +1,6 @@
 from .preset import Preset
+from .node_tree_store import NodeTreeStore
+from .preset_cache import PresetCache
 from ...services.sync import SyncService
 from ...utils import constants
 from ...utils.file_manager import FileManager
@@ -31,6 +33,10 @@ class PackMeta:
 
 class Pack:
     """Pack class. Includes methods for managing pack / pack_meta / presets in the disk."""
+    # bump this if the structure of the index changes, the index of other versions will be rebuilt
+    INDEX_VERSION = 1
+    on_meta_saved_callbacks = [] # callbacks(pack) to call when a pack meta is saved, e.g. to update the catalog
+    
     def __init__(self, name):
         self.fm = FileManager()
         
@@ -39,6 +45,9 @@ class Pack:
         self.ordered_presets: list[Preset] = []
         
         self.meta = PackMeta()
+        self.node_tree_store = NodeTreeStore(self)
+        self.presets_to_read: list[Preset] = [] # presets to read in bulk, see read_presets_of_packs()
+        self.is_index_stale = False
         
         self.fm.ensure_dir(self.pack_dir)
         if not self.meta_path.exists():
@@ -53,6 +62,15 @@ class Pack:
     def meta_path(self):
         """Get the metadata file path."""
         return self.fm.packs_dir / self.name / ".meta"
+    
+    @property
+    def index_path(self):
+        """
+        Get the preset index file path. The index keeps the meta & file stamp of every preset,
+        so loading a pack only reads the presets changed since the index was saved.
+        {"version": 1, "presets": {preset_name: {"stamp": [mtime_ns, size], "meta": jmeta}}}
+        """
+        return self.fm.packs_dir / self.name / ".index"
         
     def is_env_safe(self):
         if not self.pack_dir.exists() or not self.meta_path.exists():
@@ -68,10 +86,14 @@ class Pack:
         return disk_names == meta_names
         
     def save_pack_meta(self):
-        self.fm.write_json(self.meta_path, self.meta.serialize())
+        self.fm.write_json_later(self.meta_path, self.meta.serialize())
+        for callback in Pack.on_meta_saved_callbacks:
+            callback(self)
         
-    def load_pack_meta(self):
-        jmeta = self.fm.read_json(self.meta_path)
+    def load_pack_meta(self, jmeta: dict|None = None):
+        """Load the pack meta from disk, or from the given jmeta read by the catalog."""
+        if jmeta is None:
+            jmeta = self.fm.read_json(self.meta_path)
         jicon = jmeta.get("icon")
         if jicon is not None and jicon not in constants.BLENDER_ICONS:
             jmeta['icon'] = 'OUTLINER_COLLECTION'
@@ -81,21 +103,69 @@ class Pack:
         SyncService.save_sync_meta(self)
         
     def save_metas(self):
-        """Save the pack meta and sync meta to disk."""
+        """Save the pack meta, the preset index and sync meta to disk."""
         self.save_pack_meta()
+        self.save_index()
         SyncService.save_sync_meta(self)
         
-    def load(self):
-        """Load pack meta and content safely. Will try best to use the meta, and load from disk if meta is not match and fix meta. (Will save meta)"""
+    def read_index(self) -> dict[str, dict]:
+        """Read the preset index entries by preset name, empty if the index is missing / broken / outdated."""
+        try:
+            jindex = self.fm.read_json(self.index_path)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(jindex, dict) or jindex.get("version") != self.INDEX_VERSION:
+            return {}
+        return jindex.get("presets", {})
+    
+    def save_index(self):
+        jpresets = {preset.name: preset.jindex for preset in self.ordered_presets if preset.jindex is not None}
+        try:
+            self.fm.write_json_later(self.index_path, {"version": self.INDEX_VERSION, "presets": jpresets})
+        except OSError:
+            pass
+        
+    def load(self, is_read_presets: bool = True):
+        """
+        Load pack meta and content safely. Will try best to use the meta, and load from disk if meta is not match and fix meta. (Will save meta)
+        
+        :param is_read_presets: False to leave the presets not in the index to Pack.read_presets_of_packs(), to read the presets of many packs in bulk.
+        """
         self.load_pack_meta()
-        self.load_from_disk_and_try_use_meta()
+        self.load_from_disk_and_try_use_meta(is_read_presets=is_read_presets)
         # self.save_pack_meta()
             
-    def load_from_disk_and_try_use_meta(self):
-        """Load pack content from the disk and try to use the meta if it's partly correct. (Wont save meta)"""
+    def load_with_jpresets(self, jpreset_by_name: dict[str, dict]):
+        """Load the pack with the presets already read (e.g. validated by the import), only the presets not given are read."""
+        self.load(is_read_presets=False)
+        presets_to_read = []
+        for preset in self.presets_to_read:
+            jpreset = jpreset_by_name.get(preset.name)
+            if jpreset is None:
+                presets_to_read.append(preset)
+            else:
+                preset.set_jpreset(jpreset)
+                self.is_index_stale = True
+        self.presets_to_read = presets_to_read
+        Pack.read_presets_of_packs([self])
+            
+    def load_from_catalog(self, jmeta: dict, jindex_by_name: dict[str, dict]):
+        """Load the pack from the entries of a refreshed catalog, no file will be read."""
+        self.load_pack_meta(jmeta)
+        self.load_from_disk_and_try_use_meta(jindex_by_name)
+            
+    def load_from_disk_and_try_use_meta(self, jindex_by_name: dict[str, dict]|None = None, is_read_presets: bool = True):
+        """
+        Load pack content from the disk and try to use the meta if it's partly correct. (Wont save meta)
+        
+        :param jindex_by_name: The preset index entries validated by the catalog, the disk won't be read if given.
+        """
         self.presets.clear()
         self.ordered_presets.clear()
-        disk_preset_names = self.fm.read_dir_file_names(self.pack_dir, ".json", cull_suffix=True)
+        if jindex_by_name is None:
+            disk_preset_names = self.fm.read_dir_file_names(self.pack_dir, ".json", cull_suffix=True)
+        else:
+            disk_preset_names = list(jindex_by_name.keys())
         disk_preset_by_name = {}
         # create preset dict with the names from disk
         for preset_name in disk_preset_names:
@@ -111,7 +181,13 @@ class Pack:
             self.ordered_presets.append(preset)
         # save the meta with the ordered preset names
         self.meta.ordered_preset_names = [preset.name for preset in self.ordered_presets]
-        self.load_presets()
+        if jindex_by_name is None:
+            self.load_preset_metas(is_read_presets)
+        else:
+            for preset in self.ordered_presets:
+                jindex = jindex_by_name[preset.name]
+                preset.meta.deserialize(jindex.get("meta", {}))
+                preset.jindex = jindex
     
     def load_from_meta(self, is_load_presets = False):
         """Load pack from meta (ref, not from disk)."""
@@ -129,14 +205,45 @@ class Pack:
         try:
             preset.load()
         except:
-            Reporter.report_warning(f"Failed to load preset {preset.name} in pack {self.name}. The preset file may be corrupted.")
-            print(f"[Hot Node] Failed to load preset: {preset.name} in pack: {self.name}")
-            self.remove_preset(preset)
-            self.save_metas()
+            self.on_preset_load_failed(preset)
+            
+    def on_preset_load_failed(self, preset: Preset):
+        Reporter.report_warning(f"Failed to load preset {preset.name} in pack {self.name}. The preset file may be corrupted.")
+        print(f"[Hot Node] Failed to load preset: {preset.name} in pack: {self.name}")
+        self.remove_preset(preset)
+        self.save_metas()
             
     def load_presets(self):
-        for preset in self.ordered_presets:
-            self.load_preset(preset)
+        self.presets_to_read = list(self.ordered_presets)
+        Pack.read_presets_of_packs([self])
+            
+    def load_preset_metas(self, is_read_presets: bool = True):
+        """Load the preset metas from the index, only the presets changed since the index was saved are read. The index is rebuilt if stale."""
+        jindex_by_name = self.read_index()
+        self.is_index_stale = jindex_by_name.keys() != self.presets.keys()
+        self.presets_to_read = [preset for preset in self.ordered_presets 
+                                if not preset.load_meta_from_jindex(jindex_by_name.get(preset.name))]
+        if is_read_presets:
+            Pack.read_presets_of_packs([self])
+            
+    @staticmethod
+    def read_presets_of_packs(packs: list['Pack']):
+        """Read the presets_to_read of the packs in bulk (the bpy free part of loading), and save the indexes that are stale."""
+        presets = [preset for pack in packs for preset in pack.presets_to_read]
+        results = FileManager().read_jsons([preset.path for preset in presets])
+        for preset, result in zip(presets, results):
+            pack = preset.pack
+            if not pack.presets.get(preset.name):
+                continue
+            if isinstance(result, Exception):
+                pack.on_preset_load_failed(preset)
+            else:
+                preset.set_jpreset(result)
+        for pack in packs:
+            if pack.presets_to_read or pack.is_index_stale:
+                pack.save_index()
+            pack.presets_to_read = []
+            pack.is_index_stale = False
         
     def get_preset(self, preset_name: str) -> Preset|None:
         """Get a preset by name from the pack."""
@@ -162,10 +269,12 @@ class Pack:
         
     def remove(self):
         """Remove the pack from disk."""
+        PresetCache().invalidate(self.pack_dir)
         self.fm.remove_tree(self.pack_dir)
         
     def rename(self, new_name: str):
         """Rename the pack instance and write to the disk."""
+        PresetCache().invalidate(self.pack_dir)
         self.fm.rename_path_tail(self.pack_dir, new_name)
         self.name = new_name
         
@@ -249,6 +358,19 @@ class Pack:
         self.save_preset(new_preset)
         return new_preset
 
+    def get_referenced_node_tree_hashes(self) -> set[str]:
+        """Get the hashes of the node group blobs referred by the presets of the pack."""
+        hashes = set()
+        for preset in self.ordered_presets:
+            preset.ensure_loaded()
+            hashes |= NodeTreeStore.get_hashes(preset.jpreset)
+        return hashes
+    
+    def import_node_trees_of(self, preset: Preset, src_pack: 'Pack'):
+        """Copy the node group blobs the preset refers to from the source pack, call this before saving a preset from another pack."""
+        preset.ensure_loaded()
+        self.node_tree_store.copy_from(src_pack.node_tree_store, NodeTreeStore.get_hashes(preset.jpreset))
+
     def add_preset_nodes_to_tree(self, bl_context, preset: Preset, main_tree = None, is_new_tree: bool = False):
         preset.deserialize(bl_context, main_tree, is_new_tree)
             
@@ -1,9 +1,11 @@
 import copy
+import os
 from pathlib import Path
 
 from ...utils import constants
 from ..serialization.manager import SerializationManager
 from ...utils.file_manager import FileManager
+from .preset_cache import PresetCache
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -56,17 +58,22 @@ class Preset():
     def __init__(self, name: str, pack: 'Pack'):
         self.sm = SerializationManager()
         self.fm = FileManager()
+        self.cache = PresetCache()
         
         self.name: str = name
         self.pack: 'Pack' = pack
         
         self.jpreset = {}
+        self.is_loaded = False # whether jpreset is read, presets loaded from the pack index only have the meta
+        self.jindex: dict|None = None # {"stamp": [mtime_ns, size], "meta": jmeta} of the file, the entry in the pack index
         
         self.meta = PresetMeta(name)
         
     def __deepcopy__(self, memo):
+        self.ensure_loaded()
         new_preset = Preset(self.name, None)
         new_preset.jpreset = copy.deepcopy(self.jpreset, memo)
+        new_preset.is_loaded = True
         new_preset.meta = copy.deepcopy(self.meta, memo)
         return new_preset
     
@@ -83,19 +90,66 @@ class Preset():
         return self.path.exists()
         
     def save(self):
+        if not self.is_loaded and self.path.exists():
+            # keep the meta in memory, it may be changed before saving
+            self.jpreset = self.fm.read_json(self.path)
         self.jpreset["HN@meta"] = self.meta.serialize()
+        # node groups are saved once per pack in the store, the preset only keeps their hashes
+        self.pack.node_tree_store.externalize(self.jpreset)
         self.fm.write_json(self.path, self.jpreset)
+        self.cache.invalidate(self.path)
+        self.is_loaded = True
+        self.update_jindex()
         
-    def load(self):
-        self.jpreset = self.fm.read_json(self.path)
+    def load(self, is_cached: bool = False):
+        """Load the preset file. Use is_cached for the presets to deserialize, they are likely to be added again."""
+        if is_cached:
+            self.jpreset = self.cache.read_json(self.path)
+        else:
+            self.jpreset = self.fm.read_json(self.path)
+        self.set_jpreset(self.jpreset)
+        
+    def set_jpreset(self, jpreset: dict):
+        """Use the jpreset read from the preset file, e.g. by FileManager.read_jsons()."""
+        self.jpreset = jpreset
         self.meta.deserialize(self.jpreset.get("HN@meta", {}))
+        self.is_loaded = True
+        self.update_jindex()
+        
+    def ensure_loaded(self):
+        """Read the preset file if only the meta is loaded from the pack index."""
+        if not self.is_loaded and self.path.exists():
+            self.load()
+            
+    def get_file_stamp(self) -> list[int]|None:
+        """Get [mtime_ns, size] of the preset file, None if the file doesn't exist."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+    
+    def update_jindex(self):
+        stamp = self.get_file_stamp()
+        self.jindex = {"stamp": stamp, "meta": self.jpreset.get("HN@meta", {})} if stamp is not None else None
+        
+    def load_meta_from_jindex(self, jindex: dict|None) -> bool:
+        """Load the meta from the pack index entry if the file is not changed since the entry was made, return whether it's loaded."""
+        if jindex is None or jindex.get("stamp") != self.get_file_stamp():
+            return False
+        self.meta.deserialize(jindex.get("meta", {}))
+        self.jindex = jindex
+        return True
         
     def serialize(self, bl_context, main_tree = None):
         self.jpreset = self.sm.serialize_preset(bl_context, main_tree)
+        self.is_loaded = True
         
     def deserialize(self, bl_context, main_tree = None, is_add_nodes_to_new_tree: bool = False):
-        self.load()
-        self.sm.deserialize_preset(bl_context, self.jpreset, main_tree, is_add_nodes_to_new_tree)
+        self.load(is_cached=True)
+        jpreset = self.pack.node_tree_store.resolve(self.jpreset)
+        jnode_tree_hashes = self.pack.node_tree_store.get_hash_by_name(self.jpreset)
+        self.sm.deserialize_preset(bl_context, jpreset, main_tree, is_add_nodes_to_new_tree, jnode_tree_hashes)
 
     def get_ser_context(self):
         """Get the serialization context."""
@@ -107,6 +161,7 @@ class Preset():
         
     def rename(self, new_name: str):
         """Rename the preset without checking."""
+        self.cache.invalidate(self.path)
         self.fm.rename_path_tail(self.path, new_name, suffix=".json")
         self.name = new_name
         
@@ -120,6 +175,7 @@ class Preset():
 
     def remove(self):
         """Delete the preset file."""
+        self.cache.invalidate(self.path)
         self.path.unlink(missing_ok=True)
         
     def set_separator(self, is_separator: bool):
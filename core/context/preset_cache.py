@@ -0,0 +1,86 @@
+import marshal
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+from ...utils.file_manager import FileManager
+
+
+class PresetCache:
+    """
+    Parsed json files of presets (and node group blobs), so adding the same preset again won't read & parse the file.
+    Entries are keyed by path and validated by (mtime, size) on every get, stale entries are dropped.
+    The data is kept marshaled and loaded on every get, so callers get their own copy
+    (the deserializer writes HN@ref into the dicts), and loading it is still ~2x faster than parsing json.
+    The total size is capped by the budget in the user prefs, the least recently used entries are evicted first.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if not self._initialized:
+            self._initialized = True
+            self.fm = FileManager()
+            # path str -> (mtime_ns, size, marshaled data)
+            self.entries: OrderedDict[str, tuple[int, int, bytes]] = OrderedDict()
+            self.budget = 64 * 1024 * 1024 # bytes, 0 to disable
+            self.used = 0
+
+    def set_budget(self, budget_mb: int):
+        self.budget = max(budget_mb, 0) * 1024 * 1024
+        self.evict()
+
+    def clear(self):
+        self.entries.clear()
+        self.used = 0
+
+    def read_json(self, path: Path) -> dict:
+        """Read the json file through the cache, the result can be changed freely."""
+        key = str(path)
+        stat = os.stat(key)
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.entries.move_to_end(key)
+                return marshal.loads(entry[2])
+            self.pop(key)
+        jobj = self.fm.read_json(path)
+        self.put(key, stat, jobj)
+        return jobj
+
+    def put(self, key: str, stat: os.stat_result, jobj: dict):
+        if self.budget <= 0:
+            return
+        try:
+            data = marshal.dumps(jobj)
+        except ValueError:
+            return
+        if len(data) > self.budget:
+            return
+        self.entries[key] = (stat.st_mtime_ns, stat.st_size, data)
+        self.used += len(data)
+        self.evict()
+
+    def pop(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.used -= len(entry[2])
+
+    def evict(self):
+        while self.entries and self.used > self.budget:
+            _, entry = self.entries.popitem(last=False)
+            self.used -= len(entry[2])
+
+    def invalidate(self, *paths: Path):
+        """Drop the entries of the paths, a dir path drops all the entries under it."""
+        for path in paths:
+            key = str(path)
+            self.pop(key)
+            dir_prefix = os.path.join(key, "")
+            for entry_key in [entry_key for entry_key in self.entries if entry_key.startswith(dir_prefix)]:
+                self.pop(entry_key)
@@ -1,4 +1,5 @@
 from .stg import *
+from ..stg_registry import StgRegistry
 
 
 # NOTE How to register a new stg:
@@ -41,6 +42,7 @@ class Adapter():
             self._stg_list_node: list[Stg] = None
             self._stg_list_core: list[Stg] = None
             self._stg_list_all: list[Stg] = None
+            self.registry = StgRegistry() # type -> stg memo, cleared when stgs are reloaded
             
         @property
         def stg_list_hn(self) -> list[Stg]:
@@ -133,6 +135,7 @@ class Adapter():
             
     def load_stgs(self, blender_version: list[int, int, int]):
         stgs = self.stgs
+        stgs.registry.clear()
         if blender_version == [2, 93, 0]:
             pass
         else:
@@ -1,7 +1,10 @@
 import bpy
 import mathutils
 # import time
+from ....utils import constants
 from ....utils import utils
+from ..node_group_graph import NodeGroupGraph
+from .stamp import NodeGroupStampTracker
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -37,6 +40,9 @@ class DeserializationContext:
         self.data_node_center: list[float] = [0.0, 0.0]
         self.data_compatible_mode: bool = True
         
+        self.node_group_graph: NodeGroupGraph = None # groups of the preset, rebuilt from HN@data.node_tree_deps
+        self.jnode_tree_hashes: dict[str, str] = {} # group name -> content hash, the hashes of the node tree store stubs
+        self.node_groups_by_hash: dict[str, list[bpy.types.NodeTree]] = None # groups stamped by hot node in the file, built lazily
         self.existing_node_group_names: list[str] = []
         self.newed_main_tree_nodes: list[bpy.types.Node] = []
         self.cursor_offset: 'mathutils.Vector' = mathutils.Vector((0, 0))
@@ -54,7 +60,8 @@ class DeserializationContext:
         self.image_names_in_dir: list[str] = []
         self.obj_tree: list = []
         
-    def init_on_deserializing_preset(self, bl_context: bpy.types.Context, jpreset: dict, main_tree: bpy.types.NodeTree|None = None, is_add_nodes_to_new_tree: bool = False):
+    def init_on_deserializing_preset(self, bl_context: bpy.types.Context, jpreset: dict, main_tree: bpy.types.NodeTree|None = None, is_add_nodes_to_new_tree: bool = False,
+                                     jnode_tree_hashes: dict[str, str]|None = None):
         self.__init__()
         
         self.bl_context = bl_context
@@ -76,11 +83,31 @@ class DeserializationContext:
         # use get to avoid KeyError if the key is not present when preset version is old
         self.data_node_center = jdata.get("node_center", [0.0, 0.0])
         self.data_compatible_mode = jdata.get("compatible_mode", True)
+        jnode_tree_names = [name for name in self.jnode_trees.keys() if name != "HN@main_tree"]
+        self.node_group_graph = NodeGroupGraph.from_jdeps(jdata.get("node_tree_deps"), jnode_tree_names)
+        self.jnode_tree_hashes = jnode_tree_hashes if jnode_tree_hashes is not None else {}
         
         self.existing_node_group_names = list(self.node_groups.keys())
         self.image_names_in_dir = []
         self.is_add_nodes_to_new_tree = is_add_nodes_to_new_tree
         
+    def get_node_groups_by_hash(self, hash: str) -> list[bpy.types.NodeTree]:
+        """Get the node groups stamped with the hash, duplicates of a group share its stamp. The index is built once per deserialization."""
+        if self.node_groups_by_hash is None:
+            self.node_groups_by_hash = {}
+            for node_group in self.node_groups:
+                node_group_hash = node_group.get(constants.NODE_TREE_HASH_PROP)
+                if isinstance(node_group_hash, str):
+                    self.node_groups_by_hash.setdefault(node_group_hash, []).append(node_group)
+        return self.node_groups_by_hash.get(hash, [])
+    
+    def stamp_node_group(self, node_group: bpy.types.NodeTree, hash: str):
+        """Stamp the node group created from the preset with its content hash, the stamp is removed once the group is edited, see NodeGroupStampTracker."""
+        node_group[constants.NODE_TREE_HASH_PROP] = hash
+        NodeGroupStampTracker.skip_next_update(node_group)
+        if self.node_groups_by_hash is not None:
+            self.node_groups_by_hash.setdefault(hash, []).append(node_group)
+        
     def cal_cursor_offset(self):
         self.cursor_offset = self.bl_context.space_data.cursor_location - mathutils.Vector(self.data_node_center)
 
@@ -106,52 +133,27 @@ class Deserializer:
             # find the first valid attr_list if there are multiple attr_lists
             if attr_list.is_valid():
                 break
-            
-        attrs = dir(obj)
-        if attr_list is None:
-            # dont have white or black attrs, serialize all attrs, except private & bl_ & callable & rna
-            vbya = {attr: getattr(obj, attr) 
-                    for attr in attrs if
-                    not attr.startswith("__")
-                    and not attr.startswith("bl_")
-                    and not attr == "rna_type"
-                    and not callable(getattr(obj, attr))}
-        elif attr_list.is_white_only:
-            # only serialize white attrs
-            vbya = {attr: getattr(obj, attr) for attr in attr_list.w}
-        else:
-            # use white and black attrs
-            vbya = {attr: getattr(obj, attr) 
-                    for attr in attrs if
-                    (attr in attr_list.w and hasattr(obj, attr))
-                    or (not attr.startswith("__")
-                    and not attr.startswith("bl_")
-                    and not attr == "rna_type"
-                    and not attr in attr_list.b
-                    and not callable(getattr(obj, attr)))}
+        # the attrs to read are planned once per rna type & stg & attr_list, see StgRegistry.build_attr_plan
+        attrs = self.stgs.registry.get_attr_plan(obj, obj_stg, attr_list, is_check_white=False)
+        vbya = {attr: getattr(obj, attr) for attr in attrs}
         return vbya, attr_list
     
     def get_stg(self, stg_specifier: object|str, stg_list: 'list[Stg]|Stg' = None) -> 'Stg':
         """Loop the stgs to find the stg of the given object/key(attr_name)."""
         if stg_list is None:
             stg_list = self.stgs.stg_list_core
-        if not isinstance(stg_list, list):
-            stg_list = [stg_list]
+        fallback = stg_list[-1] if isinstance(stg_list, list) else stg_list
         if stg_specifier is None:
-            return stg_list[-1]
+            return fallback
         
         if isinstance(stg_specifier, str):
-            obj_type = getattr(bpy.types, stg_specifier, None)
+            obj_type = self.stgs.registry.get_type(stg_specifier)
         else:
             obj_type = stg_specifier.__class__
         
         if obj_type is not None:
-            for stg in stg_list:
-                for stg_type in stg.types:
-                    # print(f"Checking {obj_type} against {stg_type}: is? {obj_type is stg_type}; subclass? {issubclass(obj_type, stg_type)}")
-                    if obj_type is stg_type or issubclass(obj_type, stg_type):
-                        return stg
-        return stg_list[-1]
+            return self.stgs.registry.get_stg(obj_type, stg_list, fallback)
+        return fallback
         
     def dispatch_deserialize(self, obj, jobj: dict, stg_list: 'list[Stg]|Stg|None' = None, b: set[str] = set()):
         self.context.obj_tree.append(obj)
@@ -160,9 +162,6 @@ class Deserializer:
         # start_time = time.time()
         if stg_list is None:
             stg_list = self.stgs.stg_list_core
-            
-        if not isinstance(stg_list, list):
-            stg_list = [stg_list]
         
         for attr, jvalue in jobj.items():
             if b and attr in b or attr.startswith("HN@"):
@@ -0,0 +1,53 @@
+import bpy
+from bpy.app.handlers import persistent
+
+from ....utils import constants
+
+
+@persistent
+def unstamp_edited_node_groups(scene, depsgraph):
+    NodeGroupStampTracker.on_depsgraph_update(depsgraph)
+
+
+class NodeGroupStampTracker:
+    """
+    Node groups created from a preset are stamped with the content hash of the group, so adding the preset again reuses them (TRY_TO_REUSE).
+    The stamp is a custom property, duplicating the group copies it and editing the group keeps it, so it's removed here
+    once the depsgraph reports an update of the group. Groups not used by the scene are not reported, adding still checks
+    their node / link num and interface before reusing them.
+    """
+    # groups created / reused by the last add, the update reported right after it is ours
+    skipped_keys: set[int] = set()
+    is_enabled = False
+
+    @classmethod
+    def enable(cls):
+        if not cls.is_enabled:
+            cls.is_enabled = True
+            if unstamp_edited_node_groups not in bpy.app.handlers.depsgraph_update_post:
+                bpy.app.handlers.depsgraph_update_post.append(unstamp_edited_node_groups)
+
+    @classmethod
+    def disable(cls):
+        if unstamp_edited_node_groups in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.remove(unstamp_edited_node_groups)
+        cls.is_enabled = False
+        cls.skipped_keys.clear()
+
+    @classmethod
+    def skip_next_update(cls, node_group: bpy.types.NodeTree):
+        cls.skipped_keys.add(node_group.session_uid)
+
+    @classmethod
+    def on_depsgraph_update(cls, depsgraph: bpy.types.Depsgraph):
+        for update in depsgraph.updates:
+            id = update.id
+            if not isinstance(id, bpy.types.NodeTree):
+                continue
+            node_group = id.original
+            if node_group.session_uid in cls.skipped_keys:
+                continue
+            # linked groups can't be edited here
+            if node_group.library is None and constants.NODE_TREE_HASH_PROP in node_group:
+                del node_group[constants.NODE_TREE_HASH_PROP]
+        cls.skipped_keys.clear()
@@ -5,6 +5,7 @@ from ....utils import constants
 from ....utils.file_manager import FileManager
 from ....utils import utils
 from ....utils.reporter import Reporter
+from .stamp import NodeGroupStampTracker
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -102,16 +103,19 @@ class PresetStg(Stg):
         if jnode_trees is None:
             Reporter.report_warning("No node data found in the preset.")
             return
-        for jname, jnode_tree in jnode_trees.items():
-            if jname == "HN@main_tree":
-                continue
-            if context.node_groups.find(jname) != -1:
-                existing_node_tree = context.node_groups[jname]
-                if context.user_prefs.node_tree_reuse_mode == 'TRY_TO_REUSE':
-                    if self.is_node_tree_same(existing_node_tree, jnode_tree):
-                        jnode_tree["HN@ref"] = existing_node_tree
-                        continue
+        # create groups in dependency order, presets saved before we record the deps keep their saved order
+        is_try_to_reuse = context.user_prefs.node_tree_reuse_mode == 'TRY_TO_REUSE'
+        for jname in context.node_group_graph.order:
+            jnode_tree = jnode_trees[jname]
+            jhash = context.jnode_tree_hashes.get(jname)
+            if is_try_to_reuse:
+                existing_node_tree = self.find_reusable_node_tree(jname, jhash, jnode_tree)
+                if existing_node_tree is not None:
+                    jnode_tree["HN@ref"] = existing_node_tree
+                    continue
             self.deserializer.specify_deserialize(None, jnode_tree, self.stgs.node_tree)
+            if jhash is not None and is_try_to_reuse:
+                context.stamp_node_group(jnode_tree["HN@ref"], jhash)
 
         # config edit tree deserialization settings
         # for creating geo tree directly
@@ -152,7 +156,7 @@ class PresetStg(Stg):
 
         # set main tree
         context.is_setting_main_tree = True
-        self.deserializer.specify_deserialize(context.main_tree, jnode_tree, self.stgs.node_tree)
+        self.deserializer.specify_deserialize(context.main_tree, context.jmain_tree, self.stgs.node_tree)
         
     def has_group_io_node(self, jnode_tree: dict) -> bool:
         """Check if the node tree has group io nodes."""
@@ -167,6 +171,38 @@ class PresetStg(Stg):
         existing_jinterface = self.deserializer.manager.serialize_interface(self.context.bl_context, node_tree)
         return existing_jinterface == jinterface
     
+    def find_reusable_node_tree(self, jname: str, jhash: str|None, jnode_tree: dict) -> bpy.types.NodeTree|None:
+        """Find an existing node group to reuse, by the stamped content hash first, then by the name."""
+        context = self.context
+        if jhash is not None:
+            # groups created from the same data are found by the stamped hash whatever their names are
+            for existing_node_tree in context.get_node_groups_by_hash(jhash):
+                if self.is_stamped_node_tree_same(existing_node_tree, jnode_tree):
+                    NodeGroupStampTracker.skip_next_update(existing_node_tree)
+                    return existing_node_tree
+        if context.node_groups.find(jname) != -1:
+            existing_node_tree = context.node_groups[jname]
+            if self.is_node_tree_same(existing_node_tree, jnode_tree):
+                return existing_node_tree
+        return None
+    
+    def is_stamped_node_tree_same(self, node_tree, jnode_tree: dict) -> bool:
+        """
+        Check if the node group stamped with the same hash is not edited since it was created.
+        Edits reported by the depsgraph remove the stamp (see NodeGroupStampTracker), the node / link num and
+        the interface item names are checked for the groups the depsgraph doesn't report.
+        """
+        if len(node_tree.nodes) != len(jnode_tree["nodes"]) or len(node_tree.links) != len(jnode_tree["links"]):
+            return False
+        jitems_tree = jnode_tree.get("interface", {})
+        items_tree = node_tree.interface.items_tree
+        if len(items_tree) != len(jitems_tree):
+            return False
+        for item, jitem in zip(items_tree, jitems_tree.values()):
+            if "name" in jitem and item.name != jitem["name"]:
+                return False
+        return True
+    
     def is_node_tree_same(self, node_tree, jnode_tree: dict) -> bool:
         """Check if the node tree is the same as the existing one."""
         # serialize node_tree does not guarantee same even they do same, so use interface + node num instead
@@ -4,8 +4,10 @@ import bpy
 
 from .serialize.adapter import Adapter as SerAdapter
 from .serialize.serializer import Serializer
+from .serialize.cache import NodeTreeCache
 from .deserialize.adapter import Adapter as DeserAdapter
 from .deserialize.deserializer import Deserializer
+from .deserialize.stamp import NodeGroupStampTracker
 from ...utils.constants import BLENDER_VERSION
 # For API usage: BLENDER_VERSION = list(bpy.app.version)
 
@@ -32,35 +34,63 @@ class SerializationManager:
 
             self.ser_context = self.serializer.context
             self.deser_context = self.deserializer.context
+            NodeGroupStampTracker.enable()
             
     def reset(self):
         """Reset the serialization manager to its initial state."""
+        NodeTreeCache.disable()
+        NodeGroupStampTracker.disable()
         self._initialized = False
         self.__class__._instance = None
     
     def serialize_preset(self, bl_context: bpy.types.Context, main_tree: bpy.types.NodeTree|None = None) -> dict:
         """main_tree: the dst node tree to get nodes from, if None, use the current edit tree."""
         self.ser_context.init_on_serializing_preset(bl_context, main_tree)
-        return self.serializer.specify_serialize(self.ser_context.main_tree, None, self.ser_stgs.preset)
+        try:
+            jpreset = self.serializer.specify_serialize(self.ser_context.main_tree, None, self.ser_stgs.preset)
+        finally:
+            self.ser_context.pool.release()
+        self.serializer.schema.save()
+        return jpreset
 
     def serialize_node_tree(self, bl_context: bpy.types.Context, node_tree: bpy.types.NodeTree) -> dict:
         """Serialize the entire node tree."""
         self.ser_context.init_on_serializing_preset(bl_context)
         self.ser_context.node_tree = node_tree
-        return self.serializer.specify_serialize(node_tree, None, self.ser_stgs.node_tree)
+        node_tree_stg = self.ser_stgs.node_tree
+        # the flags are left by the last save, set them for a whole group and restore them after
+        flags = (node_tree_stg.parse_all, node_tree_stg.is_main_tree)
+        node_tree_stg.parse_all = True
+        node_tree_stg.is_main_tree = False
+        try:
+            jnode_tree = self.serializer.specify_serialize(node_tree, None, node_tree_stg)
+        finally:
+            node_tree_stg.parse_all, node_tree_stg.is_main_tree = flags
+            self.ser_context.pool.release()
+        self.serializer.schema.save()
+        return jnode_tree
 
     def serialize_interface(self, bl_context: bpy.types.Context, node_tree: bpy.types.NodeTree) -> dict:
         """Serialize the interface of the main tree."""
         self.ser_context.init_on_serializing_preset(bl_context)
         self.ser_context.node_tree = node_tree
-        return self.serializer.specify_serialize(node_tree.interface, None, self.ser_stgs.interface)
+        try:
+            jinterface = self.serializer.specify_serialize(node_tree.interface, None, self.ser_stgs.interface)
+        finally:
+            self.ser_context.pool.release()
+        self.serializer.schema.save()
+        return jinterface
 
-    def deserialize_preset(self, bl_context: bpy.types.Context, jpreset: dict, main_tree: bpy.types.NodeTree|None = None, is_add_nodes_to_new_tree: bool = False):
-        """main_tree: the dst node tree to deserialize into, if None, use the current edit tree."""
+    def deserialize_preset(self, bl_context: bpy.types.Context, jpreset: dict, main_tree: bpy.types.NodeTree|None = None, is_add_nodes_to_new_tree: bool = False,
+                           jnode_tree_hashes: dict[str, str]|None = None):
+        """
+        main_tree: the dst node tree to deserialize into, if None, use the current edit tree.
+        jnode_tree_hashes: {group name: content hash} of the groups, see NodeTreeStore.get_hash_by_name(). Groups with no hash are not reused by the stamp.
+        """
         if not jpreset:
             return
         # start_time = time.time()
-        self.deser_context.init_on_deserializing_preset(bl_context, jpreset, main_tree, is_add_nodes_to_new_tree=is_add_nodes_to_new_tree)
+        self.deser_context.init_on_deserializing_preset(bl_context, jpreset, main_tree, is_add_nodes_to_new_tree=is_add_nodes_to_new_tree, jnode_tree_hashes=jnode_tree_hashes)
         self.deserializer.specify_deserialize(self.deser_context.main_tree, jpreset, self.deser_stgs.preset)
         # end_time = time.time()
         # print(f"[HOT NODE DEV] Deserialize preset took {end_time - start_time:.4f} seconds")
\ No newline at end of file
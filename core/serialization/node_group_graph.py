@@ -0,0 +1,109 @@
+import bpy
+
+from ...utils import constants
+
+
+class NodeGroupGraph:
+    """
+    Dependency graph of the node groups a preset needs, built once per save / load.
+    Every group is visited once no matter how many group nodes use it, so shared groups (diamond dependencies) are cheap.
+    The serializer records the edges into HN@data.node_tree_deps, the deserializer rebuilds the graph from them
+    to create groups in dependency order without walking the node trees.
+    """
+    def __init__(self):
+        self.deps: dict[str, list[str]] = {} # group name -> names of the groups its nodes use directly
+        self.roots: list[str] = [] # groups used directly by the main tree
+        self.order: list[str] = [] # dependencies first, i.e. a group always comes after the groups it uses
+        self.depths: dict[str, int] = {} # longest path from the main tree, 1 means used by the main tree directly
+        self.cyclic_names: list[str] = [] # groups found in a cycle, their back edges are ignored
+
+    @classmethod
+    def from_main_tree(cls, main_tree: bpy.types.NodeTree, is_selected_only: bool = True) -> 'NodeGroupGraph':
+        """Build the graph of groups used by the (selected) nodes of the main tree, recursively."""
+        graph = cls()
+        graph.roots = cls.get_sub_tree_names(main_tree, is_selected_only)
+        stack = list(graph.roots)
+        while stack:
+            name = stack.pop()
+            if name in graph.deps:
+                continue
+            sub_tree_names = cls.get_sub_tree_names(bpy.data.node_groups[name])
+            graph.deps[name] = sub_tree_names
+            stack.extend(sub_tree_names)
+        graph.resolve()
+        return graph
+
+    @classmethod
+    def from_jdeps(cls, jdeps: dict[str, list[str]]|None, names: list[str]) -> 'NodeGroupGraph':
+        """
+        Build the graph from the recorded edges.
+
+        :param jdeps: HN@data.node_tree_deps, None if the preset is saved before we record it.
+        :param names: All the group names in the preset, their order is kept when there is no recorded edge.
+        """
+        graph = cls()
+        jdeps = jdeps or {}
+        name_set = set(names)
+        for name in names:
+            graph.deps[name] = [sub_name for sub_name in jdeps.get(name, []) if sub_name in name_set]
+        used_names = {sub_name for sub_names in graph.deps.values() for sub_name in sub_names}
+        graph.roots = [name for name in names if name not in used_names]
+        graph.resolve()
+        return graph
+
+    @staticmethod
+    def get_sub_tree_names(node_tree: bpy.types.NodeTree, is_selected_only: bool = False) -> list[str]:
+        """Names of the groups used directly by the nodes of the node tree, without duplicates."""
+        names = {}
+        for node in node_tree.nodes:
+            if is_selected_only and not node.select:
+                continue
+            if node.bl_idname in constants.NODE_GROUP_IDNAMES and node.node_tree is not None:
+                names[node.node_tree.name] = None
+        return list(names)
+
+    def resolve(self):
+        """Topological sort from the roots by iterative DFS, detect cycles, then compute the depths."""
+        # 0: not visited, 1: visiting, 2: done
+        states: dict[str, int] = {}
+        postorder: list[str] = []
+        back_edges: set[tuple[str, str]] = set()
+        for root in self.roots:
+            if states.get(root):
+                continue
+            states[root] = 1
+            stack = [(root, iter(self.deps.get(root, ())))]
+            while stack:
+                name, sub_names = stack[-1]
+                for sub_name in sub_names:
+                    state = states.get(sub_name, 0)
+                    if state == 0:
+                        states[sub_name] = 1
+                        stack.append((sub_name, iter(self.deps.get(sub_name, ()))))
+                        break
+                    elif state == 1:
+                        back_edges.add((name, sub_name))
+                        if sub_name not in self.cyclic_names:
+                            self.cyclic_names.append(sub_name)
+                else:
+                    states[name] = 2
+                    postorder.append(name)
+                    stack.pop()
+        # a group may only be reachable through a cycle if the recorded roots are broken, keep it anyway
+        for name in self.deps:
+            if not states.get(name):
+                states[name] = 2
+                postorder.append(name)
+
+        # parents come before children in the reversed postorder, relax the longest path
+        self.depths = {name: 1 for name in postorder}
+        for name in reversed(postorder):
+            for sub_name in self.deps.get(name, ()):
+                if (name, sub_name) not in back_edges and self.depths[sub_name] < self.depths[name] + 1:
+                    self.depths[sub_name] = self.depths[name] + 1
+        # deeper groups first, this is also a topological order and keeps the order we used to save groups in
+        postorder_idx = {name: i for i, name in enumerate(postorder)}
+        self.order = sorted(postorder, key=lambda name: (-self.depths[name], postorder_idx[name]))
+
+    def serialize(self) -> dict[str, list[str]]:
+        return {name: list(sub_names) for name, sub_names in self.deps.items()}
@@ -1,4 +1,5 @@
 from .stg import *
+from ..stg_registry import StgRegistry
 
 class Adapter():
     """This class defines the stgs with adaption to the current Blender version."""
@@ -27,6 +28,7 @@ class Adapter():
             self._stg_list_node: list[Stg] = None
             self._stg_list_interface_item: list[Stg] = None
             self._stg_list_all: list[Stg] = None
+            self.registry = StgRegistry() # type -> stg memo, cleared when stgs are reloaded
             
         # use property to uncoupled stg/stg_list definitions for defferent versions
         @property
@@ -131,6 +133,7 @@ class Adapter():
             
     def load_stgs(self, blender_version: list[int, int, int]):
         stgs = self.stgs
+        stgs.registry.clear()
         if blender_version == [2, 93, 0]:
             pass
         else:
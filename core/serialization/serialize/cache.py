@@ -0,0 +1,118 @@
+import json
+from collections import OrderedDict
+
+import bpy
+from bpy.app.handlers import persistent
+
+
+@persistent
+def stamp_updated_node_trees(scene, depsgraph):
+    NodeTreeCache.on_depsgraph_update(depsgraph)
+
+
+@persistent
+def clear_node_tree_cache(*_):
+    # undo / redo / loading a file replace the datablocks without reporting updates
+    NodeTreeCache.clear()
+
+
+class NodeTreeCache:
+    """
+    Session cache of serialized node groups, so overwriting presets sharing a big group library only pays for the groups that changed.
+    A group is keyed by its session_uid, and its fingerprint is cheap: name, node & link count, the number of depsgraph updates
+    reported for it, and the fingerprints of the groups it uses (their names and interfaces go into its group nodes).
+    The depsgraph only reports groups used by the scene, the others are serialized on every save as before.
+    """
+    MAX_SIZE = 64
+
+    # session_uid -> (fingerprint, json text of jnode_tree), the text is loaded on every hit so callers get their own copy
+    entries: OrderedDict[int, tuple[tuple, str]] = OrderedDict()
+    stamps: dict[int, int] = {} # session_uid -> number of depsgraph updates reported
+    # groups the compare pool added fnodes to in the last save, their next update is ours and doesn't change the stamp
+    pooled_keys: set[int] = set()
+    is_enabled = False
+
+    @classmethod
+    def enable(cls):
+        """Start counting the updates, called on the first put, the cache is empty before it."""
+        if not cls.is_enabled:
+            cls.is_enabled = True
+            if stamp_updated_node_trees not in bpy.app.handlers.depsgraph_update_post:
+                bpy.app.handlers.depsgraph_update_post.append(stamp_updated_node_trees)
+            for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+                if clear_node_tree_cache not in handlers:
+                    handlers.append(clear_node_tree_cache)
+
+    @classmethod
+    def disable(cls):
+        if stamp_updated_node_trees in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.remove(stamp_updated_node_trees)
+        for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+            if clear_node_tree_cache in handlers:
+                handlers.remove(clear_node_tree_cache)
+        cls.is_enabled = False
+        cls.clear()
+
+    @classmethod
+    def clear(cls):
+        cls.entries.clear()
+        cls.stamps.clear()
+        cls.pooled_keys.clear()
+
+    @classmethod
+    def on_depsgraph_update(cls, depsgraph: bpy.types.Depsgraph):
+        stamps = cls.stamps
+        for update in depsgraph.updates:
+            id = update.id
+            if isinstance(id, bpy.types.NodeTree):
+                key = id.original.session_uid
+                if key in cls.pooled_keys:
+                    continue
+                stamps[key] = stamps.get(key, 0) + 1
+            elif isinstance(id, bpy.types.Image):
+                # image nodes serialize the fields of their image
+                cls.entries.clear()
+        # only the first update after a save carries the changes of the compare pool
+        cls.pooled_keys.clear()
+
+    @staticmethod
+    def get_tracked_keys(bl_context: bpy.types.Context) -> set[int]:
+        """session_uid of the node groups in the depsgraph, edits of the others are not reported so they can't be cached."""
+        depsgraph = bl_context.evaluated_depsgraph_get()
+        return {id.original.session_uid for id in depsgraph.ids if isinstance(id, bpy.types.NodeTree)}
+
+    @classmethod
+    def fingerprint(cls, node_tree: bpy.types.NodeTree, tracked_keys: set[int], sub_fingerprints: list[tuple|None]) -> tuple|None:
+        """None if the group can't be cached, i.e. it or a group it uses is not in the depsgraph."""
+        key = node_tree.session_uid
+        if key not in tracked_keys or None in sub_fingerprints:
+            return None
+        return (node_tree.name, len(node_tree.nodes), len(node_tree.links), cls.stamps.get(key, 0), tuple(sub_fingerprints))
+
+    @classmethod
+    def get(cls, node_tree: bpy.types.NodeTree, fingerprint: tuple|None) -> dict|None:
+        """Get a copy of the cached jnode_tree, None if not cached or the node group changed."""
+        if fingerprint is None:
+            return None
+        key = node_tree.session_uid
+        entry = cls.entries.get(key)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        cls.entries.move_to_end(key)
+        return json.loads(entry[1])
+
+    @classmethod
+    def put(cls, node_tree: bpy.types.NodeTree, fingerprint: tuple|None, jnode_tree: dict, is_pooled: bool):
+        """
+        :param is_pooled: Whether the compare pool added fnodes to the group, removing them is reported as an update of the group.
+        """
+        if fingerprint is None:
+            return
+        cls.enable()
+        key = node_tree.session_uid
+        if is_pooled:
+            cls.pooled_keys.add(key)
+        cls.entries[key] = (fingerprint, json.dumps(jnode_tree, ensure_ascii=False))
+        cls.entries.move_to_end(key)
+        while len(cls.entries) > cls.MAX_SIZE:
+            cls.entries.popitem(last=False)
@@ -0,0 +1,74 @@
+import bpy
+
+
+class ComparePool:
+    """
+    Comparison objects (fnode / fitem / fimage) of one save operation, used to cull default values
+    when the defaults are not in the schema, e.g. group nodes, group io nodes and third-party nodes.
+    Objects are created on first request, reused by key within the save, and removed together in release().
+    """
+    def __init__(self):
+        # (node_tree pointer, bl_idname) -> fnode, the fnode lives in the tree being serialized because
+        # some defaults (e.g. sockets of group io nodes) depend on the tree
+        self.fnode_by_key: dict[tuple[int, str], bpy.types.Node] = {}
+        self.node_tree_by_pointer: dict[int, bpy.types.NodeTree] = {}
+        # tree bl_idname -> temp tree holding the fitems
+        self.compare_tree_by_idname: dict[str, bpy.types.NodeTree] = {}
+        # (tree bl_idname, item_type, socket_type, in_out) -> fitem
+        self.fitem_by_key: dict[tuple, bpy.types.NodeTreeInterfaceItem] = {}
+        self.fimage: bpy.types.Image = None
+
+    def get_fnode(self, node_tree: bpy.types.NodeTree, node: bpy.types.Node) -> bpy.types.Node:
+        """Get a fresh node of the same type in the same tree. Stgs that change the fnode (e.g. NodeGroupStg) should reset it before use."""
+        pointer = node_tree.as_pointer()
+        key = (pointer, node.bl_idname)
+        fnode = self.fnode_by_key.get(key)
+        if fnode is None:
+            fnode = node_tree.nodes.new(node.bl_idname)
+            fnode.select = False
+            self.fnode_by_key[key] = fnode
+            self.node_tree_by_pointer[pointer] = node_tree
+        return fnode
+
+    def is_node_tree_pooled(self, node_tree: bpy.types.NodeTree) -> bool:
+        """Whether fnodes are added to the tree in this save."""
+        return node_tree.as_pointer() in self.node_tree_by_pointer
+
+    def get_compare_tree(self, tree_idname: str) -> bpy.types.NodeTree:
+        compare_tree = self.compare_tree_by_idname.get(tree_idname)
+        if compare_tree is None:
+            compare_tree = bpy.data.node_groups.new("HN@TEMP_NODE_TREE_FOR_COMPARE", tree_idname)
+            self.compare_tree_by_idname[tree_idname] = compare_tree
+        return compare_tree
+
+    def get_fitem(self, tree_idname: str, item: bpy.types.NodeTreeInterfaceItem) -> bpy.types.NodeTreeInterfaceItem:
+        """Get a fresh interface item of the same type, in a temp tree of the given tree type."""
+        if item.item_type == 'SOCKET':
+            key = (tree_idname, item.item_type, item.socket_type, item.in_out)
+        else:
+            key = (tree_idname, item.item_type)
+        fitem = self.fitem_by_key.get(key)
+        if fitem is None:
+            finterface = self.get_compare_tree(tree_idname).interface
+            if item.item_type == 'SOCKET':
+                fitem = finterface.new_socket("HN@SOCKET_FOR_COMPARE", in_out=item.in_out, socket_type=item.socket_type)
+            else:
+                fitem = finterface.new_panel("HN@SOCKET_FOR_COMPARE")
+            self.fitem_by_key[key] = fitem
+        return fitem
+
+    def get_fimage(self) -> bpy.types.Image:
+        if self.fimage is None:
+            self.fimage = bpy.data.images.new("HN@IMAGE_FOR_COMPARE", width=1, height=1)
+        return self.fimage
+
+    def release(self):
+        """Remove all the comparison objects in one batch."""
+        for (pointer, _), fnode in self.fnode_by_key.items():
+            self.node_tree_by_pointer[pointer].nodes.remove(fnode)
+        # fitems are removed with their trees
+        for compare_tree in self.compare_tree_by_idname.values():
+            bpy.data.node_groups.remove(compare_tree)
+        if self.fimage is not None:
+            bpy.data.images.remove(self.fimage)
+        self.__init__()
@@ -0,0 +1,193 @@
+import bpy
+
+from ....utils import constants
+from ....utils.file_manager import FileManager
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .stg import Stg
+    from .serializer import Serializer
+
+
+class DefaultStruct:
+    """
+    Read-only stand-in of a comparison object (fnode, fimage, fitem...), built from the captured default values.
+    Attrs that were not captured raise AttributeError, so the serializer won't cull them.
+    """
+    __slots__ = ("_values",)
+
+    def __init__(self, values: dict):
+        self._values = values
+
+    def __getattr__(self, attr):
+        try:
+            return self._values[attr]
+        except KeyError:
+            raise AttributeError(attr)
+
+
+class DefaultCollection(list):
+    """Read-only stand-in of a bpy_prop_collection, items are DefaultStruct or None if not captured."""
+    pass
+
+
+class DefaultsSchema:
+    """
+    Default values of RNA types, used to cull default values without creating a throwaway object for every node / socket / image.
+    The schema is generated lazily by capturing a fresh object the first time a type is met, and is saved per BLENDER_VERSION in the runtime dir.
+    Only types whose defaults are context free are recorded, see is_node_recordable().
+
+    Structure of the json file:
+    {
+        "hot_node_version": [1, 0, 9],
+        "types": {
+            key: {"defaults": {attr: value | {"HN@struct": jstruct} | {"HN@coll": [jstruct|None, ...]}}, "props": {attr: [rna_type, is_readonly]}},
+        }
+    }
+    """
+    # max recursion level when capturing nested structs
+    MAX_LEVEL = 8
+
+    def __init__(self, serializer: 'Serializer'):
+        self.serializer = serializer
+        self.fm = FileManager()
+        self.jtypes: dict[str, dict] = None # loaded lazily
+        self.default_struct_by_key: dict[str, DefaultStruct] = {}
+        self.is_dirty = False
+
+    @property
+    def path(self):
+        return self.fm.schema_dir / f"{'_'.join(map(str, constants.BLENDER_VERSION))}.json"
+
+    def load(self):
+        self.jtypes = {}
+        self.default_struct_by_key.clear()
+        self.is_dirty = False
+        if not self.path.exists():
+            return
+        try:
+            jschema = self.fm.read_json(self.path)
+        except Exception:
+            # corrupted, will be regenerated
+            return
+        # the captured attrs depend on our stgs, so drop the schema generated by other hot node versions
+        if jschema.get("hot_node_version") == constants.HOT_NODE_VERSION:
+            self.jtypes = jschema.get("types", {})
+
+    def save(self):
+        """Save the schema if new types were recorded."""
+        if not self.is_dirty:
+            return
+        jschema = {
+            "hot_node_version": constants.HOT_NODE_VERSION,
+            "types": self.jtypes,
+        }
+        try:
+            self.fm.ensure_dir(self.fm.schema_dir)
+            self.fm.write_json(self.path, jschema)
+        except OSError:
+            pass
+        self.is_dirty = False
+
+    def get(self, key: str) -> DefaultStruct|None:
+        """Get the default struct of the key, None if the key is not recorded yet."""
+        default_struct = self.default_struct_by_key.get(key)
+        if default_struct is None:
+            if self.jtypes is None:
+                self.load()
+            jstruct = self.jtypes.get(key)
+            if jstruct is None:
+                return None
+            default_struct = self.decode_struct(jstruct)
+            self.default_struct_by_key[key] = default_struct
+        return default_struct
+
+    def record(self, key: str, fobj, stg: 'Stg') -> DefaultStruct:
+        """Capture the fresh object fobj as the defaults of the key. fobj can be removed after this."""
+        if self.jtypes is None:
+            self.load()
+        jstruct = self.capture_struct(fobj, stg)
+        self.jtypes[key] = jstruct
+        self.is_dirty = True
+        default_struct = self.decode_struct(jstruct)
+        self.default_struct_by_key[key] = default_struct
+        return default_struct
+
+    @staticmethod
+    def get_node_key(node_tree: bpy.types.NodeTree, node: bpy.types.Node) -> str:
+        return f"{node_tree.bl_idname}/{node.bl_idname}"
+
+    @staticmethod
+    def get_interface_item_key(node_tree: bpy.types.NodeTree, item: bpy.types.NodeTreeInterfaceItem) -> str:
+        if item.item_type == 'SOCKET':
+            return f"{node_tree.bl_idname}/SOCKET/{item.socket_type}/{item.in_out}"
+        return f"{node_tree.bl_idname}/{item.item_type}"
+
+    @staticmethod
+    def is_node_recordable(node: bpy.types.Node) -> bool:
+        """
+        Only built-in nodes whose defaults don't depend on the tree they are in can be recorded.
+        Defaults of group nodes and group io nodes depend on the node tree / interface,
+        and third-party nodes may change their defaults without a Blender version change.
+        """
+        bl_idname = node.bl_idname
+        return (node.__class__.__module__ == "bpy.types"
+                and bl_idname not in constants.NODE_GROUP_IDNAMES
+                and bl_idname not in ("NodeGroupInput", "NodeGroupOutput"))
+
+    def capture_struct(self, obj, stg: 'Stg', level: int = 0) -> dict:
+        """Capture the values the serializer will compare, i.e. the attrs planned by get_vbya with the same stg."""
+        serializer = self.serializer
+        jdefaults = {}
+        jprops = {}
+        bl_rna = getattr(obj, "bl_rna", None)
+        rna_props = bl_rna.properties if bl_rna is not None else {}
+        vbya, _ = serializer.get_vbya(obj, stg)
+        for attr, value in vbya.items():
+            if value is None:
+                continue
+            jvalue = self.capture_value(value, serializer.get_stg(value), level)
+            if jvalue is None:
+                continue
+            jdefaults[attr] = jvalue
+            prop = rna_props.get(attr)
+            if prop is not None:
+                jprops[attr] = [prop.type, prop.is_readonly]
+        return {"defaults": jdefaults, "props": jprops}
+
+    def capture_value(self, value, value_stg: 'Stg', level: int):
+        """Return the json value to compare with, None if the value can't be captured (it will be serialized without culling)."""
+        stgs = self.serializer.stgs
+        if value_stg is stgs.basic:
+            return value
+        elif value_stg is stgs.flat_vector:
+            jlist = list(value)
+            if all(isinstance(item, (int, float, bool)) for item in jlist):
+                return jlist
+        elif level >= self.MAX_LEVEL:
+            return None
+        elif value_stg is stgs.bpy_prop_collection:
+            jitems = []
+            for item in value:
+                item_stg = self.serializer.get_stg(item)
+                if item_stg in (stgs.node_socket, stgs.node_item, stgs.common_type, stgs.fallback):
+                    jitems.append(self.capture_struct(item, item_stg, level + 1))
+                else:
+                    jitems.append(self.capture_value(item, item_stg, level + 1))
+            return {"HN@coll": jitems}
+        elif value_stg in (stgs.node_socket, stgs.node_item, stgs.common_type):
+            return {"HN@struct": self.capture_struct(value, value_stg, level + 1)}
+        # node refs, images... their stgs don't compare with the default value
+        return None
+
+    def decode_struct(self, jstruct: dict) -> DefaultStruct:
+        return DefaultStruct({attr: self.decode_value(jvalue) for attr, jvalue in jstruct["defaults"].items()})
+
+    def decode_value(self, jvalue):
+        if isinstance(jvalue, dict):
+            if "HN@coll" in jvalue:
+                return DefaultCollection(self.decode_struct(jitem) if isinstance(jitem, dict) and "defaults" in jitem else self.decode_value(jitem)
+                                         for jitem in jvalue["HN@coll"])
+            if "HN@struct" in jvalue:
+                return self.decode_struct(jvalue["HN@struct"])
+        return jvalue
@@ -1,6 +1,9 @@
 import bpy
 
 from ....utils import utils
+from .schema import DefaultsSchema
+from .pool import ComparePool
+from ..node_group_graph import NodeGroupGraph
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -25,16 +28,18 @@ class Context:
         self.node: bpy.types.Node = None
         self.prev_obj: object = None # the object calling the dispatch/search/specify serialize
 
-        self.fsockets = None # items_tree of finterface for comparing default value
-        self.fnode_by_bl_idname: dict[str, bpy.types.Node] = {} # for comparing
+        self.pool = ComparePool() # fnodes / fitems / fimage for comparing, released after each save
         self.fnode: bpy.types.Node = None
 
         # self.main_tree_jnode_frames_with_children: set[bpy.types.Node] = set()
 
+        self.node_group_graph: NodeGroupGraph = None # groups the preset needs, built once per save
         self.preset_name_when_only_one_node = None
         self.obj_tree: list = []
         
     def init_on_serializing_preset(self, bl_context: bpy.types.Context, main_tree: bpy.types.NodeTree|None = None):
+        # in case the last serialization was interrupted before releasing
+        self.pool.release()
         self.__init__()
         self.bl_context = bl_context
         self.user_prefs = utils.get_user_prefs(bl_context)
@@ -52,6 +57,7 @@ class Serializer:
         self.context = Context()
         self.manager: 'SerializationManager' = manager
         self.stgs: 'Adapter.Stgs' = manager.ser_stgs
+        self.schema = DefaultsSchema(self) # recorded default values to compare with
         # give the serializer and the stgs ref to each stg
         for stg in self.stgs.stg_list_all:
             stg.serializer = self
@@ -59,49 +65,21 @@ class Serializer:
             stg.context = self.context
 
     def get_vbya(self, obj, stg: 'Stg'):
-        # TODO use map to speed up
         attr_list = None
         for attr_list in stg.attr_lists:
             # find the first valid attr_list if there are multiple attr_lists
             if attr_list.is_valid():
                 break
-
-        attrs = dir(obj)
-        if attr_list is None:
-            # dont have white or black attrs, serialize all attrs, except private & bl_ & callable & rna
-            vbya = {attr: getattr(obj, attr) 
-                    for attr in attrs if
-                    not attr.startswith("__")
-                    and not attr.startswith("bl_")
-                    and not attr == "rna_type"
-                    and not callable(getattr(obj, attr))}
-        elif attr_list.is_white_only:
-            # only serialize white attrs
-            vbya = {attr: getattr(obj, attr) for attr in attr_list.w if hasattr(obj, attr)}
-        else:
-            # use white and black attrs
-            vbya = {
-                attr: getattr(obj, attr) 
-                for attr in attrs if
-                    attr in attr_list.w 
-                    or not attr.startswith("__")
-                    and not attr.startswith("bl_")
-                    and not attr == "rna_type"
-                    and not attr in attr_list.b
-                    and not callable(getattr(obj, attr))}
+        # the attrs to read are planned once per rna type & stg & attr_list, see StgRegistry.build_attr_plan
+        attrs = self.stgs.registry.get_attr_plan(obj, stg, attr_list)
+        vbya = {attr: getattr(obj, attr) for attr in attrs}
         return vbya, attr_list
 
     def get_stg(self, obj, stg_list: 'list[Stg]|None' = None) -> 'Stg':
-        """Loop the stgs to find the stg of the given object."""
-        # TODO Type Mapping
+        """Find the stg of the given object, memoized by the object's type in the stgs registry."""
         if stg_list is None:
             stg_list = self.stgs.stg_list_core
-
-        for stg in stg_list:
-            if isinstance(obj, stg.types):
-                return stg
-
-        return self.stgs.stg_list_core[-1]
+        return self.stgs.registry.get_stg(obj.__class__, stg_list, self.stgs.stg_list_core[-1])
 
     def dispatch_serialize(self, obj, fobj: object|None, stg: 'Stg|None' = None):
         """
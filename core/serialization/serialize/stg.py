@@ -2,6 +2,9 @@ import bpy
 import mathutils
 from ....utils import constants
 from ....utils import utils
+from .schema import DefaultCollection
+from .cache import NodeTreeCache
+from ..node_group_graph import NodeGroupGraph
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -13,8 +16,9 @@ class Attrlist:
     """
     A class to hold the attribute name list.
     This is used to store the white and black attrs of the stg.
+    The white attrs keep their declared order, attrs are deserialized in it.
     """
-    def __init__(self, w: set[str] = set(), b: set[str] = set(), is_white_only: bool = False, is_valid_func: callable = lambda: True):
+    def __init__(self, w: dict[str, None] = {}, b: set[str] = set(), is_white_only: bool = False, is_valid_func: callable = lambda: True):
         self.w = w
         self.b = b
         self.is_white_only = is_white_only
@@ -67,7 +71,7 @@ class Stg:
         :param is_white_only: Whether the stg only has white attrs.
         :param is_valid_func: A function to check if the attr list is valid.
         """
-        self.attr_lists.append(Attrlist(set(w), set(b), is_white_only, is_valid_func))
+        self.attr_lists.append(Attrlist(dict.fromkeys(w), set(b), is_white_only, is_valid_func))
         
     def clear_attr_lists(self):
         """
@@ -112,15 +116,25 @@ class PresetStg(Stg):
         jpreset = {}
         jnode_trees = {}
         jpreset["HN@node_trees"] = jnode_trees
-        sorted_ngs = self.record_node_group_names(main_tree)
+        # only the groups of selected nodes are needed when saving from the edit tree, the same as NodeTreeStg.parse_all
+        graph = NodeGroupGraph.from_main_tree(main_tree, is_selected_only=main_tree is self.context.edit_tree)
+        self.context.node_group_graph = graph
         
         # Parse NodeGroups
         self.stgs.node_tree.parse_all = True
         self.stgs.node_tree.is_main_tree = False
-        # sort ng name by level, ensure the lower ones are ranked first
-        for node_tree_name, level in sorted_ngs:
+        # dependencies first, ensure the lower ones are ranked first
+        tracked_keys = NodeTreeCache.get_tracked_keys(self.context.bl_context) if graph.order else set()
+        fingerprints = {}
+        for node_tree_name in graph.order:
             ng_tree = bpy.data.node_groups[node_tree_name]
-            jnode_tree = self.serializer.specify_serialize(ng_tree, None, self.stgs.node_tree)
+            # reuse the last serialization if the group didn't change
+            fingerprint = NodeTreeCache.fingerprint(ng_tree, tracked_keys, [fingerprints.get(name) for name in graph.deps[node_tree_name]])
+            fingerprints[node_tree_name] = fingerprint
+            jnode_tree = NodeTreeCache.get(ng_tree, fingerprint)
+            if jnode_tree is None:
+                jnode_tree = self.serializer.specify_serialize(ng_tree, None, self.stgs.node_tree)
+                NodeTreeCache.put(ng_tree, fingerprint, jnode_tree, self.context.pool.is_node_tree_pooled(ng_tree))
             # jnode_tree, _ = self.stgs.node_tree.serialize(None, ng_tree, None)
             jnode_trees[node_tree_name] = jnode_tree
         
@@ -168,29 +182,7 @@ class PresetStg(Stg):
             node_center[1] /= location_node_num
             
         jdata["node_center"] = node_center
-        
-    def record_node_group_names(self, node_tree: bpy.types.NodeTree, required_ng_lvls=None, level=1) -> list:
-        '''Record all node group the node tree need, and sort their name into a list by level descending order.
-        
-        - node_tree: The node_tree that need to record it's sub node trees.
-        - required_ngs: The dict reference for recursive call, keep None if is first called and it will be automatically created.
-        - lever: The number of layers of recursive calls, also means the ng level. Only for recursively call, for ranking ngs by their hierarchy.'''
-        if required_ng_lvls is None:
-            required_ng_lvls = {}
-        nodes = node_tree.nodes
-        for node in nodes:
-            # level > 1 means the node is in a node group so record them all
-            if level > 1 or node.select:
-                if node.bl_idname in constants.NODE_GROUP_IDNAMES and node.node_tree is not None:
-                    # record the deeper level
-                    if required_ng_lvls.get(node.node_tree.name, 0) < level:
-                        required_ng_lvls[node.node_tree.name] = level
-                    self.record_node_group_names(node.node_tree, required_ng_lvls=required_ng_lvls, level=level + 1)
-        if level == 1:
-            sorted_ngs = sorted(required_ng_lvls.items(), key = lambda x: x[1], reverse=True)
-            return sorted_ngs
-        else:
-            return required_ng_lvls
+        jdata["node_tree_deps"] = self.context.node_group_graph.serialize()
 
 
 class NodeTreeStg(Stg):
@@ -242,18 +234,18 @@ class InterfaceStg(Stg):
         # node group input & output should declear their sockets first. here we do this.
         jitems_tree = {}
         items_tree = interface.items_tree
-        fnode_tree: bpy.types.NodeTree = bpy.data.node_groups.new("HN@TEMP_NODE_TREE_FOR_COMPARE", self.context.node_tree.bl_idname)
-        finterface = fnode_tree.interface
+        schema = self.serializer.schema
         
         for i, item in enumerate(items_tree):
-            if item.item_type == 'SOCKET':
-                fitem = finterface.new_socket("HN@SOCKET_FOR_COMPARE", in_out=item.in_out, socket_type=item.socket_type)
-            elif item.item_type == 'PANEL':
-                fitem = finterface.new_panel("HN@SOCKET_FOR_COMPARE")
+            key = schema.get_interface_item_key(self.context.node_tree, item)
+            fitem = schema.get(key)
+            if fitem is None:
+                # the pooled temp tree is only needed when some item type is not in the schema yet
+                fitem = self.context.pool.get_fitem(self.context.node_tree.bl_idname, item)
+                fitem = schema.record(key, fitem, self.stgs.interface_item)
             jitem = self.serializer.specify_serialize(item, fitem, self.stgs.interface_item)
             jitems_tree[str(i)] = jitem
             
-        bpy.data.node_groups.remove(fnode_tree)
         return jitems_tree, True
 
 
@@ -286,39 +278,45 @@ class NodeLinksStg(Stg):
     def serialize(self, attr, links: bpy.types.NodeLinks, fobj):
         self.context.node_links = links
         jlinks = []
+        # node pointer -> {socket pointer: socket index}, built once per node
+        output_idx_maps: dict[int, dict[int, int]] = {}
+        input_idx_maps: dict[int, dict[int, int]] = {}
         for link in links:
             from_node = link.from_node
             to_node = link.to_node
-            from_socket = link.from_socket
-            to_socket = link.to_socket
             # create links for ng (because all nodes in ng are needed), and for selected
             if self.parse_all or from_node.select and to_node.select:
+                from_socket = link.from_socket
+                to_socket = link.to_socket
                 jlink = {}
                 jlink["HN@fn_n"] = from_node.name
                 jlink["HN@tn_n"] = to_node.name
-                outputs = from_node.outputs
-                length = len(outputs)
-                for i in range(length):
-                    # fortunatelly it seems like socket type have __eq__() function that allows we to use ==, and it works...
-                    if from_socket == outputs[i]:
-                        jlink["HN@fs_i"] = i
-                        jlink["HN@fs_bid"] = from_socket.bl_idname
-                        jlink["HN@fs_n"] = from_socket.name
-                        jlink["HN@fs_id"] = from_socket.identifier
-                        break
-                inputs = to_node.inputs
-                length = len(inputs)
-                for i in range(length):
-                    if to_socket == inputs[i]:
-                        jlink["HN@ts_i"] = i
-                        jlink["HN@ts_bid"] = to_socket.bl_idname
-                        jlink["HN@ts_n"] = to_socket.name
-                        jlink["HN@ts_id"] = to_socket.identifier
-                        break
+                i = self.get_socket_idx_map(output_idx_maps, from_node, from_node.outputs).get(from_socket.as_pointer())
+                if i is not None:
+                    jlink["HN@fs_i"] = i
+                    jlink["HN@fs_bid"] = from_socket.bl_idname
+                    jlink["HN@fs_n"] = from_socket.name
+                    jlink["HN@fs_id"] = from_socket.identifier
+                i = self.get_socket_idx_map(input_idx_maps, to_node, to_node.inputs).get(to_socket.as_pointer())
+                if i is not None:
+                    jlink["HN@ts_i"] = i
+                    jlink["HN@ts_bid"] = to_socket.bl_idname
+                    jlink["HN@ts_n"] = to_socket.name
+                    jlink["HN@ts_id"] = to_socket.identifier
                 if not link.is_valid:
                     jlink["HN@is_valid"] = False # only record user-made invalid links
                 jlinks.append(jlink)
         return jlinks, True
+    
+    @staticmethod
+    def get_socket_idx_map(idx_maps: dict[int, dict[int, int]], node: bpy.types.Node, sockets) -> dict[int, int]:
+        """Get the {socket pointer: index} map of the node's inputs/outputs, build it if the node is met the first time."""
+        node_pointer = node.as_pointer()
+        idx_map = idx_maps.get(node_pointer)
+        if idx_map is None:
+            idx_map = {socket.as_pointer(): i for i, socket in enumerate(sockets)}
+            idx_maps[node_pointer] = idx_map
+        return idx_map
 
 
 class NodesStg(Stg):
@@ -332,14 +330,23 @@ class NodesStg(Stg):
     def serialize(self, attr, nodes: bpy.types.Nodes, fobj):
         jnodes = {}
         self.context.nodes = nodes
-        for node in nodes:
+        schema = self.serializer.schema
+        pool = self.context.pool
+        # pooled fnodes are added to the nodes until the save ends, iterate a snapshot to skip them
+        for node in list(nodes):
             if self.parse_all or node.select:
-                bl_idname = node.bl_idname
                 name = node.name
-                fnode = nodes.new(bl_idname)
+                if schema.is_node_recordable(node):
+                    # compare with the recorded defaults, only new a fnode when the node type is met the first time
+                    key = schema.get_node_key(self.context.node_tree, node)
+                    fnode = schema.get(key)
+                    if fnode is None:
+                        fnode = pool.get_fnode(self.context.node_tree, node)
+                        fnode = schema.record(key, fnode, self.serializer.get_stg(fnode, self.stgs.stg_list_node))
+                else:
+                    fnode = pool.get_fnode(self.context.node_tree, node)
                 jnode = self.serializer.search_serialize(node, fnode, self.stgs.stg_list_node)
                 jnodes[name] = jnode
-                nodes.remove(fnode)
         # if not constants.IS_NODE_HAS_LOCATION_ABSOLUTE:
         if not constants.IS_NODE_HAS_LOCATION_ABSOLUTE:
             for name, jnode in jnodes.items():
@@ -368,7 +375,7 @@ class NodeStg(Stg):
     def pre_serialize(self, attr, node: bpy.types.Node, fobj):
         """Universal serialization steps before the actual serialization."""
         self.context.node = node
-        self.context.fnode = self.context.fnode_by_bl_idname.get(node.bl_idname)
+        self.context.fnode = fobj
         jnode = {}
         is_ref = False
         if attr is not None:
@@ -489,7 +496,13 @@ class ImageStg(Stg):
         if isinstance(self.context.obj_tree[-1], bpy.types.Image):
             return None, False
         jimage = {}
-        fimage = bpy.data.images.new("HN@IMAGE_FOR_COMPARE", width=1, height=1)
+        schema = self.serializer.schema
+        fimage = schema.get("Image")
+        fcolorspace_settings = schema.get("Image/colorspace_settings")
+        if fimage is None or fcolorspace_settings is None:
+            pooled_fimage = self.context.pool.get_fimage()
+            fimage = schema.record("Image", pooled_fimage, self)
+            fcolorspace_settings = schema.record("Image/colorspace_settings", pooled_fimage.colorspace_settings, self)
         image_path = image.filepath
         if image_path is not None and image_path.startswith("//"):
             image_path = bpy.path.abspath(image_path)
@@ -497,9 +510,8 @@ class ImageStg(Stg):
         jimage = self.serializer.dispatch_serialize(image, fimage, self)
         
         if image is not None:
-            jimage["colorspace_settings"] = self.serializer.dispatch_serialize(image.colorspace_settings, fimage.colorspace_settings, self)
+            jimage["colorspace_settings"] = self.serializer.dispatch_serialize(image.colorspace_settings, fcolorspace_settings, self)
         
-        fimage = bpy.data.images.remove(fimage)
         return jimage, True
 
 
@@ -512,8 +524,8 @@ class BpyPropCollectionStg(Stg):
     def serialize(self, attr, obj, fobj):
         jobj = {}
         is_length_same = False
-        # maybe fobj is None, so we need to check if fobj is a collection
-        if isinstance(fobj, bpy.types.bpy_prop_collection):
+        # maybe fobj is None, so we need to check if fobj is a collection (or the recorded default collection)
+        if isinstance(fobj, (bpy.types.bpy_prop_collection, DefaultCollection)):
             if len(fobj) == len(obj):
                 # only cull default if the items if the length is the same
                 is_length_same = True
@@ -557,7 +569,7 @@ class FlatVectorStg(Stg):
 
     def serialize(self, attr, obj, fobj):
         list_obj = list(obj)
-        list_fobj = list(fobj) if isinstance(fobj, self.types) else None
+        list_fobj = list(fobj) if isinstance(fobj, (*self.types, list)) else None
         need = (list_obj != list_fobj)
         return list_obj, need
 
@@ -0,0 +1,135 @@
+import bpy
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .serialize.stg import Stg as SerStg
+    from .deserialize.stg import Stg as DeserStg
+    from .serialize.stg import Attrlist as SerAttrlist
+    from .deserialize.stg import Attrlist as DeserAttrlist
+    Stg = SerStg | DeserStg
+    Attrlist = SerAttrlist | DeserAttrlist
+
+
+class StgRegistry:
+    """
+    Type indexed lookup table of stgs and attribute plans.
+    Resolving a stg by looping the stg list and checking isinstance/issubclass is called for every attribute we meet, 
+    so the result is memoized per concrete type & stg list. Similarly, the attrs to read from an object only depend on 
+    its RNA type, the stg and the selected Attrlist, so they are built once per type from bl_rna.properties and the python attrs of the class.
+    The owner (Adapter.Stgs) should call clear() when the stgs are reloaded.
+    """
+    def __init__(self):
+        # id(stg_list) -> (stg_list, {obj_type: stg}), keep the stg_list ref to make sure the id wont be reused
+        self.stg_by_type_by_list: dict[int, tuple[object, dict[type, 'Stg']]] = {}
+        # bpy.types class name -> class, for resolving HN@type strings
+        self.type_by_name: dict[str, type] = {}
+        # (obj_type, stg, attr_list, is_check_white) -> ordered attr names to read
+        self.attr_plan_by_key: dict[tuple, tuple[str]] = {}
+
+    def clear(self):
+        self.stg_by_type_by_list.clear()
+        self.type_by_name.clear()
+        self.attr_plan_by_key.clear()
+
+    def get_type(self, type_name: str) -> type|None:
+        """Get the bpy.types class by name, None if not found. Only hits are cached because classes may be registered later."""
+        obj_type = self.type_by_name.get(type_name)
+        if obj_type is None:
+            obj_type = getattr(bpy.types, type_name, None)
+            if obj_type is not None:
+                self.type_by_name[type_name] = obj_type
+        return obj_type
+
+    def get_stg(self, obj_type: type, stg_list: 'list[Stg]|Stg', fallback: 'Stg') -> 'Stg':
+        """
+        Get the first stg in the stg_list whose types contain obj_type (or its base classes), the result is cached.
+
+        :param obj_type: The concrete type of the object.
+        :param stg_list: The stgs to search, a single stg is also accepted.
+        :param fallback: Returned when no stg matches.
+        """
+        cached = self.stg_by_type_by_list.get(id(stg_list))
+        if cached is None:
+            cached = (stg_list, {})
+            self.stg_by_type_by_list[id(stg_list)] = cached
+        stg_by_type = cached[1]
+
+        stg = stg_by_type.get(obj_type)
+        if stg is None:
+            stg = self.search_stg(obj_type, stg_list, fallback)
+            stg_by_type[obj_type] = stg
+        return stg
+
+    @staticmethod
+    def search_stg(obj_type: type, stg_list: 'list[Stg]|Stg', fallback: 'Stg') -> 'Stg':
+        """The uncached linear search, the same rule as isinstance(obj, stg.types)."""
+        if not isinstance(stg_list, list):
+            stg_list = [stg_list]
+        for stg in stg_list:
+            if issubclass(obj_type, stg.types):
+                return stg
+        return fallback
+
+    def get_attr_plan(self, obj, stg: 'Stg', attr_list: 'Attrlist|None', is_check_white: bool = True) -> tuple[str]:
+        """
+        Get the ordered attr names to read from obj, the plan is shared by every instance of the same RNA type.
+        The python class is used as the key, it maps 1:1 to bl_rna.identifier but is cheaper to get.
+
+        :param obj: The object to get attrs from, only used to build the plan on first meet.
+        :param stg: The stg of the object.
+        :param attr_list: The selected Attrlist of the stg, None to read all attrs.
+        :param is_check_white: Whether to drop white attrs the object doesn't have when the attr_list is white only.
+        """
+        key = (obj.__class__, stg, attr_list, is_check_white)
+        plan = self.attr_plan_by_key.get(key)
+        if plan is None:
+            plan = self.build_attr_plan(obj, attr_list, is_check_white)
+            self.attr_plan_by_key[key] = plan
+        return plan
+
+    @staticmethod
+    def is_callable_attr(obj, attr: str) -> bool:
+        """Methods are skipped, and so are the attrs failing to get, the plan is built only once per type."""
+        try:
+            return callable(getattr(obj, attr))
+        except Exception:
+            return True
+
+    @staticmethod
+    def build_attr_plan(obj, attr_list: 'Attrlist|None', is_check_white: bool = True) -> tuple[str]:
+        """Build the attr plan, the same rules as filtering dir(obj): skip private, bl_, rna_type, callable and black attrs."""
+        if attr_list is not None and attr_list.is_white_only:
+            # white attrs keep their declared order, deserializing may depend on it (e.g. node_tree before the socket values)
+            if is_check_white:
+                return tuple(attr for attr in attr_list.w if hasattr(obj, attr))
+            return tuple(attr_list.w)
+
+        bl_rna = getattr(obj, "bl_rna", None)
+        if bl_rna is not None:
+            # rna properties are never callable, no need to get the value
+            attrs = [attr for attr in bl_rna.properties.keys()
+                     if not attr.startswith("bl_")
+                     and not attr == "rna_type"]
+            # python level attrs of the class aren't rna properties, e.g. @property of custom nodes, dir(obj) used to include them
+            rna_attrs = set(attrs)
+            attrs.extend(attr for attr in dir(type(obj))
+                         if attr not in rna_attrs
+                         and not attr.startswith("__")
+                         and not attr.startswith("bl_")
+                         and not attr == "rna_type"
+                         and not StgRegistry.is_callable_attr(obj, attr))
+        else:
+            attrs = [attr for attr in dir(obj)
+                     if not attr.startswith("__")
+                     and not attr.startswith("bl_")
+                     and not attr == "rna_type"
+                     and not callable(getattr(obj, attr))]
+        # keep the reflected attrs in the same order as dir(obj)
+        attrs.sort()
+        
+        if attr_list is not None:
+            attrs = [attr for attr in attrs if attr not in attr_list.b]
+            # white attrs not reflected follow in their declared order
+            reflected_attrs = set(attrs)
+            attrs.extend(attr for attr in attr_list.w if attr not in reflected_attrs and hasattr(obj, attr))
+        return tuple(attrs)
@@ -0,0 +1,174 @@
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import bpy
+
+from ..core.serialization.manager import SerializationManager
+from ..core.serialization.stg_registry import StgRegistry
+from ..core.serialization.serialize.stg import NodeLinksStg
+from ..utils.file_manager import FileManager
+
+
+def print_bench_result(header: str, baseline_time: float, optimized_time: float, count: int):
+    speedup = baseline_time / optimized_time if optimized_time > 0 else float("inf")
+    print(f"[Hot Node Bench] {header}: {count} calls".ljust(60)
+          + f"baseline {baseline_time:.4f}s  optimized {optimized_time:.4f}s  x{speedup:.2f}")
+
+
+def collect_attr_values(node_tree: bpy.types.NodeTree) -> list:
+    """Collect the nodes, sockets and the attribute values the serializer would resolve stgs for."""
+    objs = []
+    for node in node_tree.nodes:
+        objs.append(node)
+        for socket in (*node.inputs, *node.outputs):
+            objs.append(socket)
+            objs.extend(getattr(socket, attr) for attr in socket.bl_rna.properties.keys() if hasattr(socket, attr))
+        objs.extend(getattr(node, attr) for attr in node.bl_rna.properties.keys() if hasattr(node, attr))
+    return [obj for obj in objs if obj is not None]
+
+
+def bench_get_stg(context: bpy.types.Context, repeat: int = 20):
+    """Compare the linear stg search with the type indexed registry, on the values of the current edit tree."""
+    node_tree = context.space_data.edit_tree
+    if node_tree is None:
+        print("[Hot Node Bench] No edit tree.")
+        return
+    sm = SerializationManager()
+    serializer = sm.serializer
+    stgs = sm.ser_stgs
+    objs = collect_attr_values(node_tree) * repeat
+    fallback = stgs.stg_list_core[-1]
+
+    start_time = time.perf_counter()
+    for obj in objs:
+        StgRegistry.search_stg(obj.__class__, stgs.stg_list_core, fallback)
+    baseline_time = time.perf_counter() - start_time
+
+    stgs.registry.clear()
+    start_time = time.perf_counter()
+    for obj in objs:
+        serializer.get_stg(obj)
+    optimized_time = time.perf_counter() - start_time
+
+    print_bench_result("Serializer.get_stg", baseline_time, optimized_time, len(objs))
+
+
+def new_synthetic_tree(node_num: int, socket_num: int, link_num: int, seed: int = 0) -> tuple[bpy.types.NodeTree, bpy.types.NodeTree]:
+    """New a geometry node tree of node_num group nodes, each has socket_num inputs & outputs, randomly linked by link_num links."""
+    rand = random.Random(seed)
+    sub_tree = bpy.data.node_groups.new("HN@BENCH_SUB_TREE", "GeometryNodeTree")
+    for i in range(socket_num):
+        sub_tree.interface.new_socket(f"Input {i}", in_out='INPUT', socket_type='NodeSocketFloat')
+        sub_tree.interface.new_socket(f"Output {i}", in_out='OUTPUT', socket_type='NodeSocketFloat')
+    tree = bpy.data.node_groups.new("HN@BENCH_TREE", "GeometryNodeTree")
+    nodes = []
+    for i in range(node_num):
+        node = tree.nodes.new("GeometryNodeGroup")
+        node.node_tree = sub_tree
+        node.location = (i * 200.0, 0.0)
+        nodes.append(node)
+    for _ in range(link_num):
+        from_idx = rand.randrange(node_num - 1)
+        to_idx = rand.randrange(from_idx + 1, node_num)
+        from_socket = nodes[from_idx].outputs[rand.randrange(socket_num)]
+        to_socket = nodes[to_idx].inputs[rand.randrange(socket_num)]
+        tree.links.new(from_socket, to_socket)
+    return tree, sub_tree
+
+
+def serialize_links_linear(links: bpy.types.NodeLinks) -> list:
+    """The socket index resolution before the index map, for comparing."""
+    jlinks = []
+    for link in links:
+        jlink = {}
+        outputs = link.from_node.outputs
+        for i in range(len(outputs)):
+            if link.from_socket == outputs[i]:
+                jlink["HN@fs_i"] = i
+                break
+        inputs = link.to_node.inputs
+        for i in range(len(inputs)):
+            if link.to_socket == inputs[i]:
+                jlink["HN@ts_i"] = i
+                break
+        jlinks.append(jlink)
+    return jlinks
+
+
+def bench_node_links(context: bpy.types.Context, node_num: int = 200, socket_num: int = 32, link_num: int = 3000):
+    """Compare the linear socket index search with the socket index map on a synthetic tree."""
+    tree, sub_tree = new_synthetic_tree(node_num, socket_num, link_num)
+    links_stg = NodeLinksStg()
+    links_stg.parse_all = True
+    links_stg.context = SerializationManager().ser_context
+    try:
+        start_time = time.perf_counter()
+        jlinks_linear = serialize_links_linear(tree.links)
+        baseline_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        jlinks, _ = links_stg.serialize(None, tree.links, None)
+        optimized_time = time.perf_counter() - start_time
+
+        is_same = all(jlink["HN@fs_i"] == jlink_linear["HN@fs_i"] and jlink["HN@ts_i"] == jlink_linear["HN@ts_i"]
+                      for jlink, jlink_linear in zip(jlinks, jlinks_linear))
+        print_bench_result(f"NodeLinksStg ({node_num} nodes x {socket_num} sockets, same result: {is_same})", 
+                           baseline_time, optimized_time, len(tree.links))
+    finally:
+        bpy.data.node_groups.remove(tree)
+        bpy.data.node_groups.remove(sub_tree)
+
+
+def new_synthetic_jpreset(rand: random.Random, node_num: int) -> dict:
+    """A preset json shaped like the serialized ones, node_num math nodes linked in a chain."""
+    jnodes = {}
+    for i in range(node_num):
+        jnodes[f"Math.{i:03d}"] = {
+            "name": f"Math.{i:03d}",
+            "bl_idname": "ShaderNodeMath",
+            "location": [i * 200.0, rand.uniform(-500.0, 500.0)],
+            "operation": rand.choice(("ADD", "MULTIPLY", "POWER")),
+            "inputs": {str(j): {"default_value": rand.random()} for j in range(3)},
+        }
+    jlinks = [{"HN@fn_n": f"Math.{i:03d}", "HN@fs_i": 0, "HN@tn_n": f"Math.{i + 1:03d}", "HN@ts_i": 0} for i in range(node_num - 1)]
+    return {
+        "HN@node_trees": {"HN@main_tree": {"name": "HN@main_tree", "nodes": jnodes, "links": jlinks}},
+        "HN@data": {"node_center": [0.0, 0.0], "node_tree_deps": {}},
+        "HN@meta": {"name": "", "tree_type": "ShaderNodeTree", "is_separator": False},
+    }
+
+
+def bench_bulk_read_json(context: bpy.types.Context, preset_num: int = 5000, node_num: int = 40):
+    """Compare reading a synthetic preset library one file at a time with FileManager.read_jsons()."""
+    fm = FileManager()
+    rand = random.Random(0)
+    with tempfile.TemporaryDirectory(prefix="hot_node_bench_") as temp_dir:
+        paths = []
+        for i in range(preset_num):
+            path = Path(temp_dir) / f"Preset {i}.json"
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(new_synthetic_jpreset(rand, node_num), file)
+            paths.append(path)
+
+        start_time = time.perf_counter()
+        jpresets_serial = [fm.read_json(path) for path in paths]
+        baseline_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        jpresets_bulk = fm.read_jsons(paths)
+        optimized_time = time.perf_counter() - start_time
+
+        is_same = jpresets_serial == jpresets_bulk
+        print_bench_result(f"FileManager.read_jsons ({node_num} nodes each, same result: {is_same}, "
+                           f"process pool: {fm.is_process_pool_available()})", baseline_time, optimized_time, preset_num)
+
+
+# name: (label, func)
+BENCHES = {
+    "GET_STG": ("Get Stg", bench_get_stg),
+    "NODE_LINKS": ("Node Links", bench_node_links),
+    "BULK_READ_JSON": ("Bulk Read Json", bench_bulk_read_json),
+}
@@ -7,7 +7,7 @@ from bpy.props import StringProperty, BoolProperty, EnumProperty
 from bpy.app.translations import pgettext_iface as _
 
 
-from . import dev_func, dev_utils, dev_reload, dev_ui
+from . import dev_func, dev_utils, dev_reload, dev_ui, dev_bench
 from ..core.context.context import Context
 from ..utils import constants
 
@@ -216,9 +216,27 @@ class HOTNODE_OT_dev_run10(Operator):
         fm = Context.fm
         fm.open_path_with_default_browser(fm.app_data_dir)
         return {'FINISHED'}
+
+
+class HOTNODE_OT_dev_bench(Operator):
+    bl_idname = "hotnode.dev_bench"
+    bl_label = "Run Benchmark"
+    bl_description = "Run a micro-benchmark and print the result to the console"
+    bl_options = {'REGISTER'}
+    
+    bench: EnumProperty(
+        name="Benchmark",
+        items=[(name, label, "") for name, (label, func) in dev_bench.BENCHES.items()],
+    ) # type: ignore
+    
+    def execute(self, context):
+        label, func = dev_bench.BENCHES[self.bench]
+        func(context)
+        return {'FINISHED'}
     
 classes = (
     HOTNODE_OT_dev_reload,
+    HOTNODE_OT_dev_bench,
     HOTNODE_OT_dev_run1,
     HOTNODE_OT_dev_run2,
     HOTNODE_OT_dev_run3,
@@ -19,6 +19,7 @@ class HOTNODE_PT_dev_run(Panel):
         
         # Show Dev Ops
         col.operator(f"hotnode.dev_reload", icon='FILE_REFRESH')
+        col.operator_menu_enum("hotnode.dev_bench", "bench", icon='TIME')
         col.separator()
         for ops in dev_ops.classes:
             if ops.bl_idname.startswith("hotnode.dev_run"):
@@ -9,17 +9,21 @@ def enable_all():
     from .history import HistoryService
     from .sync import SyncService
     from .i18n import I18nService
+    from .pack_import import PackImportService
     from .versioning import VersioningService
+    from .watcher import WatcherService
     from ..core.context.context import Context
     from ..core.blender.ui import HOTNODE_PT_main
     from ..core.blender import operators
     from ..core.blender.ui_context import UIContext, UpdateHandler
     
+    WatcherService.enable()
     AutosaveService.enable(Context)
-    HistoryService.enable(HOTNODE_PT_main, operators, UpdateHandler)
+    HistoryService.enable(HOTNODE_PT_main, operators, UpdateHandler, Context)
     I18nService.enable()
     SyncService.enable(Context, UIContext)
     VersioningService.enable(Context)
+    PackImportService.enable()
 
 
 def disable_all():
@@ -27,14 +31,19 @@ def disable_all():
     from .autosave import AutosaveService
     from .history import HistoryService
     from .i18n import I18nService
+    from .pack_import import PackImportService
     from .sync import SyncService
     from .versioning import VersioningService
+    from .watcher import WatcherService
     
+    PackImportService().disable()
     AutosaveService().disable()
     HistoryService().disable()
     I18nService().disable()
     SyncService().disable()
     VersioningService().disable()
+    WatcherService().disable()
+    FileManager().flush_writes() # services may write metas on disable
     
     
 def enable_i18n():
@@ -51,8 +60,10 @@ class ServiceBase:
     AutosaveService = None
     HistoryService = None
     I18nService = None
+    PackImportService = None
     SyncService = None
     VersioningService = None
+    WatcherService = None
 
     @classmethod
     def enable(cls, *args, **kwargs):
@@ -1,4 +1,9 @@
+import hashlib
+import json
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
 
@@ -7,6 +12,7 @@ from pathlib import Path
 
 from . import ServiceBase
 from ..utils import utils
+from ..utils.blob_store import BlobStore
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -16,6 +22,16 @@ if TYPE_CHECKING:
 class AutosaveService(ServiceBase):
     context_cls: 'Context' = None # inject
     
+    STATE_FILE_NAME = ".autosave_state.json" # {pack_name: digest of the file stamps when last autosaved}, in the autosave dir
+    AUTOSAVE_STEM_PATTERN = r"^\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}_.+$"
+    executor: ThreadPoolExecutor = None # one worker snapshotting the dirty packs, so save_post returns immediately
+    # the state and the blob store are used by the worker and by the recovery on the main thread
+    lock = threading.Lock()
+    queued_digests: dict[str, str] = {} # digests of the packs queued but not snapshotted yet, so saving again won't queue them twice
+    # an autosave is a <timestamp>_<pack_name>.manifest over the blobs in hot_node_autosave/.blobs, unchanged presets cost nothing.
+    # autosaves of older versions are zips, they are still recovered and cleared
+    blob_store = BlobStore(lambda fm: fm.autosave_blob_dir, lambda fm: fm.autosave_dir)
+    
     @staticmethod
     def generate_timestamp_str():
         """2025-01-01T12-00-00 format."""
@@ -30,29 +46,40 @@ class AutosaveService(ServiceBase):
     @classmethod
     def on_enable(cls):
         # cls.autosave_packs()
+        cls.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="HotNodeAutosave")
         if cls.autosave_packs not in bpy.app.handlers.save_post:
             bpy.app.handlers.save_post.append(cls.autosave_packs)
     
     @classmethod
     def on_disable(cls):
-        cls.autosave_packs()
-        cls.clear_outdated_autosaves(utils.get_user_prefs().autosave_retention_days)
         if cls.autosave_packs in bpy.app.handlers.save_post:
             bpy.app.handlers.save_post.remove(cls.autosave_packs)
+        # blender may be exiting, finish the queued snapshots and snapshot the rest here
+        cls.executor.shutdown(wait=True)
+        cls.executor = None
+        cls.autosave_packs()
+        with cls.lock:
+            cls.clear_outdated_autosaves(*cls.get_retention())
 
     @classmethod
     def inject_dependencies(cls, context_cls: 'Context'):
         cls.context_cls = context_cls
         
+    @staticmethod
+    def get_retention() -> tuple[int, int, int]:
+        """(days, count per pack, size in MB) from the prefs, read on the main thread and passed to the worker."""
+        prefs = utils.get_user_prefs()
+        return prefs.autosave_retention_days, prefs.autosave_retention_count, prefs.autosave_retention_size_mb
+        
     @classmethod
-    def generate_autosave_zip_path(cls, pack: 'Pack'):
-        """Generate the autosave zip path for a given pack."""
+    def generate_autosave_path(cls, pack: 'Pack'):
+        """Generate the autosave manifest path for a given pack."""
         timestamp = cls.generate_timestamp_str()
-        return cls.fm.autosave_dir / f"{timestamp}_{pack.name}.zip"
+        return cls.fm.autosave_dir / f"{timestamp}_{pack.name}{BlobStore.MANIFEST_SUFFIX}"
     
     @classmethod
     def parse_autosave_zip_path(cls, zip_path: Path) -> tuple[str, str]:
-        """Parse the autosave zip path to get the pack timestamp_str / pack_name."""
+        """Parse the autosave zip / manifest path to get the pack timestamp_str / pack_name."""
         return cls.parse_autosave_zip_stem(zip_path.stem)
     
     @classmethod
@@ -70,23 +97,159 @@ class AutosaveService(ServiceBase):
         return int(datetime.now().timestamp()) - timestamp > days * 24 * 3600
     
     @classmethod
-    def autosave_packs(cls):
-        """Autosave the current context to disk."""
+    def get_autosaves(cls) -> list[tuple[str, str, Path]]:
+        """(timestamp_str, pack_name, path) of the autosave manifests and zips, the newest first."""
+        autosaves = []
+        if not cls.fm.autosave_dir.exists():
+            return autosaves
+        for path in cls.fm.autosave_dir.iterdir():
+            if path.suffix not in (".zip", BlobStore.MANIFEST_SUFFIX) or not re.match(cls.AUTOSAVE_STEM_PATTERN, path.stem):
+                continue
+            timestamp_str, pack_name = cls.parse_autosave_zip_stem(path.stem)
+            autosaves.append((timestamp_str, pack_name, path))
+        autosaves.sort(key=lambda autosave: (autosave[0], autosave[2].suffix == BlobStore.MANIFEST_SUFFIX), reverse=True)
+        return autosaves
+
+    @classmethod
+    def autosave_packs(cls, *_):
+        """Autosave the packs changed since their last autosave, snapshotted by the background worker if it's running. Also the save_post handler."""
+        cls.fm.flush_writes()
+        cls.fm.ensure_dir(cls.fm.autosave_dir)
+        state = cls.read_state()
+        jobs = []
         for pack in cls.context_cls.get_packs().values():
-            dst_zip_path = cls.generate_autosave_zip_path(pack)
-            cls.fm.zip_to(pack.pack_dir, dst_zip_path)
+            try:
+                digest = cls.get_pack_digest(pack.pack_dir)
+            except OSError:
+                continue
+            if cls.queued_digests.get(pack.name, state.get(pack.name)) != digest:
+                cls.queued_digests[pack.name] = digest
+                jobs.append((pack.name, pack.pack_dir, cls.generate_autosave_path(pack), digest))
+        if not jobs:
+            return
+        if cls.executor is not None:
+            cls.executor.submit(cls.snapshot_packs, jobs, cls.get_retention())
+        else:
+            cls.snapshot_packs(jobs, cls.get_retention())
+
+    @classmethod
+    def snapshot_packs(cls, jobs: list[tuple[str, Path, Path, str]], retention: tuple[int, int, int]):
+        """
+        Snapshot the (pack_name, pack_dir, manifest_path, digest) jobs into the blob store, record the digests and clear the autosaves out of the retention.
+        Never touches bpy, runs on the worker.
+        """
+        digests = {}
+        with cls.lock:
+            # other blender instances share the autosave dir, count the manifests on disk again
+            cls.blob_store.reset_refcounts()
+            latest_paths = {}
+            for _, pack_name, path in reversed(cls.get_autosaves()):
+                if path.suffix == BlobStore.MANIFEST_SUFFIX:
+                    latest_paths[pack_name] = path
+            for pack_name, pack_dir, manifest_path, digest in jobs:
+                # files unchanged since the latest snapshot of the pack are not read again
+                try:
+                    base_manifest = cls.fm.read_json(latest_paths[pack_name]) if pack_name in latest_paths else None
+                except (OSError, ValueError):
+                    base_manifest = None
+                try:
+                    if manifest_path.exists():
+                        # saved twice in a second
+                        cls.blob_store.release(manifest_path)
+                    cls.blob_store.snapshot(pack_dir, manifest_path, base_manifest)
+                except OSError as e:
+                    print(f"[Hot Node] Failed to autosave pack {pack_name}: {e}")
+                    continue
+                # the digest is taken before snapshotting, changes made meanwhile are snapshotted next time
+                digests[pack_name] = digest
+            state = cls.read_state()
+            state.update(digests)
+            cls.fm.write_json(cls.get_state_path(), state)
+            cls.clear_outdated_autosaves(*retention)
+        for pack_name, _, _, digest in jobs:
+            if cls.queued_digests.get(pack_name) == digest:
+                del cls.queued_digests[pack_name]
+
+    @classmethod
+    def get_state_path(cls) -> Path:
+        return cls.fm.autosave_dir / cls.STATE_FILE_NAME
+
+    @classmethod
+    def read_state(cls) -> dict[str, str]:
+        try:
+            return cls.fm.read_json(cls.get_state_path())
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def get_pack_digest(pack_dir: Path) -> str:
+        """Digest of the (path, mtime, size) of all files in the pack dir, no file is read."""
+        stamps = []
+        for root, dir_names, file_names in os.walk(pack_dir):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                stat = os.stat(os.path.join(root, file_name))
+                stamps.append((os.path.relpath(os.path.join(root, file_name), pack_dir), stat.st_mtime_ns, stat.st_size))
+        if not stamps and not os.path.isdir(pack_dir):
+            raise FileNotFoundError(pack_dir)
+        return hashlib.sha256(json.dumps(stamps).encode("utf-8")).hexdigest()
             
     @classmethod
-    def clear_outdated_autosaves(cls, days: int = 7):
-        """Clear outdated autosaves."""
+    def restore_autosave(cls, autosave_path: Path, dst_pack_dir: Path):
+        """Put the autosave back as the pack dir, a manifest is restored from the blob store and a zip is unzipped."""
+        if autosave_path.suffix != BlobStore.MANIFEST_SUFFIX:
+            cls.fm.unzip_to(autosave_path, dst_pack_dir)
+            return
+        with cls.lock:
+            cls.blob_store.restore(autosave_path, dst_pack_dir)
+
+    @classmethod
+    def remove_autosave(cls, autosave_path: Path) -> int:
+        """Remove the autosave, return the bytes freed. Call it with the lock held."""
+        if autosave_path.suffix == BlobStore.MANIFEST_SUFFIX:
+            return cls.blob_store.release(autosave_path)
+        try:
+            size = autosave_path.stat().st_size
+        except OSError:
+            return 0
+        cls.fm.remove_file(autosave_path)
+        return size
+
+    @classmethod
+    def clear_outdated_autosaves(cls, days: int = 7, count: int = 0, size_mb: int = 0):
+        """
+        Clear the autosaves older than days, the ones beyond the newest count of each pack,
+        then the oldest ones until the autosave dir fits in size_mb (the newest of each pack is always kept). 0 count / size_mb for no limit.
+        Call it with the lock held.
+        """
+        if not cls.fm.autosave_dir.exists():
+            return
         for zip_path in cls.fm.autosave_dir.glob("*.zip"):
-            pattern = r"^\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}_.*\.zip$"
-            zip_stem = zip_path.stem
-            if re.match(pattern, zip_stem):
-                timestamp_str, pack_name = cls.parse_autosave_zip_stem(zip_stem)
-                if cls.is_timestamp_str_overdated(timestamp_str, days):
-                    cls.fm.remove_file(zip_path)
+            if not re.match(cls.AUTOSAVE_STEM_PATTERN, zip_path.stem) and "_deprecated_" in zip_path.stem:
+                # Handle legacy autosave files, only keep _autosave_ legacy files
+                cls.fm.remove_file(zip_path)
+        pack_counts = {}
+        kept_autosaves = []
+        for timestamp_str, pack_name, path in cls.get_autosaves():
+            pack_counts[pack_name] = pack_counts.get(pack_name, 0) + 1
+            if cls.is_timestamp_str_overdated(timestamp_str, days) or 0 < count < pack_counts[pack_name]:
+                cls.remove_autosave(path)
             else:
-                if "_deprecated_" in zip_stem:
-                    # Handle legacy autosave files, only keep _autosave_ legacy files
-                    cls.fm.remove_file(zip_path)
\ No newline at end of file
+                kept_autosaves.append((pack_name, path))
+        if size_mb <= 0:
+            return
+        size_limit = size_mb * 1024 * 1024
+        size = cls.blob_store.get_size()
+        for _, path in kept_autosaves:
+            try:
+                size += path.stat().st_size
+            except OSError:
+                continue
+        newest_paths = {}
+        for pack_name, path in kept_autosaves:
+            newest_paths.setdefault(pack_name, path)
+        for pack_name, path in reversed(kept_autosaves):
+            if size <= size_limit:
+                break
+            if newest_paths[pack_name] != path:
+                size -= cls.remove_autosave(path)
@@ -1,3 +1,6 @@
+import hashlib
+import json
+import os
 import time
 from collections import deque
 from pathlib import Path
@@ -11,6 +14,8 @@ from bpy.app.translations import (
 from . import ServiceBase
 # from .sync import SyncService
 from ..utils import utils
+from ..utils import json_patch
+from ..utils.blob_store import BlobStore
 from ..utils.reporter import Reporter
 
 from typing import TYPE_CHECKING
@@ -18,10 +23,14 @@ if TYPE_CHECKING:
     from ..core.blender.ui import HOTNODE_PT_main
     from ..core.blender.ui_context import UpdateHandler, UIContext
     from ..core.blender import operators
+    from ..core.context.context import Context
     
 # NOTE In our undo/redo func, use str rather than ref to represent the pack, preset, because sync will change the ref.
 
 class Step():
+    # changed files of these suffixes are kept as patches against the current file, see compact_his_changed_files()
+    PATCH_SUFFIXES = (".json", ".meta")
+    
     def __init__(self, service: 'HistoryService', name: str|None = None, pusher: 'bpy.types.Operator|UpdateHandler|None' = None, jstep: dict = None):
         """Pass name and pusher if no jstep is given."""
         self.service = service
@@ -94,6 +103,11 @@ class Step():
         self.changed_paths = changed_paths
         self.his_changed_paths = self.push_his_files(changed_paths, type="change")
         
+    def set_trashed_paths(self, *deleted_paths: Path):
+        """Set the deleted paths for this step, they are moved to the trash now rather than copied to history."""
+        self.deleted_paths = list(deleted_paths)
+        self.his_deleted_paths = self.trash_files(deleted_paths)
+        
     def set_created_paths(self, *created_paths: Path):
         """Set the created paths for this step."""
         self.created_paths = created_paths
@@ -129,27 +143,53 @@ class Step():
         self.set_redo(undo_redo_callback, *undo_redo_callback_params)
         
     def push_his_files(self, src_paths: list[Path], type: str) -> list:
+        """Snapshot the paths into the blob store, return the manifest paths."""
         his_paths = []
         current_time = time.time()
         for i, src_path in enumerate(src_paths):
             identifier = "_".join((str(current_time), str(i), type))
-            dot_suffix = utils.get_dot_suffix(str(src_path), ".zip", ".json", ".meta")
-            if dot_suffix is None:
-                his_path = self.fm.history_file_dir / identifier
-                self.fm.copy_tree(src_path, his_path)
-            else:
-                dst_name = "".join((identifier, dot_suffix))
-                his_path = self.fm.history_file_dir / dst_name
-                self.fm.copy_file(src_path, his_path)
+            his_path = self.fm.history_file_dir / "".join((identifier, BlobStore.MANIFEST_SUFFIX))
+            self.service.blob_store.snapshot(src_path, his_path)
             his_paths.append(his_path)
         return his_paths
     
+    def trash_files(self, src_paths: list[Path], his_paths: list[Path]|None = None) -> list:
+        """
+        Move the paths to the trash in the runtime dir, return the trash paths. A rename, so it's constant time.
+        Pass his_paths to reuse the trash paths (redo). Paths that can't be renamed (e.g. a file is locked) are snapshot as usual.
+        """
+        trash_paths = []
+        current_time = time.time()
+        for i, src_path in enumerate(src_paths):
+            if his_paths is not None and self.fm.is_in_trash(his_paths[i]):
+                trash_path = his_paths[i]
+            else:
+                trash_path = self.fm.trash_dir / "_".join((str(current_time), str(i), src_path.name))
+            try:
+                self.fm.ensure_dir(trash_path.parent)
+                self.fm.move_path(src_path, trash_path)
+            except OSError:
+                trash_path = self.push_his_files([src_path], "delete")[0]
+                self.fm.remove_path(src_path)
+            trash_paths.append(trash_path)
+        return trash_paths
+    
     def pull_his_files(self, his_paths: list[Path], src_paths: list[Path]) -> list:
         """Pull the history files from his_paths."""
         path_num = len(src_paths)
         for i in range(path_num):
             src_path = src_paths[i]
             his_path = his_paths[i]
+            if self.fm.is_in_trash(his_path):
+                self.fm.remove_path(src_path) # remove renamed new items if exists
+                self.fm.move_path(his_path, src_path)
+                continue
+            if BlobStore.is_manifest(his_path):
+                # also removes renamed new items if exists
+                self.service.blob_store.restore(his_path, src_path)
+                self.service.blob_store.release(his_path)
+                continue
+            # full copies made before the blob store
             dot_suffix = utils.get_dot_suffix(str(src_path), ".zip", ".json", ".meta")
             if dot_suffix is None:
                 self.fm.remove_tree(src_path) # remove renamed new items if exists
@@ -162,48 +202,181 @@ class Step():
     
     def remove_his_files(self):
         """Remove the history files of this step."""
-        self.fm.remove_paths(self.his_changed_paths)
-        self.fm.remove_paths(self.his_created_paths)
-        self.fm.remove_paths(self.his_deleted_paths)
+        self.service.remove_his_paths(self.his_changed_paths)
+        self.service.remove_his_paths(self.his_created_paths)
+        self.service.remove_his_paths(self.his_deleted_paths)
+
+    def read_manifest(self, his_path: Path) -> dict|None:
+        """Get the manifest of a history file, None for the full copies made before the blob store."""
+        if not BlobStore.is_manifest(his_path):
+            return None
+        return self.fm.read_json(his_path)
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def encode_patch(patch: list[dict]) -> bytes:
+        return json.dumps(patch, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def compact_his_changed_files(self):
+        """
+        Replace the full snapshots of the changed json files with reverse patches against the files now, when the patch is much smaller.
+        Call it after the files are changed, i.e. when the step is saved.
+        """
+        self.fm.flush_writes()
+        blob_store = self.service.blob_store
+        current_time = time.time()
+        for i, (src_path, his_path) in enumerate(zip(self.changed_paths, self.his_changed_paths)):
+            if utils.get_dot_suffix(str(src_path), *self.PATCH_SUFFIXES) is None:
+                continue
+            manifest = self.read_manifest(his_path)
+            if manifest is None or manifest.get("type") != "file":
+                continue
+            try:
+                with open(src_path, 'rb') as f:
+                    data = f.read()
+                old_data = blob_store.read_bytes(manifest["hash"])
+                patch_data = self.encode_patch(json_patch.diff(json.loads(data), json.loads(old_data)))
+            except (OSError, ValueError):
+                continue
+            if len(patch_data) * 2 > len(old_data):
+                continue
+            new_his_path = self.fm.history_file_dir / "".join(("_".join((str(current_time), str(i), "patch")), BlobStore.MANIFEST_SUFFIX))
+            blob_store.snapshot_patch(patch_data, self.hash_bytes(data), new_his_path)
+            blob_store.release(his_path)
+            self.his_changed_paths[i] = new_his_path
+
+    def prepare_his_changed_files(self) -> list[tuple[bytes|None, dict|None]|None]:
+        """
+        Apply the patches of the changed json files in memory, before any file of the step is moved, so a patch can't leave the step half applied.
+        Return for each changed path: None for a full snapshot, or (the current data, the history version) for a patch.
+        The history version is None if the patch doesn't fit the file (changed outside the history), the file is then kept as it is.
+        """
+        self.fm.flush_writes()
+        blob_store = self.service.blob_store
+        prepared = []
+        for src_path, his_path in zip(self.changed_paths, self.his_changed_paths):
+            manifest = self.read_manifest(his_path)
+            if manifest is None or manifest.get("type") != "patch":
+                prepared.append(None)
+                continue
+            try:
+                with open(src_path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                print(f"[Hot Node] Can't restore {src_path} from the history: {e}")
+                prepared.append((None, None))
+                continue
+            try:
+                # a file changed outside the history may still fit the patch, e.g. only other keys are changed
+                jold = json_patch.apply(json.loads(data), json.loads(blob_store.read_bytes(manifest["hash"])))
+            except (OSError, ValueError) as e:
+                print(f"[Hot Node] Can't restore {src_path} from the history, it's changed outside the history: {e}")
+                jold = None
+            prepared.append((data, jold))
+        return prepared
+
+    def swap_his_changed_files(self, prepared: list[tuple[bytes|None, dict|None]|None]):
+        """Put the history version of the changed paths back, and keep the current version in the history for undo / redo. See prepare_his_changed_files()."""
+        self.fm.flush_writes()
+        full_idxs = [i for i, item in enumerate(prepared) if item is None]
+        src_paths = [self.changed_paths[i] for i in full_idxs]
+        new_his_changed_paths = list(self.his_changed_paths)
+        for i, his_path in zip(full_idxs, self.push_his_files(src_paths, "change")):
+            new_his_changed_paths[i] = his_path
+        self.pull_his_files([self.his_changed_paths[i] for i in full_idxs], src_paths)
+        current_time = time.time()
+        for i, item in enumerate(prepared):
+            if item is None:
+                continue
+            data, jold = item
+            if data is None:
+                # the file is gone, keep the patch in case it comes back
+                continue
+            if jold is None:
+                # the patch doesn't fit, keep the file, and a full snapshot of it as the other side of the step
+                new_his_changed_paths[i] = self.push_his_files([self.changed_paths[i]], "change")[0]
+                self.service.blob_store.release(self.his_changed_paths[i])
+                continue
+            new_his_path = self.fm.history_file_dir / "".join(("_".join((str(current_time), str(i), "patch")), BlobStore.MANIFEST_SUFFIX))
+            self.swap_patch(self.changed_paths[i], self.his_changed_paths[i], data, jold, new_his_path)
+            new_his_changed_paths[i] = new_his_path
+        self.his_changed_paths = new_his_changed_paths
+
+    def swap_patch(self, src_path: Path, his_path: Path, data: bytes, jold: dict, new_his_path: Path):
+        """Write the history version of the file, and save the patch turning it back to the current data as new_his_path."""
+        blob_store = self.service.blob_store
+        jcurrent = json.loads(data)
+        text = self.fm.encode_json(jold)
+        self.fm.write_json(src_path, jold)
+        blob_store.snapshot_patch(self.encode_patch(json_patch.diff(jold, jcurrent)), self.hash_bytes(text.encode("utf-8")), new_his_path)
+        blob_store.release(his_path)
+
+    def invalidate_cache(self):
+        """Files are restored by copying, their mtime may not change in a coarse filesystem tick, so drop them from the preset cache."""
+        self.service.context_cls.preset_cache.invalidate(*self.created_paths, *self.deleted_paths, *self.changed_paths)
 
     def undo(self, uic: 'UIContext'):
+        self.invalidate_cache()
+        prepared = self.prepare_his_changed_files()
         # Create Undo: push files to history
         self.his_created_paths = self.push_his_files(self.created_paths, "create")
         self.fm.remove_paths(self.created_paths)
         # Delete Undo: pull files back
         self.pull_his_files(self.his_deleted_paths, self.deleted_paths)
         # Change Undo: Push new to history and pull old from history
-        new_his_changed_paths = self.push_his_files(self.changed_paths, "change")
-        self.pull_his_files(self.his_changed_paths, self.changed_paths)
-        self.his_changed_paths = new_his_changed_paths
+        self.swap_his_changed_files(prepared)
         
         if self.undo_callback is not None:
             self.undo_callback(uic, *self.undo_callback_params)
 
     def redo(self, uic: 'UIContext'):
+        self.invalidate_cache()
+        prepared = self.prepare_his_changed_files()
         # Create Redo
         self.pull_his_files(self.his_created_paths, self.created_paths)
         # Delete Redo
-        self.his_deleted_paths = self.push_his_files(self.deleted_paths, "delete")
-        self.fm.remove_paths(self.deleted_paths)
+        if any(self.fm.is_in_trash(his_path) for his_path in self.his_deleted_paths):
+            self.his_deleted_paths = self.trash_files(self.deleted_paths, self.his_deleted_paths)
+        else:
+            self.his_deleted_paths = self.push_his_files(self.deleted_paths, "delete")
+            self.fm.remove_paths(self.deleted_paths)
         # Change Redo
-        new_his_changed_paths = self.push_his_files(self.changed_paths, "change")
-        self.pull_his_files(self.his_changed_paths, self.changed_paths)
-        self.his_changed_paths = new_his_changed_paths
+        self.swap_his_changed_files(prepared)
         
         if self.redo_callback is not None:
             self.redo_callback(uic, *self.redo_callback_params)
         
           
 class HistoryService(ServiceBase):
+    """
+    The history is shared by all instances through an append-only journal (.history.journal), one json record per line:
+    {"id": service id, "op": "snapshot" | "push" | "undo" | "redo" | "trim" | "discard", ...}.
+    Each change appends one record, and load_history() only reads the bytes appended since the last read.
+    The journal is compacted to a single snapshot record when it grows too long.
+    """
+    JOURNAL_COMPACT_RECORD_NUM = 512 # records since the last snapshot before compacting
+    # trashed paths no step refers to are only swept if they are older than this, the step may not be saved yet
+    TRASH_ORPHAN_MIN_AGE = 3600.0
+    
     jsteps: deque[dict] = deque(maxlen=256)
     jundone_steps: list[dict] = []
+    blob_store = BlobStore() # history files of the steps
+    
+    # where this instance is in the journal
+    journal_path: str = ""
+    journal_ino: int = None # the journal is replaced on compaction, read it again from the start then
+    journal_offset = 0
+    journal_record_num = 0
     
     is_service_session_match = False
     
     main_panel_cls: 'HOTNODE_PT_main' = None # Main Panel Class, need to inject
     operators_module: 'operators' = None
     update_handler_cls: 'UpdateHandler' = None
+    context_cls: 'Context' = None
 
     @classmethod
     def on_enable(cls):
@@ -213,16 +386,18 @@ class HistoryService(ServiceBase):
         bpy.app.timers.register(set_service_start_time)
         
         cls.load_history()
+        cls.sweep_trash()
         
     @classmethod
     def on_disable(cls):
         pass
         
     @classmethod
-    def inject_dependencies(cls, main_panel_cls: 'HOTNODE_PT_main', operators_module: 'operators', update_handler_cls: 'UpdateHandler'):
+    def inject_dependencies(cls, main_panel_cls: 'HOTNODE_PT_main', operators_module: 'operators', update_handler_cls: 'UpdateHandler', context_cls: 'Context'):
         cls.main_panel_cls = main_panel_cls
         cls.operators_module = operators_module
         cls.update_handler_cls = update_handler_cls
+        cls.context_cls = context_cls
 
     @classmethod
     def step(cls, name: str, pusher: 'bpy.types.Operator|UpdateHandler'):
@@ -235,6 +410,11 @@ class HistoryService(ServiceBase):
         step.deleted_paths = deleted_paths
         step.his_deleted_paths = step.push_his_files(deleted_paths, type="delete")
         
+    @classmethod
+    def set_trashed_paths(cls, step: Step, *deleted_paths: Path):
+        """Set the current step's deleted paths and move them to the trash now, for big paths like pack dirs."""
+        step.set_trashed_paths(*deleted_paths)
+        
     @classmethod
     def set_created_paths(cls, step: Step, *created_paths: Path):
         """Set the current step's created paths."""
@@ -282,38 +462,137 @@ class HistoryService(ServiceBase):
         
     @classmethod
     def ensure_sync(cls):
-        if cls.SyncService.is_enabled:
-            if not cls.SyncService.is_id_sync():
-                cls.load_history()
-        else:
-            cls.load_history() # costly
+        """Catch up with the records other instances appended, cheap if there are none."""
+        cls.load_history()
 
     @classmethod
     def load_history(cls):
-        """Read the history meta from disk."""
-        history_meta = cls.fm.read_json(cls.fm.history_meta_path)
-        cls.jsteps = deque(history_meta.get("steps", []), maxlen=256)
-        cls.jundone_steps = history_meta.get("undone_steps", [])
+        """Read the records appended to the journal since the last read, or the whole journal if it's replaced."""
+        path = cls.fm.history_journal_path
+        if not path.exists():
+            cls.migrate_legacy_history()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            cls.reset_journal_state()
+            return
+        is_reread = str(path) != cls.journal_path or stat.st_ino != cls.journal_ino or stat.st_size < cls.journal_offset
+        if is_reread:
+            cls.reset_journal_state()
+            cls.journal_path = str(path)
+            cls.journal_ino = stat.st_ino
+        elif stat.st_size == cls.journal_offset:
+            return
+        with open(path, 'rb') as f:
+            f.seek(cls.journal_offset)
+            data = f.read()
+        # a record being appended by other instances is read next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # broken by a crash while appending
+                continue
+            # our own records are applied when appended
+            if not is_reread and record.get("id") == cls.ID:
+                continue
+            cls.apply_record(record)
+        cls.journal_offset += end
+        # other instances may have pushed / discarded steps
+        cls.blob_store.reset_refcounts()
         cls.clamp_step_num()
-        
+
+    @classmethod
+    def reset_journal_state(cls):
+        cls.jsteps = deque(maxlen=256)
+        cls.jundone_steps = []
+        cls.journal_path = ""
+        cls.journal_ino = None
+        cls.journal_offset = 0
+        cls.journal_record_num = 0
+
+    @classmethod
+    def migrate_legacy_history(cls):
+        """Start the journal from the .history.json of old versions if there is one."""
+        try:
+            history_meta = cls.fm.read_json(cls.fm.history_meta_path)
+        except (OSError, ValueError):
+            return
+        if history_meta.get("steps") or history_meta.get("undone_steps"):
+            cls.jsteps = deque(history_meta.get("steps", []), maxlen=256)
+            cls.jundone_steps = history_meta.get("undone_steps", [])
+            cls.save_history()
+
+    @classmethod
+    def apply_record(cls, record: dict):
+        op = record.get("op")
+        if op == "snapshot":
+            cls.jsteps = deque(record.get("steps", []), maxlen=256)
+            cls.jundone_steps = list(record.get("undone_steps", []))
+            cls.journal_record_num = 0
+            return
+        if op == "push":
+            cls.jsteps.appendleft(record["jstep"])
+        elif op == "undo":
+            if cls.jsteps:
+                cls.jsteps.popleft()
+            cls.jundone_steps.append(record["jstep"])
+        elif op == "redo":
+            if cls.jundone_steps:
+                cls.jundone_steps.pop()
+            cls.jsteps.appendleft(record["jstep"])
+        elif op == "trim":
+            for _ in range(min(record.get("num", 0), len(cls.jsteps))):
+                cls.jsteps.pop()
+        elif op == "discard":
+            if record.get("key") == "steps":
+                cls.jsteps.clear()
+            elif record.get("key") == "undone_steps":
+                cls.jundone_steps.clear()
+        cls.journal_record_num += 1
+
+    @classmethod
+    def append_record(cls, op: str, **kwargs):
+        """Append a change already applied to this instance."""
+        record = {"id": cls.ID, "op": op, **kwargs}
+        path = cls.fm.history_journal_path
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if not cls.journal_path:
+            # the first record of a new journal, nothing to catch up before it
+            stat = os.stat(path)
+            cls.journal_path = str(path)
+            cls.journal_ino = stat.st_ino
+            cls.journal_offset = stat.st_size
+        cls.journal_record_num += 1
+        if cls.journal_record_num >= cls.JOURNAL_COMPACT_RECORD_NUM:
+            cls.save_history()
+
     @classmethod
     def save_history(cls):
-        """Save the history meta to disk."""
-        history_meta = {
-            "id": cls.ID,
-            "steps": list(cls.jsteps),
-            "undone_steps": cls.jundone_steps,
-        }
-        cls.fm.write_json(cls.fm.history_meta_path, history_meta)
+        """Compact the journal to a snapshot of the current history."""
+        path = cls.fm.history_journal_path
+        record = {"id": cls.ID, "op": "snapshot", "steps": list(cls.jsteps), "undone_steps": cls.jundone_steps}
+        cls.fm.write_text_atomic(path, json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        stat = os.stat(path)
+        cls.journal_path = str(path)
+        cls.journal_ino = stat.st_ino
+        cls.journal_offset = stat.st_size
+        cls.journal_record_num = 0
         
     @classmethod
     def save_step(cls, step: Step):
         """Save the history meta to disk."""
         cls.ensure_sync()
-        cls.jsteps.appendleft(step.serialize())
+        step.compact_his_changed_files()
+        jstep = step.serialize()
+        cls.jsteps.appendleft(jstep)
+        cls.append_record("push", jstep=jstep)
         cls.discard_jsteps(cls.jundone_steps)
         cls.clamp_step_num()
-        cls.save_history()
         
     @classmethod
     def undo(cls, uic: 'UIContext'):
@@ -325,7 +604,7 @@ class HistoryService(ServiceBase):
             step.undo(uic)
             jstep = step.serialize()
             cls.jundone_steps.append(jstep)
-            cls.save_history()
+            cls.append_record("undo", jstep=jstep)
         return step
             
     @classmethod
@@ -338,38 +617,75 @@ class HistoryService(ServiceBase):
             step.redo(uic)
             jstep = step.serialize()
             cls.jsteps.appendleft(jstep)
-            cls.save_history()
+            cls.append_record("redo", jstep=jstep)
         return step
             
     @classmethod
     def discard_jstep(cls, jstep: dict):
         """Discard jstep directly, remove its history files. Faster then Step(jstep=jstep).discard()."""
-        his_changed_paths = [Path(path) for path in jstep.get("his_changed_paths", [])]
-        his_created_paths = [Path(path) for path in jstep.get("his_created_paths", [])]
-        his_deleted_paths = [Path(path) for path in jstep.get("his_deleted_paths", [])]
-        cls.fm.remove_paths(his_changed_paths)
-        cls.fm.remove_paths(his_created_paths)
-        cls.fm.remove_paths(his_deleted_paths)
+        cls.remove_his_paths([Path(path) for path in jstep.get("his_changed_paths", [])])
+        cls.remove_his_paths([Path(path) for path in jstep.get("his_created_paths", [])])
+        cls.remove_his_paths([Path(path) for path in jstep.get("his_deleted_paths", [])])
+
+    @classmethod
+    def remove_his_paths(cls, his_paths: list[Path]):
+        """Release the manifests from the blob store, remove the trashed paths in the background, and remove the full copies made before the blob store."""
+        for his_path in his_paths:
+            if cls.fm.is_in_trash(his_path):
+                cls.fm.remove_path_later(his_path)
+            elif BlobStore.is_manifest(his_path):
+                cls.blob_store.release(his_path)
+            else:
+                cls.fm.remove_path(his_path)
+
+    @classmethod
+    def sweep_trash(cls):
+        """Remove the trashed paths no step refers to, e.g. left by a crash before the step was saved."""
+        if not cls.fm.trash_dir.exists():
+            return
+        referenced_paths = {path for jstep in (*cls.jsteps, *cls.jundone_steps) for path in jstep.get("his_deleted_paths", [])}
+        min_time = time.time() - cls.TRASH_ORPHAN_MIN_AGE
+        for path in cls.fm.trash_dir.iterdir():
+            if path.name.endswith(cls.fm.REMOVING_SUFFIX) or str(path) in referenced_paths:
+                continue
+            # the name starts with the time it's trashed, see Step.trash_files(), renaming doesn't change the mtime
+            try:
+                trashed_time = float(path.name.split("_", 1)[0])
+            except ValueError:
+                trashed_time = 0.0
+            if trashed_time < min_time:
+                cls.fm.remove_path_later(path)
 
     @classmethod
     def discard_jsteps(cls, jsteps: list[dict]|deque[dict]):
         """Delete history files."""
+        if not jsteps:
+            return
         for jstep in jsteps:
             cls.discard_jstep(jstep)
         jsteps.clear()
+        if jsteps is cls.jsteps:
+            cls.append_record("discard", key="steps")
+        elif jsteps is cls.jundone_steps:
+            cls.append_record("discard", key="undone_steps")
             
     @classmethod
     def clear_cached_steps(cls):
-        cls.jsteps.clear()
-        cls.jundone_steps.clear()
+        """Forget the history, e.g. the runtime dir with the journal is removed."""
+        cls.reset_journal_state()
+        cls.blob_store.reset_refcounts()
 
     @classmethod
     def clamp_step_num(cls):
         """Discard the steps that exceed the user set max length."""
         maxlen = bpy.context.preferences.edit.undo_steps
+        num = 0
         while len(cls.jsteps) > maxlen:
             jstep = cls.jsteps.pop()
             cls.discard_jstep(jstep)
+            num += 1
+        if num:
+            cls.append_record("trim", num=num)
             
     @classmethod
     def has_steps(cls) -> bool:
@@ -0,0 +1,149 @@
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from . import ServiceBase
+from .autosave import AutosaveService
+from ..utils.blob_store import BlobStore
+from ..utils import bundle
+
+
+class PackImportJob:
+    """One archive going through the import stages, see PackImportService."""
+    def __init__(self, src_path: Path, staging_dir: Path):
+        self.src_path = src_path
+        self.staging_dir = staging_dir # the archive is extracted here, then moved into the packs dir on registration
+        self.future: Future = None
+        # set by the worker
+        self.is_legacy = False # a pack of 0.X.X, converted on the main thread
+        self.jpreset_by_name: dict[str, dict] = {} # the validated presets, so registering won't read them again
+        self.corrupt_preset_names: list[str] = [] # removed from the staging dir
+        self.error: Exception|None = None # the archive can't be extracted
+
+    def is_done(self) -> bool:
+        return self.future is None or self.future.done()
+
+
+class PackImportService(ServiceBase):
+    """
+    Import packs in stages. Extracting the archives into staging dirs and validating the presets run on worker threads, all archives at once,
+    registering the packs into the Context (and converting the legacy ones, which needs bpy) is left to the caller on the main thread.
+    The staging dirs are in the runtime dir, so moving them into the packs dir is a rename.
+    """
+    MAX_WORKER_NUM = 4
+    # staging dirs older than this are left by a crash, other instances may still be importing into the newer ones
+    STAGING_MAX_AGE = 24 * 3600.0
+
+    executor: ThreadPoolExecutor = None
+
+    @classmethod
+    def on_enable(cls):
+        cls.executor = ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, cls.MAX_WORKER_NUM), thread_name_prefix="HotNodeImport")
+        cls.sweep_staging_dirs()
+
+    @classmethod
+    def on_disable(cls):
+        cls.executor.shutdown(wait=True, cancel_futures=True)
+        cls.executor = None
+
+    @classmethod
+    def submit(cls, src_paths: list[Path]) -> list[PackImportJob]:
+        """Start extracting and validating the archives, the jobs are in the same order of the paths. Runs on the caller's thread if the service is disabled."""
+        jobs = []
+        for i, src_path in enumerate(src_paths):
+            staging_dir = cls.fm.import_staging_dir / f"{os.getpid()}_{time.time_ns()}_{i}"
+            job = PackImportJob(src_path, staging_dir)
+            if cls.executor is not None:
+                job.future = cls.executor.submit(cls.stage, job)
+            else:
+                cls.stage(job)
+            jobs.append(job)
+        return jobs
+
+    @classmethod
+    def stage(cls, job: PackImportJob):
+        """Extract and validate the archive of the job. Never touches bpy, runs on the workers."""
+        try:
+            if cls.fm.is_bundle(job.src_path):
+                cls.stage_bundle(job)
+            else:
+                cls.extract(job.src_path, job.staging_dir)
+                cls.validate(job)
+        except Exception as e:
+            job.error = e
+            cls.fm.remove_path(job.staging_dir)
+
+    @classmethod
+    def extract(cls, src_path: Path, dst_dir: Path):
+        """Extract an autosave manifest or a zip, bundles are staged by stage_bundle()."""
+        if BlobStore.is_manifest(src_path):
+            AutosaveService.restore_autosave(src_path, dst_dir)
+        else:
+            cls.fm.unzip_to(src_path, dst_dir)
+
+    @classmethod
+    def stage_bundle(cls, job: PackImportJob):
+        """
+        Validate the presets of a bundle by reading them from its index in place, then extract only the entries left,
+        the corrupt presets are never written to the staging dir.
+        """
+        with bundle.Bundle(job.src_path) as b:
+            names = b.names()
+            if ".metadata.json" in names:
+                # the legacy converter reads the presets of its own format
+                job.is_legacy = True
+                b.extract(job.staging_dir)
+                return
+            corrupt_names = set()
+            for name in names:
+                if "/" in name or not name.endswith(".json"):
+                    continue
+                preset_name = name[:-5]
+                try:
+                    result = b.read_json(name)
+                except (bundle.BundleError, ValueError):
+                    result = None
+                if isinstance(result, dict):
+                    job.jpreset_by_name[preset_name] = result
+                else:
+                    job.corrupt_preset_names.append(preset_name)
+                    corrupt_names.add(name)
+            b.extract(job.staging_dir, [name for name in names if name not in corrupt_names])
+
+    @classmethod
+    def validate(cls, job: PackImportJob):
+        """Read all presets of the extracted pack, the corrupt ones are removed so loading the pack won't meet them one by one."""
+        if (job.staging_dir / ".metadata.json").exists():
+            # the legacy converter reads the presets of its own format
+            job.is_legacy = True
+            return
+        preset_paths = [path for path in job.staging_dir.glob("*.json")]
+        for preset_path, result in zip(preset_paths, cls.fm.read_jsons(preset_paths)):
+            preset_name = preset_path.stem
+            if isinstance(result, dict):
+                job.jpreset_by_name[preset_name] = result
+            else:
+                job.corrupt_preset_names.append(preset_name)
+                cls.fm.remove_file(preset_path)
+
+    @classmethod
+    def discard(cls, job: PackImportJob):
+        """Drop the job's staging dir, after the worker finishes it if it's still running."""
+        if job.is_done():
+            cls.fm.remove_path_later(job.staging_dir)
+        elif not job.future.cancel():
+            job.future.add_done_callback(lambda _: cls.fm.remove_path(job.staging_dir))
+
+    @classmethod
+    def sweep_staging_dirs(cls):
+        staging_root = cls.fm.import_staging_dir
+        if not staging_root.exists():
+            return
+        min_mtime = time.time() - cls.STAGING_MAX_AGE
+        for staging_dir in staging_root.iterdir():
+            try:
+                if staging_dir.stat().st_mtime < min_mtime:
+                    cls.fm.remove_path_later(staging_dir)
+            except OSError:
+                continue
@@ -1,10 +1,10 @@
 import os
-import time
 
 import bpy
 from bpy.app.handlers import persistent
 
 from . import ServiceBase
+from .watcher import WatcherService, ChangeSet
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -17,8 +17,21 @@ def sync_persistent(_):
         SyncService.sync()
 
 
+@persistent
+def flush_writes_persistent(_):
+    """Write the pending metas on saving the .blend file, the user expects everything on disk then."""
+    SyncService.fm.flush_writes()
+
+
 class SyncService(ServiceBase):
-    last_check_time = 0.0
+    # ((mtime_ns, size), is_sync) of .sync.json when last read / written, the file is only parsed if the stamp changes
+    sync_meta_cache: tuple[tuple[int, int]|None, bool] = (None, True)
+    
+    # {"pack_name/file_name": (mtime_ns, size, inode)} of the .meta & preset files when last synced, see WatcherService.take_snapshot()
+    snapshot: dict[str, tuple[int, int, int]]|None = None
+    snapshot_dir: str = "" # the packs dir the snapshot was taken from
+    # changes dispatched by the watcher since the last sync, our own writes are among them, reloaded on the next sync by them
+    unsynced_changes: ChangeSet|None = None
     
     context_cls: 'Context' = None # Context Class, need to inject
     uic_cls: 'UIContext' = None # UIContext Class, need to inject
@@ -27,12 +40,21 @@ class SyncService(ServiceBase):
     def on_enable(cls):
         if sync_persistent not in bpy.app.handlers.load_post:
             bpy.app.handlers.load_post.append(sync_persistent)
+        if flush_writes_persistent not in bpy.app.handlers.save_post:
+            bpy.app.handlers.save_post.append(flush_writes_persistent)
         cls.read_sync_meta()
+        cls.sync_meta_cache = (None, True)
+        cls.unsynced_changes = None
+        WatcherService.add_listener(cls.on_files_changed)
         
     @classmethod
     def on_disable(cls):
         if sync_persistent in bpy.app.handlers.load_post:
             bpy.app.handlers.load_post.remove(sync_persistent)
+        if flush_writes_persistent in bpy.app.handlers.save_post:
+            bpy.app.handlers.save_post.remove(flush_writes_persistent)
+        WatcherService.remove_listener(cls.on_files_changed)
+        cls.fm.flush_writes()
 
     @classmethod
     def inject_dependencies(cls, context_cls: 'Context', uic_cls: 'UIContext'):
@@ -40,11 +62,38 @@ class SyncService(ServiceBase):
         cls.uic_cls = uic_cls
 
     @classmethod
-    def sync(cls):
+    def sync(cls, is_full: bool = False, changes: ChangeSet|None = None):
+        """
+        Sync the context with the disk. Only the packs changed since the last sync are reloaded,
+        pass is_full to reload everything (the first sync and the data dir changes are always full).
+        :param changes: The changes dispatched by the WatcherService, the packs dir is not scanned again if passed.
+        """
         cls.HistoryService.load_history()
-        prev_pack_selected_name = cls.context_cls.pack_selected.name if cls.context_cls.pack_selected else ""
-        cls.context_cls.initialize(prev_pack_selected_name)
-        cls.uic_cls.initialize()
+        packs_dir = str(cls.fm.packs_dir)
+        if changes is not None and WatcherService.snapshot is not None and WatcherService.watched_dir == packs_dir:
+            # the watcher replaces its snapshot as a whole, the changes are diffed from it
+            snapshot = WatcherService.snapshot
+        else:
+            # take the snapshot before loading, so the files changed while loading are reloaded by the next sync
+            snapshot = WatcherService.take_snapshot(packs_dir)
+            changes = None
+        if is_full or cls.snapshot is None or cls.snapshot_dir != packs_dir:
+            # files may be changed by other blender instances in the same mtime tick, don't trust the cache
+            cls.context_cls.preset_cache.clear()
+            prev_pack_selected_name = cls.context_cls.pack_selected.name if cls.context_cls.pack_selected else ""
+            cls.context_cls.initialize(prev_pack_selected_name)
+            cls.uic_cls.initialize()
+        else:
+            if changes is None:
+                changes = ChangeSet.from_snapshots(cls.snapshot, snapshot)
+            changed_pack_names = changes.pack_names
+            if changed_pack_names:
+                cls.context_cls.preset_cache.invalidate(*(cls.fm.packs_dir / pack_name for pack_name in changed_pack_names))
+                cls.context_cls.reload_packs(changed_pack_names)
+            cls.uic_cls.patch(changed_pack_names)
+        cls.snapshot = snapshot
+        cls.snapshot_dir = packs_dir
+        cls.unsynced_changes = None
         cls.save_sync_meta(cls.context_cls.pack_selected)
         # print("[Hot Node] Synced.")
 
@@ -54,13 +103,15 @@ class SyncService(ServiceBase):
         bpy.app.timers.register(cls.sync)
 
     @classmethod
-    def ensure_sync_on_interval(cls, interval: float = 1.0):
-        """Use packmeta proccess_id to ensure the context is synced on a regular interval."""
-        current_time = time.time()
-        if current_time - cls.last_check_time > interval:
-            if not cls.is_id_sync():
-                cls.late_sync()
-        cls.last_check_time = current_time
+    def on_files_changed(cls, changes: ChangeSet):
+        """Listener of the WatcherService, sync the changes if other blender instances changed the sync id."""
+        # packs may be written in an earlier poll than the sync meta, keep them until the sync
+        if cls.unsynced_changes is None:
+            cls.unsynced_changes = changes
+        else:
+            cls.unsynced_changes.merge(changes)
+        if changes.is_sync_meta_changed and not cls.is_id_sync():
+            cls.sync(changes=cls.unsynced_changes)
 
     @classmethod
     def save_sync_meta(cls, pack_changed=None):
@@ -69,7 +120,9 @@ class SyncService(ServiceBase):
             "id": cls.ID,
             "pack_changed_name": pack_changed.name if pack_changed else "",
         }
+        # written now rather than by the writer thread, the stamp of our own write is cached so is_id_sync() won't read it again
         cls.fm.write_json(cls.fm.sync_meta_path, meta)
+        cls.sync_meta_cache = (cls.get_sync_meta_stamp(), True)
         
     @classmethod
     def read_sync_meta(cls):
@@ -80,9 +133,29 @@ class SyncService(ServiceBase):
         meta = cls.fm.read_json(cls.fm.sync_meta_path)
         return meta
 
+    @classmethod
+    def get_sync_meta_stamp(cls) -> tuple[int, int]|None:
+        try:
+            stat = os.stat(cls.fm.sync_meta_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
     @classmethod
     def is_id_sync(cls):
-        """Check if the context's id matches the disk's id."""
-        id = cls.read_sync_meta().get("id")
-        is_sync = id == cls.ID
-        return is_sync
\ No newline at end of file
+        """Check if the context's id matches the disk's id. Only stats the file unless it's changed since the last check."""
+        stamp, is_sync = cls.sync_meta_cache
+        new_stamp = cls.get_sync_meta_stamp()
+        if new_stamp is None:
+            return True
+        if new_stamp == stamp:
+            return is_sync
+        try:
+            meta = cls.fm.read_json(cls.fm.sync_meta_path)
+        except (OSError, ValueError):
+            # may be being written by other instances, check again next time
+            return True
+        is_sync = meta.get("id") == cls.ID
+        # the tuple is replaced as a whole
+        cls.sync_meta_cache = (new_stamp, is_sync)
+        return is_sync
@@ -0,0 +1,232 @@
+import os
+import threading
+from pathlib import Path
+
+import bpy
+
+from . import ServiceBase
+
+
+class ChangeSet:
+    """Changes of the packs dir between two snapshots, merged changes are coalesced."""
+    def __init__(self):
+        self.packs_added: set[str] = set()
+        self.packs_removed: set[str] = set()
+        self.metas_changed: set[str] = set() # pack names
+        self.presets_added: set[tuple[str, str]] = set() # (pack_name, preset_name)
+        self.presets_removed: set[tuple[str, str]] = set()
+        self.presets_modified: set[tuple[str, str]] = set()
+        self.is_sync_meta_changed = False
+
+    def __bool__(self):
+        return bool(self.pack_names) or self.is_sync_meta_changed
+
+    def __repr__(self):
+        return (f"ChangeSet(packs_added={self.packs_added}, packs_removed={self.packs_removed}, metas_changed={self.metas_changed}, "
+                f"presets_added={self.presets_added}, presets_removed={self.presets_removed}, presets_modified={self.presets_modified}, "
+                f"is_sync_meta_changed={self.is_sync_meta_changed})")
+
+    @property
+    def pack_names(self) -> set[str]:
+        """Names of all the packs touched by the changes."""
+        pack_names = self.packs_added | self.packs_removed | self.metas_changed
+        for presets in (self.presets_added, self.presets_removed, self.presets_modified):
+            pack_names.update(pack_name for pack_name, _ in presets)
+        return pack_names
+
+    @classmethod
+    def from_snapshots(cls, old_snapshot: dict, new_snapshot: dict) -> 'ChangeSet':
+        """Diff two snapshots taken by WatcherService.take_snapshot()."""
+        changes = cls()
+        old_pack_names = {path.split("/", 1)[0] for path in old_snapshot}
+        new_pack_names = {path.split("/", 1)[0] for path in new_snapshot}
+        changes.packs_added = new_pack_names - old_pack_names
+        changes.packs_removed = old_pack_names - new_pack_names
+        for path in old_snapshot.keys() | new_snapshot.keys():
+            old_stamp = old_snapshot.get(path)
+            new_stamp = new_snapshot.get(path)
+            if old_stamp == new_stamp:
+                continue
+            pack_name, file_name = path.split("/", 1)
+            if pack_name in changes.packs_added or pack_name in changes.packs_removed:
+                continue
+            if file_name == ".meta":
+                changes.metas_changed.add(pack_name)
+            elif old_stamp is None:
+                changes.presets_added.add((pack_name, file_name[:-5]))
+            elif new_stamp is None:
+                changes.presets_removed.add((pack_name, file_name[:-5]))
+            else:
+                changes.presets_modified.add((pack_name, file_name[:-5]))
+        return changes
+
+    def merge(self, other: 'ChangeSet'):
+        """Merge the later changes into this one, e.g. a preset added then removed is dropped."""
+        for pack_name in other.packs_added:
+            if pack_name in self.packs_removed:
+                # removed and added back, the content is unknown
+                self.packs_removed.discard(pack_name)
+                self.metas_changed.add(pack_name)
+            else:
+                self.packs_added.add(pack_name)
+        for pack_name in other.packs_removed:
+            if pack_name in self.packs_added:
+                self.packs_added.discard(pack_name)
+            else:
+                self.packs_removed.add(pack_name)
+            self.metas_changed.discard(pack_name)
+            for presets in (self.presets_added, self.presets_removed, self.presets_modified):
+                presets.difference_update({preset for preset in presets if preset[0] == pack_name})
+        self.metas_changed.update(other.metas_changed - self.packs_added)
+        for preset in other.presets_added:
+            if preset in self.presets_removed:
+                self.presets_removed.discard(preset)
+                self.presets_modified.add(preset)
+            else:
+                self.presets_added.add(preset)
+        for preset in other.presets_removed:
+            self.presets_modified.discard(preset)
+            if preset in self.presets_added:
+                self.presets_added.discard(preset)
+            else:
+                self.presets_removed.add(preset)
+        self.presets_modified.update(other.presets_modified - self.presets_added)
+        self.is_sync_meta_changed |= other.is_sync_meta_changed
+        return self
+
+
+class WatcherService(ServiceBase):
+    """
+    Watch the app data dir on a daemon thread by stat snapshots, no file is read.
+    The changes found by the thread are coalesced and dispatched to the listeners on the main thread,
+    by a callback registered with the scheduler (bpy.app.timers by default, inject a fake one to run it without Blender).
+    """
+    POLL_INTERVAL = 1.0 # seconds between the snapshots
+    DISPATCH_INTERVAL = 0.5 # seconds between the dispatches on the main thread
+
+    scheduler = None # callable(callback), callback returns the seconds to be called again or None to stop. Inject
+    listeners = [] # callable(changes: ChangeSet), called on the main thread
+
+    lock = threading.Lock()
+    pending_changes: ChangeSet = None # changes found by the thread, not dispatched yet
+    poll_thread: threading.Thread = None
+    poll_stop_event: threading.Event = None
+    # the snapshot is only used by the thread (or poll() in tests)
+    snapshot: dict[str, tuple[int, int, int]] = None
+    sync_meta_stamp: tuple[int, int]|None = None
+    watched_dir: str = ""
+
+    @classmethod
+    def inject_dependencies(cls, scheduler=None):
+        cls.scheduler = scheduler if scheduler is not None else cls.schedule_with_timers
+
+    @classmethod
+    def on_enable(cls):
+        cls.pending_changes = None
+        cls.snapshot = None
+        cls.scheduler(cls.dispatch)
+        cls.poll_stop_event = threading.Event()
+        cls.poll_thread = threading.Thread(target=cls.run_poll, args=(cls.poll_stop_event, ), name="HotNodeWatcher", daemon=True)
+        cls.poll_thread.start()
+
+    @classmethod
+    def on_disable(cls):
+        if cls.poll_thread is not None:
+            cls.poll_stop_event.set()
+            cls.poll_thread.join(timeout=cls.POLL_INTERVAL)
+            cls.poll_thread = None
+            cls.poll_stop_event = None
+        if cls.scheduler == cls.schedule_with_timers and bpy.app.timers.is_registered(cls.dispatch):
+            bpy.app.timers.unregister(cls.dispatch)
+        cls.pending_changes = None
+
+    @classmethod
+    def schedule_with_timers(cls, callback):
+        bpy.app.timers.register(callback, first_interval=cls.DISPATCH_INTERVAL, persistent=True)
+
+    @classmethod
+    def add_listener(cls, callback):
+        if callback not in cls.listeners:
+            cls.listeners.append(callback)
+
+    @classmethod
+    def remove_listener(cls, callback):
+        if callback in cls.listeners:
+            cls.listeners.remove(callback)
+
+    @staticmethod
+    def take_snapshot(packs_dir: Path|str) -> dict[str, tuple[int, int, int]]:
+        """Stat the .meta and preset files of all packs, {"pack_name/file_name": (mtime_ns, size, inode)}."""
+        snapshot = {}
+        try:
+            pack_entries = list(os.scandir(packs_dir))
+        except OSError:
+            return snapshot
+        for pack_entry in pack_entries:
+            if not pack_entry.is_dir():
+                continue
+            try:
+                with os.scandir(pack_entry.path) as entries:
+                    for entry in entries:
+                        # the .index and .node_trees are written along with the presets, no need to watch them
+                        if entry.name != ".meta" and not entry.name.endswith(".json"):
+                            continue
+                        # inode is 0 on windows (DirEntry.stat() skips it there), mtime & size are enough
+                        stat = entry.stat()
+                        snapshot[f"{pack_entry.name}/{entry.name}"] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            except OSError:
+                continue
+        return snapshot
+
+    @staticmethod
+    def get_stamp(path: Path|str) -> tuple[int, int]|None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def run_poll(cls, stop_event: threading.Event):
+        while not stop_event.wait(cls.POLL_INTERVAL):
+            cls.poll()
+
+    @classmethod
+    def poll(cls):
+        """Take a snapshot and queue the changes since the last one. The first poll of a dir only takes the snapshot."""
+        packs_dir = str(cls.fm.packs_dir)
+        snapshot = cls.take_snapshot(packs_dir)
+        sync_meta_stamp = cls.get_stamp(cls.fm.sync_meta_path)
+        if cls.snapshot is None or cls.watched_dir != packs_dir:
+            # the data dir is changed, the sync service does a full sync for it
+            cls.snapshot = snapshot
+            cls.sync_meta_stamp = sync_meta_stamp
+            cls.watched_dir = packs_dir
+            return
+        changes = ChangeSet.from_snapshots(cls.snapshot, snapshot)
+        changes.is_sync_meta_changed = sync_meta_stamp != cls.sync_meta_stamp
+        cls.snapshot = snapshot
+        cls.sync_meta_stamp = sync_meta_stamp
+        if not changes:
+            return
+        with cls.lock:
+            if cls.pending_changes is None:
+                cls.pending_changes = changes
+            else:
+                cls.pending_changes.merge(changes)
+
+    @classmethod
+    def dispatch(cls):
+        """Called by the scheduler on the main thread, pass the pending changes to the listeners."""
+        if not cls.is_enabled:
+            return None
+        with cls.lock:
+            changes = cls.pending_changes
+            cls.pending_changes = None
+        if changes:
+            for callback in list(cls.listeners):
+                try:
+                    callback(changes)
+                except Exception as e:
+                    print(f"[Hot Node] Watcher listener failed: {e}")
+        return cls.DISPATCH_INTERVAL
@@ -0,0 +1,218 @@
+import hashlib
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Callable
+
+from .file_manager import FileManager
+
+
+class BlobStore:
+    """
+    Content addressed store of snapshots. A file is stored once as <blob_dir>/<hash[:2]>/<hash>,
+    and a snapshot of a path is a small manifest in the manifest dir pointing to the blobs, so unchanged files are shared between snapshots.
+    Files are only shared inside the store, restored files are copies of the blobs, so editing them in place won't touch the snapshots.
+    Blobs are reference counted by the manifests, the counts are rebuilt from the manifests on disk when reset.
+    The history (runtime/history_blobs, history_file) and the autosave (hot_node_autosave/.blobs, hot_node_autosave) each have a store.
+    """
+    MANIFEST_SUFFIX = ".manifest"
+    MANIFEST_VERSION = 1
+    CHUNK_SIZE = 1024 * 1024
+    # blobs with no manifest are only swept if they are older than this, other instances may be writing their manifests
+    ORPHAN_MIN_AGE = 3600.0
+
+    def __init__(self, get_blob_dir: Callable[[FileManager], Path] = None, get_manifest_dir: Callable[[FileManager], Path] = None):
+        """The dirs are got from the FileManager on every use, they change with the data dir. Default to the history dirs."""
+        self.fm = FileManager()
+        self.get_blob_dir = get_blob_dir if get_blob_dir is not None else lambda fm: fm.history_blob_dir
+        self.get_manifest_dir = get_manifest_dir if get_manifest_dir is not None else lambda fm: fm.history_file_dir
+        self.refcounts: dict[str, int] = None # built lazily, see ensure_refcounts()
+
+    @property
+    def blob_dir(self) -> Path:
+        return self.get_blob_dir(self.fm)
+
+    @property
+    def manifest_dir(self) -> Path:
+        return self.get_manifest_dir(self.fm)
+
+    @classmethod
+    def is_manifest(cls, path: Path|str) -> bool:
+        return str(path).endswith(cls.MANIFEST_SUFFIX)
+
+    def get_blob_path(self, hash: str) -> Path:
+        return self.blob_dir / hash[:2] / hash
+
+    def put_file(self, src_path: Path|str) -> str:
+        """Store the file as a blob, hashed while copying. Return the hash."""
+        self.fm.ensure_dir(self.blob_dir)
+        temp_path = self.blob_dir / f".{os.getpid()}.{time.time_ns()}.tmp"
+        hasher = hashlib.sha256()
+        with open(src_path, 'rb') as src, open(temp_path, 'wb') as dst:
+            while chunk := src.read(self.CHUNK_SIZE):
+                hasher.update(chunk)
+                dst.write(chunk)
+        hash = hasher.hexdigest()
+        blob_path = self.get_blob_path(hash)
+        if blob_path.exists():
+            os.remove(temp_path)
+        else:
+            self.fm.ensure_dir(blob_path.parent)
+            os.replace(temp_path, blob_path)
+        return hash
+
+    def put_bytes(self, data: bytes) -> str:
+        """Store the data as a blob, return the hash."""
+        hash = hashlib.sha256(data).hexdigest()
+        blob_path = self.get_blob_path(hash)
+        if not blob_path.exists():
+            self.fm.ensure_dir(blob_path.parent)
+            temp_path = self.blob_dir / f".{os.getpid()}.{time.time_ns()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, blob_path)
+        return hash
+
+    def read_bytes(self, hash: str) -> bytes:
+        with open(self.get_blob_path(hash), 'rb') as f:
+            return f.read()
+
+    def put_path(self, src_path: Path, base_manifest: dict = None) -> dict:
+        """
+        Store a file or a directory tree, return the manifest of it. Dir manifests also keep the [mtime_ns, size] stamps of the files,
+        the files with the same stamps as in the base_manifest (an earlier snapshot of the same dir) reuse its hashes and aren't read.
+        """
+        # the files are read from the disk, the pending write behind writes must be there (see FileManager.write_json_later())
+        self.fm.flush_writes()
+        if src_path.is_dir():
+            files = {}
+            stamps = {}
+            dirs = []
+            base_files = base_manifest.get("files", {}) if base_manifest else {}
+            base_stamps = base_manifest.get("stamps", {}) if base_manifest else {}
+            for root, dir_names, file_names in os.walk(src_path):
+                relative_root = Path(root).relative_to(src_path)
+                for dir_name in dir_names:
+                    dirs.append((relative_root / dir_name).as_posix())
+                for file_name in file_names:
+                    file_path = Path(root) / file_name
+                    relative_path = (relative_root / file_name).as_posix()
+                    stat = file_path.stat()
+                    stamp = [stat.st_mtime_ns, stat.st_size]
+                    hash = base_files.get(relative_path)
+                    if hash is None or base_stamps.get(relative_path) != stamp or not self.get_blob_path(hash).exists():
+                        hash = self.put_file(file_path)
+                    files[relative_path] = hash
+                    stamps[relative_path] = stamp
+            return {"version": self.MANIFEST_VERSION, "type": "dir", "files": files, "stamps": stamps, "dirs": dirs}
+        return {"version": self.MANIFEST_VERSION, "type": "file", "hash": self.put_file(src_path)}
+
+    @staticmethod
+    def get_hashes(manifest: dict) -> list[str]:
+        if manifest.get("type") == "dir":
+            return list(manifest.get("files", {}).values())
+        return [manifest["hash"]] if "hash" in manifest else []
+
+    def snapshot(self, src_path: Path, manifest_path: Path, base_manifest: dict = None):
+        """Store the path and write its manifest. See put_path() for the base_manifest."""
+        self.write_manifest(manifest_path, self.put_path(src_path, base_manifest))
+
+    def snapshot_patch(self, patch_data: bytes, base_hash: str, manifest_path: Path):
+        """
+        Store a json patch (see utils.json_patch) turning the file with base_hash back to the snapshot, and write its manifest.
+        The manifest is {"type": "patch", "hash": patch blob hash, "base": sha256 of the file the patch applies to}.
+        """
+        manifest = {"version": self.MANIFEST_VERSION, "type": "patch", "hash": self.put_bytes(patch_data), "base": base_hash}
+        self.write_manifest(manifest_path, manifest)
+
+    def write_manifest(self, manifest_path: Path, manifest: dict):
+        self.fm.write_json(manifest_path, manifest)
+        if self.refcounts is not None:
+            for hash in self.get_hashes(manifest):
+                self.refcounts[hash] = self.refcounts.get(hash, 0) + 1
+
+    def restore(self, manifest_path: Path, dst_path: Path):
+        """Put the snapshot back to dst_path, the existing file / dir there is removed first. Patch manifests are applied by the history."""
+        manifest = self.fm.read_json(manifest_path)
+        if manifest.get("type") == "patch":
+            raise ValueError(f"Can't restore a patch manifest without its base: {manifest_path}")
+        self.fm.remove_path(dst_path)
+        if manifest.get("type") == "dir":
+            self.fm.ensure_dir(dst_path)
+            for dir_name in manifest.get("dirs", []):
+                self.fm.ensure_dir(dst_path / dir_name)
+            for file_name, hash in manifest.get("files", {}).items():
+                file_path = dst_path / file_name
+                self.fm.ensure_dir(file_path.parent)
+                shutil.copyfile(self.get_blob_path(hash), file_path)
+        else:
+            shutil.copyfile(self.get_blob_path(manifest["hash"]), dst_path)
+
+    def release(self, manifest_path: Path) -> int:
+        """Remove the manifest, and the blobs no manifest refers to anymore. Return the bytes freed."""
+        # count before removing, the counts are built from the manifests on disk
+        self.ensure_refcounts()
+        try:
+            manifest = self.fm.read_json(manifest_path)
+        except (OSError, ValueError):
+            self.fm.remove_file(manifest_path)
+            return 0
+        freed_size = manifest_path.stat().st_size if manifest_path.exists() else 0
+        self.fm.remove_file(manifest_path)
+        for hash in self.get_hashes(manifest):
+            refcount = self.refcounts.get(hash, 0) - 1
+            if refcount > 0:
+                self.refcounts[hash] = refcount
+                continue
+            self.refcounts.pop(hash, None)
+            blob_path = self.get_blob_path(hash)
+            try:
+                freed_size += blob_path.stat().st_size
+                os.remove(blob_path)
+            except OSError:
+                continue
+        return freed_size
+
+    def get_size(self) -> int:
+        """Bytes of all the blobs."""
+        if not self.blob_dir.exists():
+            return 0
+        size = 0
+        for blob_path in self.blob_dir.glob("*/*"):
+            try:
+                size += blob_path.stat().st_size
+            except OSError:
+                continue
+        return size
+
+    def reset_refcounts(self):
+        """Drop the counts, they are rebuilt from the manifests on next use. Call it when other instances may have changed the history."""
+        self.refcounts = None
+
+    def ensure_refcounts(self):
+        if self.refcounts is not None:
+            return
+        refcounts = {}
+        if self.manifest_dir.exists():
+            for manifest_path in self.manifest_dir.glob(f"*{self.MANIFEST_SUFFIX}"):
+                try:
+                    manifest = self.fm.read_json(manifest_path)
+                except (OSError, ValueError):
+                    continue
+                for hash in self.get_hashes(manifest):
+                    refcounts[hash] = refcounts.get(hash, 0) + 1
+        self.refcounts = refcounts
+        self.sweep_orphans()
+
+    def sweep_orphans(self):
+        """Remove the old blobs no manifest refers to, e.g. left by a crash between storing and writing the manifest."""
+        if not self.blob_dir.exists():
+            return
+        min_mtime = time.time() - self.ORPHAN_MIN_AGE
+        for blob_path in self.blob_dir.glob("*/*"):
+            try:
+                if blob_path.name not in self.refcounts and blob_path.stat().st_mtime < min_mtime:
+                    os.remove(blob_path)
+            except OSError:
+                continue
@@ -0,0 +1,172 @@
+"""
+Hot Node pack bundle (.hnpk), a single file with an index of its entries, so a pack can be listed, previewed or partially imported
+by reading only the index and the entries needed, and read in place without extracting it.
+
+Layout (little endian):
+    header: b"HNPK", version u16, reserved u16, index offset u64, index size u32
+    entry data: the files one after another, each zlib compressed or stored, whichever is smaller
+    index: zlib compressed json {"version": 1, "entries": {posix relative path: {"offset", "size", "raw_size", "method", "crc"}}}
+The index is written after the data so the bundle is written in one pass, the header points to it.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path, PurePosixPath, PureWindowsPath
+
+
+MAGIC = b"HNPK"
+VERSION = 1
+SUFFIX = ".hnpk"
+HEADER = struct.Struct("<4sHHQI")
+METHOD_STORE = "store"
+METHOD_ZLIB = "zlib"
+COMPRESS_LEVEL = 6
+
+
+class BundleError(ValueError):
+    """The file is not a bundle, or it's corrupt."""
+
+
+def is_bundle(path: Path|str) -> bool:
+    """Check the magic, a zip or any other file is not a bundle."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_bundle(src_dir: Path, dst_path: Path, excluded_paths: list[Path]|None = None):
+    """Bundle the files of a directory, files in excluded_paths are skipped. Written to a temp file first, a failed write leaves no broken bundle."""
+    excluded_path_strs = {os.path.normpath(path) for path in excluded_paths} if excluded_paths else set()
+    temp_path = Path(dst_path).with_name(f".{Path(dst_path).name}.{os.getpid()}.{time.time_ns()}.tmp")
+    entries = {}
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+            offset = HEADER.size
+            for root, dir_names, file_names in os.walk(src_dir):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    file_path = os.path.join(root, file_name)
+                    if excluded_path_strs and os.path.normpath(file_path) in excluded_path_strs:
+                        continue
+                    with open(file_path, 'rb') as src:
+                        raw_data = src.read()
+                    data = zlib.compress(raw_data, COMPRESS_LEVEL)
+                    method = METHOD_ZLIB
+                    if len(data) >= len(raw_data):
+                        data = raw_data
+                        method = METHOD_STORE
+                    relative_path = Path(os.path.relpath(file_path, src_dir)).as_posix()
+                    entries[relative_path] = {
+                        "offset": offset,
+                        "size": len(data),
+                        "raw_size": len(raw_data),
+                        "method": method,
+                        "crc": zlib.crc32(raw_data),
+                    }
+                    f.write(data)
+                    offset += len(data)
+            index_data = zlib.compress(json.dumps({"version": VERSION, "entries": entries}, ensure_ascii=False).encode("utf-8"), COMPRESS_LEVEL)
+            f.write(index_data)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, 0, offset, len(index_data)))
+        os.replace(temp_path, dst_path)
+    except BaseException:
+        if temp_path.exists():
+            os.remove(temp_path)
+        raise
+
+
+class Bundle:
+    """
+    A bundle opened read-only, only the header and the index are read on opening. The entries are read on demand,
+    it's safe to read from several threads. Use it as a context manager, or close() it.
+    """
+    def __init__(self, path: Path|str):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        self._lock = threading.Lock() # one file position for all readers
+        try:
+            self.entries: dict[str, dict] = self._read_index()
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _read_index(self) -> dict[str, dict]:
+        header_data = self._file.read(HEADER.size)
+        if len(header_data) < HEADER.size:
+            raise BundleError(f"Not a bundle: {self.path}")
+        magic, version, _, index_offset, index_size = HEADER.unpack(header_data)
+        if magic != MAGIC:
+            raise BundleError(f"Not a bundle: {self.path}")
+        if version > VERSION:
+            raise BundleError(f"Bundle of a newer version ({version}): {self.path}")
+        self._file.seek(index_offset)
+        index_data = self._file.read(index_size)
+        try:
+            index = json.loads(zlib.decompress(index_data).decode("utf-8"))
+        except (zlib.error, ValueError) as e:
+            raise BundleError(f"Corrupt bundle index: {self.path}") from e
+        return index.get("entries", {})
+
+    def names(self) -> list[str]:
+        """Relative paths of the entries, in the bundled order."""
+        return list(self.entries.keys())
+
+    def has(self, name: str) -> bool:
+        return name in self.entries
+
+    def read_bytes(self, name: str) -> bytes:
+        """Read and check an entry. Raise KeyError if there's no such entry, BundleError if it's corrupt."""
+        entry = self.entries[name]
+        with self._lock:
+            self._file.seek(entry["offset"])
+            data = self._file.read(entry["size"])
+        try:
+            if entry["method"] == METHOD_ZLIB:
+                data = zlib.decompress(data)
+            elif entry["method"] != METHOD_STORE:
+                raise BundleError(f"Unknown compress method of {name}: {entry['method']}")
+        except zlib.error as e:
+            raise BundleError(f"Corrupt entry {name} in {self.path}") from e
+        if len(data) != entry["raw_size"] or zlib.crc32(data) != entry["crc"]:
+            raise BundleError(f"Corrupt entry {name} in {self.path}")
+        return data
+
+    def read_json(self, name: str):
+        return json.loads(self.read_bytes(name).decode("utf-8"))
+
+    def extract(self, dst_dir: Path, names: list[str]|None = None):
+        """Extract the entries (all if names is None) into dst_dir. Entries pointing out of dst_dir are refused."""
+        dst_dir = Path(dst_dir)
+        for name in self.names() if names is None else names:
+            dst_path = self.get_safe_dst_path(dst_dir, name)
+            dst_path.parent.mkdir(parents=True, exist_ok=True)
+            data = self.read_bytes(name)
+            with open(dst_path, 'wb') as f:
+                f.write(data)
+
+    def get_safe_dst_path(self, dst_dir: Path, name: str) -> Path:
+        """Get the path to extract the entry to, raise BundleError if it's not a plain relative path staying under dst_dir."""
+        relative_path = PurePosixPath(name)
+        # a drive (C:x, C:/x) or a backslash is only a root / separator on windows, refuse them everywhere
+        if relative_path.is_absolute() or PureWindowsPath(name).drive or "\\" in name or any(part in ("", ".", "..") for part in name.split("/")):
+            raise BundleError(f"Unsafe entry path {name} in {self.path}")
+        dst_path = dst_dir.joinpath(*relative_path.parts)
+        if not os.path.abspath(dst_path).startswith(os.path.join(os.path.abspath(dst_dir), "")):
+            raise BundleError(f"Unsafe entry path {name} in {self.path}")
+        return dst_path
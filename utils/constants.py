@@ -48,6 +48,9 @@ NODE_GROUP_INPUT_IDNAME = "NodeGroupInput"
 NODE_GROUP_OUTPUT_IDNAME = "NodeGroupOutput"
 NODE_FRAME_IDNAME = "NodeFrame"
 
+# custom property of the node groups created by hot node, the content hash of the jnode_tree they were created from, removed once the group is edited
+NODE_TREE_HASH_PROP = "hot_node_hash"
+
 ICON_BY_TREE_TYPE_IDNAME = {
     "ShaderNodeTree": 'NODE_MATERIAL',
     "GeometryNodeTree": 'GEOMETRY_NODES',
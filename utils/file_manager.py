@@ -1,11 +1,17 @@
+import atexit
 import json
+import multiprocessing
 import os
 import sys
 import shutil
 import tempfile
+import threading
+import time
 import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+from ..utils import bundle
 from ..utils import constants
 from ..utils import utils
 
@@ -13,6 +19,14 @@ from ..utils import utils
 class FileManager:
     _instance = None
     
+    # below these, starting the pools costs more than reading / decoding on the main thread
+    BULK_READ_MIN_FILE_NUM = 64
+    BULK_DECODE_MIN_SIZE = 16 * 1024 * 1024
+    BULK_MAX_WORKER_NUM = 8
+    # the writer thread waits this long after a write_json_later(), so the writes of one operator are coalesced
+    WRITE_BEHIND_DELAY = 0.2
+    REMOVING_SUFFIX = ".removing" # paths being removed by remove_path_later()
+    
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -22,6 +36,12 @@ class FileManager:
     def __init__(self):
         if not self._initialized:
             self._initialized = True
+            # write behind, see write_json_later()
+            self._pending_writes: dict[str, str] = {} # path -> encoded json, the latest of the path
+            self._pending_lock = threading.Lock() # guards _pending_writes
+            self._io_lock = threading.Lock() # one writer at a time, so an older text never overwrites a newer one
+            self._writer_event = threading.Event()
+            self._writer_thread: threading.Thread = None
 
             # NOTE the structure is build in ..core.blender.user_pref
             
@@ -43,13 +63,38 @@ class FileManager:
     def history_file_dir(self) -> Path:
         return self._history_file_dir
     
+    @property
+    def trash_dir(self) -> Path:
+        return self._trash_dir
+    
+    @property
+    def history_blob_dir(self) -> Path:
+        return self._history_blob_dir
+    
+    @property
+    def import_staging_dir(self) -> Path:
+        return self._import_staging_dir
+    
+    @property
+    def schema_dir(self) -> Path:
+        return self._schema_dir
+    
+    @property
+    def catalog_path(self) -> Path:
+        return self._catalog_path
+    
     @property
     def sync_meta_path(self) -> Path:
         return self._sync_meta_path
     
     @property
     def history_meta_path(self) -> Path:
+        """The history of old versions, replaced by history_journal_path."""
         return self._history_meta_path
+    
+    @property
+    def history_journal_path(self) -> Path:
+        return self._history_journal_path
 
     # add-on paths
     
@@ -70,6 +115,10 @@ class FileManager:
     def autosave_dir(self) -> Path:
         return self.temp_dir / "hot_node_autosave"
     
+    @property
+    def autosave_blob_dir(self) -> Path:
+        return self.autosave_dir / ".blobs"
+    
     @staticmethod
     def get_default_app_data_dir() -> Path:
         if sys.platform == "win32":
@@ -88,25 +137,180 @@ class FileManager:
         self._packs_dir = self._app_data_dir / "packs"
         self._runtime_dir = self._app_data_dir / "runtime"
         self._history_file_dir = self._app_data_dir / "runtime" / "history_file"
+        self._history_blob_dir = self._runtime_dir / "history_blobs"
+        self._trash_dir = self._runtime_dir / "trash"
+        self._import_staging_dir = self._runtime_dir / "import_staging"
+        self._schema_dir = self._runtime_dir / "schema"
+        self._catalog_path = self._runtime_dir / "catalog.sqlite3"
         self._sync_meta_path = self._runtime_dir / ".sync.json"
         self._history_meta_path = self._runtime_dir / ".history.json"
+        self._history_journal_path = self._runtime_dir / ".history.journal"
     
     def ensure_app_dir_structure(self):
         self.ensure_dir(self._app_data_dir)
         self.ensure_dir(self._packs_dir)
         self.ensure_dir(self._runtime_dir)
         self.ensure_dir(self._history_file_dir)
+        self.ensure_dir(self._history_blob_dir)
+        self.ensure_dir(self._trash_dir)
+        self.ensure_dir(self._schema_dir)
         self.ensure_json(self._sync_meta_path)
         self.ensure_json(self._history_meta_path)
+        # left by remove_path_later() if blender exited before the removal finished
+        for dir_path in (self._app_data_dir, self._trash_dir):
+            for path in dir_path.glob(f"*{self.REMOVING_SUFFIX}"):
+                self.remove_path_later(path)
         
+    @staticmethod
+    def encode_json(data: dict) -> str:
+        return json.dumps(data, ensure_ascii=False, indent=constants.FILE_INDENT) # release None, dev 2
+
+    @staticmethod
+    def write_text_atomic(file_path: Path|str, text: str):
+        """Write to a temp file in the same dir and replace the file, readers never see a half written file."""
+        file_path = str(file_path)
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, file_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
     def write_json(self, file_path: str, data: dict):
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=constants.FILE_INDENT) # release None, dev 2
+        text = self.encode_json(data)
+        with self._io_lock:
+            # this write is newer than the pending one of the path
+            with self._pending_lock:
+                self._pending_writes.pop(str(file_path), None)
+            self.write_text_atomic(file_path, text)
+
+    def write_json_later(self, file_path: Path|str, data: dict):
+        """
+        Write the json by the writer thread, the writes to the same path before it's written are coalesced.
+        The data is encoded now, and read_json() of this process gets the pending data.
+        A file not existing yet is written now, so checks by path.exists() still work.
+        Call flush_writes() before touching the file by other ways, the copy / zip / remove methods here do it.
+        """
+        key = str(file_path)
+        if not os.path.exists(key):
+            self.write_json(key, data)
+            return
+        text = self.encode_json(data)
+        with self._pending_lock:
+            self._pending_writes[key] = text
+            self.ensure_writer_thread()
+        self._writer_event.set()
+
+    def ensure_writer_thread(self):
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            return
+        self._writer_thread = threading.Thread(target=self.run_writer, name="HotNodeWriter", daemon=True)
+        self._writer_thread.start()
+        # the daemon thread is killed on exit
+        atexit.register(self.flush_writes)
+
+    def run_writer(self):
+        while True:
+            self._writer_event.wait()
+            time.sleep(self.WRITE_BEHIND_DELAY)
+            self._writer_event.clear()
+            self.flush_writes()
+
+    def flush_writes(self):
+        """Write all the pending writes now."""
+        with self._io_lock:
+            with self._pending_lock:
+                keys = list(self._pending_writes)
+            for key in keys:
+                with self._pending_lock:
+                    text = self._pending_writes.get(key)
+                if text is None:
+                    continue
+                try:
+                    self.write_text_atomic(key, text)
+                except OSError as e:
+                    # e.g. the dir is removed, nothing to keep
+                    print(f"[Hot Node] Failed to write {key}: {e}")
+                with self._pending_lock:
+                    if self._pending_writes.get(key) is text:
+                        del self._pending_writes[key]
+
+    def has_pending_write(self, file_path: Path|str) -> bool:
+        with self._pending_lock:
+            return str(file_path) in self._pending_writes
 
     def read_json(self, file_path) -> dict:
+        with self._pending_lock:
+            text = self._pending_writes.get(str(file_path))
+        if text is not None:
+            return json.loads(text)
         with open(file_path, 'r', encoding='utf-8') as file:
             return json.load(file)
         
+    def read_jsons(self, file_paths: list[Path]) -> list[dict|Exception]:
+        """
+        Read json files in bulk, the results are in the same order of the paths, a file failed to read / decode gets its exception.
+        Files are read by a thread pool, and decoded by a process pool running json.loads when the total size is large.
+        The process pool is only used on the main thread, callers on worker threads decode serially so they won't spawn a pool each.
+        Workers never touch bpy, and everything falls back to the main thread if the pools are not available.
+        """
+        file_paths = list(file_paths)
+        self.flush_writes()
+        if len(file_paths) < self.BULK_READ_MIN_FILE_NUM:
+            return [self.try_call(self.read_json, file_path) for file_path in file_paths]
+        texts = self.read_texts(file_paths)
+        return self.decode_jsons(texts)
+    
+    @staticmethod
+    def try_call(func, *args):
+        try:
+            return func(*args)
+        except (OSError, ValueError) as e:
+            return e
+        
+    @staticmethod
+    def read_text(file_path) -> str:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return file.read()
+    
+    def read_texts(self, file_paths: list[Path]) -> list[str|Exception]:
+        worker_num = min(os.cpu_count() or 1, self.BULK_MAX_WORKER_NUM)
+        try:
+            with ThreadPoolExecutor(max_workers=worker_num) as executor:
+                return list(executor.map(lambda file_path: self.try_call(self.read_text, file_path), file_paths))
+        except RuntimeError:
+            # can't start new threads
+            return [self.try_call(self.read_text, file_path) for file_path in file_paths]
+        
+    @staticmethod
+    def is_process_pool_available() -> bool:
+        """Spawned workers run sys.executable, only use them when it's a python interpreter rather than the blender binary."""
+        return (os.cpu_count() or 1) > 1 and Path(sys.executable).name.lower().startswith("python")
+    
+    def decode_jsons(self, texts: list[str|Exception]) -> list[dict|Exception]:
+        results = list(texts)
+        idxs = [i for i, text in enumerate(texts) if isinstance(text, str)]
+        total_size = sum(len(texts[i]) for i in idxs)
+        is_main_thread = threading.current_thread() is threading.main_thread()
+        if total_size >= self.BULK_DECODE_MIN_SIZE and is_main_thread and self.is_process_pool_available():
+            worker_num = min(os.cpu_count() or 1, self.BULK_MAX_WORKER_NUM)
+            chunksize = max(1, len(idxs) // (worker_num * 4))
+            try:
+                # spawn, a forked blender is not safe. json.loads is picklable by ref, workers won't import our modules
+                with ProcessPoolExecutor(max_workers=worker_num, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    for i, jobj in zip(idxs, executor.map(json.loads, [texts[i] for i in idxs], chunksize=chunksize)):
+                        results[i] = jobj
+            except Exception as e:
+                # a broken file stops the map, or the pool can't start. decode the rest one by one
+                print(f"[Hot Node] Decode in parallel failed, decode serially instead: {e}")
+        for i in idxs:
+            if isinstance(results[i], str):
+                results[i] = self.try_call(json.loads, results[i])
+        return results
+        
     def ensure_dir(self, dir_path: Path):
         """Ensure that the specified directory exists, creating it if necessary."""
         dir_path.mkdir(parents=True, exist_ok=True)
@@ -118,24 +322,29 @@ class FileManager:
             
     def copy_tree(self, src: Path, dst: Path):
         """Copy a directory tree from src to dst, wont overwrite if dst exists."""
+        self.flush_writes()
         shutil.copytree(src, dst, dirs_exist_ok=True)
         
     def copy_file(self, src: Path, dst: Path):
         """Copy a file from src to dst."""
+        self.flush_writes()
         shutil.copyfile(src, dst)
         
     def remove_tree(self, dir_path: Path):
         """Remove a directory and all its contents if path exists."""
+        self.flush_writes()
         if dir_path.exists() and dir_path.is_dir():
             shutil.rmtree(dir_path)
             
     def remove_file(self, file_path: Path):
         """Remove a file if it exists."""
+        self.flush_writes()
         if file_path.exists() and file_path.is_file():
             file_path.unlink()
             
     def remove_path(self, path: Path):
         """Remove a file or directory if path exists."""
+        self.flush_writes()
         if path.exists():
             if path.is_dir():
                 shutil.rmtree(path)
@@ -144,6 +353,7 @@ class FileManager:
             
     def remove_paths(self, paths: list[Path]):
         """Remove multiple files or directories if path exists."""
+        self.flush_writes()
         for path in paths:
             if path.exists():
                 if path.is_dir():
@@ -151,7 +361,32 @@ class FileManager:
                 elif path.is_file():
                     path.unlink()
         
+    def move_path(self, src: Path, dst: Path):
+        """Move a file or directory by renaming, constant time on the same volume. Raise OSError if it can't be renamed."""
+        self.flush_writes()
+        os.replace(src, dst)
+
+    def is_in_trash(self, path: Path|str) -> bool:
+        return Path(path).parent == self._trash_dir
+
+    def remove_path_later(self, path: Path):
+        """Rename the path aside now and remove it on a background thread, for removing big trees without blocking."""
+        self.flush_writes()
+        if not path.exists():
+            return
+        if path.name.endswith(self.REMOVING_SUFFIX):
+            removing_path = path
+        else:
+            removing_path = path.parent / f".{path.name}.{time.time_ns()}{self.REMOVING_SUFFIX}"
+            try:
+                os.replace(path, removing_path)
+            except OSError:
+                self.remove_path(path)
+                return
+        threading.Thread(target=self.try_call, args=(self.remove_path, removing_path), daemon=True).start()
+
     def rename_path_tail(self, file_or_dir_path: Path, new_name: str, suffix: str = ""):
+        self.flush_writes()
         os.rename(file_or_dir_path, file_or_dir_path.parent / (new_name + suffix))
         
     def read_dir_file_names(self, dir_path, suffix, cull_suffix=True):
@@ -188,7 +423,10 @@ class FileManager:
                 shutil.move(str(item), str(dst_dir_path))
             shutil.rmtree(nested_dir)
         
-    def zip_to(self, src_dir_path: Path, dst_zip_path: Path):
+    def zip_to(self, src_dir_path: Path, dst_zip_path: Path, excluded_paths: list[Path]|None = None):
+        """Zip the files of a directory, files in excluded_paths are skipped."""
+        self.flush_writes()
+        excluded_path_strs = {os.path.normpath(path) for path in excluded_paths} if excluded_paths else set()
         zip = zipfile.ZipFile(dst_zip_path, 'w', zipfile.ZIP_DEFLATED)
         for root, dirs, files in os.walk(src_dir_path):
             relative_root = os.path.relpath(root, src_dir_path)
@@ -197,9 +435,19 @@ class FileManager:
             else:
                 relative_root += os.sep
             for filename in files:
+                if excluded_path_strs and os.path.normpath(os.path.join(root, filename)) in excluded_path_strs:
+                    continue
                 zip.write(os.path.join(root, filename), relative_root + filename)
         zip.close()
         
+    def bundle_to(self, src_dir_path: Path, dst_bundle_path: Path, excluded_paths: list[Path]|None = None):
+        """Bundle the files of a directory into a .hnpk (see utils.bundle), files in excluded_paths are skipped."""
+        self.flush_writes()
+        bundle.write_bundle(src_dir_path, dst_bundle_path, excluded_paths)
+        
+    def is_bundle(self, path: Path) -> bool:
+        return bundle.is_bundle(path)
+        
     def ensure_path_is_dir(self, path: Path):
         """Ensure that the given path is a directory, if it's a file path, get the file's parent dir path."""
         # if it's a file path, get the dir path of it using dirname()
@@ -0,0 +1,68 @@
+"""
+Structural patches between json objects, used by the history to keep a changed json file as a delta of the current file.
+A patch is a list of ops, paths are lists of dict keys / list indexes:
+{"op": "replace", "path": [...], "value": v}, {"op": "add", "path": [...], "value": v}, {"op": "remove", "path": [...]},
+{"op": "order", "path": [...], "keys": [...]} (dict key order matters to the deserializer, e.g. the order of nodes).
+"""
+
+
+def diff(src, dst) -> list[dict]:
+    """Get the patch turning src into dst."""
+    ops = []
+    _diff(src, dst, [], ops)
+    return ops
+
+
+def _diff(src, dst, path: list, ops: list[dict]):
+    if type(src) is not type(dst):
+        ops.append({"op": "replace", "path": path, "value": dst})
+    elif isinstance(src, dict):
+        for key in src:
+            if key not in dst:
+                ops.append({"op": "remove", "path": path + [key]})
+        for key, value in dst.items():
+            if key not in src:
+                ops.append({"op": "add", "path": path + [key], "value": value})
+            elif src[key] != value:
+                _diff(src[key], value, path + [key], ops)
+        # added keys are appended by apply()
+        patched_keys = [key for key in src if key in dst] + [key for key in dst if key not in src]
+        dst_keys = list(dst)
+        if patched_keys != dst_keys:
+            ops.append({"op": "order", "path": path, "keys": dst_keys})
+    elif isinstance(src, list):
+        if len(src) != len(dst):
+            # lists like links are short or change as a whole, not worth a sequence diff
+            ops.append({"op": "replace", "path": path, "value": dst})
+            return
+        for i, (src_item, dst_item) in enumerate(zip(src, dst)):
+            if src_item != dst_item:
+                _diff(src_item, dst_item, path + [i], ops)
+    elif src != dst:
+        ops.append({"op": "replace", "path": path, "value": dst})
+
+
+def apply(src, patch: list[dict]):
+    """Apply the patch to src and return the result, src and the patch values are reused (pass fresh objects). Raise ValueError if the patch doesn't fit src."""
+    root = {"": src}
+    for op in patch:
+        path = [""] + list(op["path"])
+        try:
+            parent = root
+            for key in path[:-1]:
+                parent = parent[key]
+            key = path[-1]
+            if op["op"] in ("replace", "add"):
+                if op["op"] == "replace" and isinstance(parent, dict) and key not in parent:
+                    raise KeyError(key)
+                parent[key] = op["value"]
+            elif op["op"] == "remove":
+                del parent[key]
+            elif op["op"] == "order":
+                obj = parent[key]
+                parent[key] = {dict_key: obj[dict_key] for dict_key in op["keys"]}
+            else:
+                raise ValueError(f"Unknown patch op: {op['op']}")
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"Patch doesn't fit at {op['path']}: {e}") from e
+    return root[""]
@@ -1,5 +1,7 @@
 import os
 import difflib
+import hashlib
+import json
 import time
 import tempfile
 from pathlib import Path
@@ -214,6 +216,14 @@ def get_string_between_words(string: str, after_words: tuple[str]|None, before_w
     return string[first_idx:last_idx]
 
 
+def hash_jobj(jobj: dict, excluded_keys: tuple[str] = ()) -> str:
+    """Get the sha256 of the canonical json of a json dict, the keys in excluded_keys are not hashed."""
+    if excluded_keys:
+        jobj = {key: value for key, value in jobj.items() if key not in excluded_keys}
+    text = json.dumps(jobj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 def list_cattr(cobj: dict, attr_name: str):
     '''Get all cobj's elements' attr as a list'''
     result_list = []